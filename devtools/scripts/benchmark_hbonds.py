@@ -0,0 +1,145 @@
+"""
+Benchmark the shared hbond engine in pyqmmm.md.hbond_analyzer against the original implementation.
+
+A synthetic CPPTraj hbond.gnu file is written to a temporary directory,
+both implementations parse it, and the timings and agreement of the counts are reported.
+
+Usage:
+    python devtools/scripts/benchmark_hbonds.py --frames 5000 --bonds 1000
+"""
+
+import argparse
+import os
+import random
+import time
+from tempfile import TemporaryDirectory
+
+import pandas as pd
+
+from pyqmmm.md import hbond_analyzer
+
+RESIDUES = ["ARG_5", "HIE_10", "GLU_20", "ASP_7", "SER_3", "LYS_42", "TYR_88", "DHK_355"]
+
+
+def write_gnu(file_path, frames, bonds, occupancy, seed=0):
+    """Write a synthetic hbond.gnu file in the CPPTraj gnuplot layout."""
+    rng = random.Random(seed)
+    labels = []
+    for index in range(1, bonds + 1):
+        acceptor, donor = rng.sample(RESIDUES, 2)
+        acceptor_atom = rng.choice(["O", "OD1", "OE2", "N"])
+        donor_atom = rng.choice(["N", "NE", "OG", "OH"])
+        labels.append(f'"{acceptor}@{acceptor_atom}-{donor}@{donor_atom}-H{index}" {index}')
+
+    with open(file_path, "w") as f:
+        f.write("set pm3d map corners2color c1\n")
+        f.write('set xlabel "Frame"\n')
+        f.write('set ylabel ""\n')
+        f.write(f"set yrange [0.0:{bonds + 1}.0]\n")
+        f.write(f"set xrange [0.0:{frames + 1}.0]\n")
+        f.write(f"set ytics({','.join(labels)})\n")
+        f.write('set title "hbond"\n')
+        f.write('splot "-" with pm3d title "hbond"\n')
+        for frame in range(1, frames + 1):
+            if frame > 1:
+                f.write("\n")
+            for index in range(1, bonds + 1):
+                f.write(f"{frame} {index} {int(rng.random() < occupancy)}\n")
+        f.write("end\n")
+
+
+def legacy_bond_labels(file_path, ignore_backbone=True, include_backbone=tuple("DHK")):
+    """Label parsing and backbone filtering as originally implemented."""
+    dict = {}
+    with open(file_path, "r") as f:
+        for line in f:
+            if line[:10] == "set ytics(":
+                bonds = line.split("(")[1].split(")")[0]
+                for b in bonds.split(","):
+                    key_val = b.split(" ")
+                    dict[int(float(key_val[-1]))] = key_val[0].strip('"')
+    labels = pd.Series(dict.values(), index=dict.keys(), name="labels")
+    labels = labels.str.split("-", expand=True)
+    labels.columns = ["acceptor", "donor", "hydrogen"]
+    labels[["acceptor", "acceptor_atom"]] = labels["acceptor"].str.split("@", expand=True)
+    labels[["donor", "donor_atom"]] = labels["donor"].str.split("@", expand=True)
+    if ignore_backbone:
+        include_regex = "|".join(include_backbone)
+        labels = labels[
+            ~(
+                (
+                    labels["acceptor_atom"].isin(["N", "O"])
+                    & ~labels["acceptor"].str.contains(include_regex, regex=True)
+                )
+                | (
+                    labels["donor_atom"].isin(["N", "O"])
+                    & ~labels["donor"].str.contains(include_regex, regex=True)
+                )
+            )
+        ]
+    labels = labels.reset_index()
+    return labels.groupby(["acceptor", "donor"])["index"].apply(set).reset_index()
+
+
+def legacy_count_occurrences(file_path, labels):
+    """Occupancy counting as originally implemented, one set intersection per label per frame."""
+    labels["count"] = 0
+    frame_count = 0
+    with open(file_path, "r") as f:
+        for _ in range(8):
+            next(f)
+        for frame in f.read().split("\n\n"):
+            frame_count += 1
+            bonds = set()
+            for line in frame.split("\n"):
+                if line == "end":
+                    break
+                arr = [int(float(x)) for x in line.split(" ") if x]
+                if arr[-1] == 1:
+                    bonds.add(arr[1])
+            contains_bond = [len(i & bonds) != 0 for i in labels["index"]]
+            labels.loc[contains_bond, "count"] += 1
+    return labels, frame_count
+
+
+def time_call(function, *args):
+    """Run a function once and return its result and the elapsed seconds."""
+    start_time = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start_time
+
+
+def benchmark(frames, bonds, occupancy):
+    """Time both implementations on the same synthetic file and check that they agree."""
+    with TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "hbond.gnu")
+        write_gnu(path, frames, bonds, occupancy)
+        size = os.path.getsize(path) / 1e6
+        print(f"   > Synthetic hbond.gnu: {frames} frames, {bonds} hbonds, {size:.1f} MB")
+
+        old_labels, old_label_time = time_call(legacy_bond_labels, path)
+        new_labels, new_label_time = time_call(hbond_analyzer.bond_labels, path)
+        (old_counts, old_frames), old_count_time = time_call(legacy_count_occurrences, path, old_labels)
+        (new_counts, new_frames), new_count_time = time_call(
+            hbond_analyzer.count_occurrences, path, new_labels
+        )
+
+    agree = (
+        old_frames == new_frames
+        and old_counts[["acceptor", "donor", "count"]].equals(new_counts[["acceptor", "donor", "count"]])
+    )
+    print(f"   > bond_labels:       original {old_label_time:8.3f} s   shared engine {new_label_time:8.3f} s")
+    print(f"   > count_occurrences: original {old_count_time:8.3f} s   shared engine {new_count_time:8.3f} s")
+    print(f"   > Speedup of count_occurrences: {old_count_time / new_count_time:.1f}x")
+    print(f"   > Results agree: {agree}")
+
+    return agree
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--frames", type=int, default=5000, help="Number of frames in the synthetic file.")
+    parser.add_argument("--bonds", type=int, default=1000, help="Number of candidate hbonds.")
+    parser.add_argument("--occupancy", type=float, default=0.05, help="Probability an hbond is present.")
+    args = parser.parse_args()
+    benchmark(args.frames, args.bonds, args.occupancy)
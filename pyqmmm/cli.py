@@ -38,6 +38,9 @@ def cli():
 @click.option("--gbsa_analysis", "-ga", is_flag=True, help="Extract results from GBSA analysis.")
 @click.option("--compute_hbond", "-hc", is_flag=True, help="Calculates hbonds with cpptraj.")
 @click.option("--hbond_analysis", "-ha", is_flag=True, help="Extract Hbonding patterns from MD.")
+@click.option("--hbond_lifetimes", "-hl", is_flag=True, help="Hbond lifetimes and autocorrelation functions.")
+@click.option("--hbond_replicates", "-hr", is_flag=True, help="Merge Hbonding patterns of replicates in parallel.")
+@click.option("--native_hbonds", "-hn", is_flag=True, help="Extract Hbonding patterns directly from a trajectory.")
 @click.option("--last_frame", "-lf", is_flag=True, help="Get last frame from an AMBER trajectory.")
 @click.option("--residue_list", "-lr", is_flag=True, help="Get a list of all residues in a PDB.")
 @click.option("--colored_rmsd", "-cr", is_flag=True, help="Color RMSD by clusters.")
@@ -49,12 +52,16 @@ def cli():
 @click.option("--cc_coupling", "-cc", is_flag=True, help="Plots the results from cc coupling analysis.")
 @click.option("--compare_distances", "-cd", is_flag=True, help="Plots distance metrics together.")
 @click.option("--plot_rmsd", "-rmsd", is_flag=True, help="Plots the RMSD from CPPTraj.")
+@click.option("--raster", "-ras", is_flag=True, help="Draw -cr, -rp and -rmsd points as a density image.")
 @click.help_option('--help', '-h', is_flag=True, help='Exiting pyQMMM.')
 def md(
     gbsa_submit,
     gbsa_analysis,
     compute_hbond,
     hbond_analysis,
+    hbond_lifetimes,
+    hbond_replicates,
+    native_hbonds,
     last_frame,
     residue_list,
     colored_rmsd,
@@ -66,11 +73,13 @@ def md(
     cc_coupling,
     compare_distances,
     plot_rmsd,
+    raster,
     ):
     """
     Functions for molecular dynamics (MD) simulations.
 
     """
+    render = "raster" if raster else "scatter"
     if gbsa_submit:
         click.echo("> Submit a mmGBSA job:")
         click.echo("> Loading...")
@@ -109,7 +118,33 @@ def md(
         file_paths = ["./"]
         names = ["unrestrained"]
         substrate = input("   > What is the resid of your substrate? (e.g., DCA) ")
-        pyqmmm.md.hbond_analyzer.analyze_hbonds(file_paths, names, substrate)
+        save_matrix = input("   > Save the occupancy matrix for lifetime analysis (y/N)? ").strip().lower() == "y"
+        pyqmmm.md.hbond_analyzer.analyze_hbonds(file_paths, names, substrate, save_matrix=save_matrix)
+
+    elif hbond_lifetimes:
+        click.echo("> Compute hbond lifetimes and autocorrelation functions:")
+        click.echo("> Loading...")
+        import pyqmmm.md.hbond_analyzer
+        timestep = float(input("   > What is the time between frames (e.g., 0.2)? ") or 1.0)
+        pyqmmm.md.hbond_analyzer.analyze_lifetimes("./", timestep=timestep)
+
+    elif hbond_replicates:
+        click.echo("> Extract and merge hbonding patterns from replicate MD simulations:")
+        click.echo("> Loading...")
+        import pyqmmm.md.hbond_analyzer
+        replicates = input("   > What directories contain your replicates (e.g., 1,2,3)? ").split(",")
+        file_paths = [f"{replicate.strip().rstrip('/')}/" for replicate in replicates]
+        substrate = input("   > What is the resid of your substrate? (e.g., DCA) ")
+        pyqmmm.md.hbond_analyzer.analyze_replicates(file_paths, substrate)
+
+    elif native_hbonds:
+        click.echo("> Extract and plot hbonding patterns directly from an MD trajectory:")
+        click.echo("> Loading...")
+        import pyqmmm.md.hbond_detector
+        topology = input("   > What is your topology (e.g., taud_dry.prmtop)? ")
+        trajectory = input("   > What is your trajectory (e.g., constP_prod.mdcrd)? ")
+        substrate = input("   > What is the resid of your substrate? (e.g., DCA) ")
+        pyqmmm.md.hbond_detector.analyze_native_hbonds(topology, trajectory, "unrestrained", substrate)
 
     elif last_frame:
         click.echo("> Extracting the last frame from a MD simulation:")
@@ -131,13 +166,25 @@ def md(
         import pyqmmm.md.rmsd_clusters_colorcoder
         yaxis_title = "RMSD (Å)"
         cluster_count = int(input("How many cluster would you like plotted? "))
-        pyqmmm.md.rmsd_clusters_colorcoder.rmsd_clusters_colorcoder(yaxis_title, cluster_count, layout='wide')
+        pyqmmm.md.rmsd_clusters_colorcoder.rmsd_clusters_colorcoder(
+            yaxis_title, cluster_count, layout='wide', render=render
+        )
 
     elif restraint_plot:
         click.echo("> Generate single KDE plot with hyscore measurements:")
         click.echo("> Loading...")
-        import pyqmmm.md.kde_restraint_plotter
-        pyqmmm.md.kde_restraint_plotter.restraint_plot()
+        import pyqmmm.md.restraint_plotter
+        method = input("   > Density estimator, binned or exact (default binned)? ").strip().lower() or "binned"
+        processes = split = None
+        if method == "exact":
+            processes = input("   > How many processes, 1 runs serially (default one per core)? ")
+            split = input("   > How many chunks to split each dataset into (default 1)? ")
+        pyqmmm.md.restraint_plotter.restraint_plots(
+            render,
+            method=method,
+            processes=int(processes) if processes else None,
+            split=int(split) if split else 1,
+        )
 
     elif strip_all:
         click.echo("> Strip waters and metals and create new traj and prmtop file:")
@@ -159,17 +206,29 @@ def md(
         click.echo("> Loading...")
         import pyqmmm.md.rmsf_calculator
         protein = input("What is the name of your protein? ")
-        topology = f"1/{protein}_dry.prmtop"
-        reference_file = "1/xtal.pdb"
-        trajectories = ["1/1_output/constP_prod.crd",
-                        "2/1_output/constP_prod.crd",
-                        "3/1_output/constP_prod.crd",
-                        "4/1_output/constP_prod.crd",
-                        "5/1_output/constP_prod.crd",
-                        "6/1_output/constP_prod.crd",
-                        "7/1_output/constP_prod.crd",
-                        ]
-        pyqmmm.md.rmsf_calculator.calculate_rmsf(topology, trajectories, reference_file)
+        replicates = input("   > What directories contain your replicates (e.g., 1,2,3)? ").split(",")
+        replicates = [replicate.strip().rstrip("/") for replicate in replicates]
+        start = input("   > First frame to analyze, to skip equilibration (default 0)? ")
+        stop = input("   > Last frame to analyze, inclusive (default all)? ")
+        step = input("   > Analyze every nth frame (default 1)? ")
+        begin = input("   > Start of the time window in ps (default none)? ")
+        end = input("   > End of the time window in ps (default none)? ")
+        processes = input("   > How many processes, 1 runs serially (default one per core)? ")
+        topology = f"{replicates[0]}/{protein}_dry.prmtop"
+        reference_file = f"{replicates[0]}/xtal.pdb"
+        trajectories = [f"{replicate}/1_output/constP_prod.crd" for replicate in replicates]
+        pyqmmm.md.rmsf_calculator.calculate_rmsf(
+            topology,
+            trajectories,
+            reference_file,
+            start=int(start) if start else None,
+            # The prompt is inclusive, -1 still means the last frame
+            stop=(int(stop) + 1 or None) if stop else None,
+            step=int(step) if step else None,
+            begin=float(begin) if begin else None,
+            end=float(end) if end else None,
+            processes=int(processes) if processes else None,
+        )
     
     elif quick_csa:
         click.echo("> Charge shift analysis:")
@@ -194,7 +253,7 @@ def md(
         import pyqmmm.md.rmsd_plotter
         yaxis_title = "RMSD (Å)"
         layout = "wide"
-        pyqmmm.md.rmsd_plotter.rmsd_plotter(yaxis_title, layout)
+        pyqmmm.md.rmsd_plotter.rmsd_plotter(yaxis_title, layout, render)
 
 
 
@@ -211,6 +270,14 @@ def md(
 @click.option("--plot_combine_nebs", "-pcneb", is_flag=True, help="Combines and plots NEBs as a single trajectory.")
 @click.option("--extract_energies", "-ee", is_flag=True, help="Extract electronic energies")
 @click.option("--extract_gibbs", "-eg", is_flag=True, help="Extract Gibbs free energies")
+@click.option("--cache_xyz", "-cx", is_flag=True, help="Cache xyz trajectories in a binary format.")
+@click.option("--merge_xyz", "-mx", is_flag=True, help="Merge frames of xyz files.")
+@click.option(
+    "--spec",
+    "merge_spec",
+    type=click.Path(exists=True, dir_okay=False),
+    help="JSON spec for -mx to merge without prompts.",
+)
 @click.help_option('--help', '-h', is_flag=True, help='Exiting pyQMMM.')
 def qm(
     plot_energy,
@@ -225,6 +292,9 @@ def qm(
     plot_combine_nebs,
     extract_energies,
     extract_gibbs,
+    cache_xyz,
+    merge_xyz,
+    merge_spec,
     ):
     """
     Functions for quantum mechanics (QM) simulations.
@@ -312,6 +382,18 @@ def qm(
         import pyqmmm.qm.extract_electronic_energies
         pyqmmm.qm.extract_electronic_energies.extract()
 
+    if cache_xyz:
+        click.echo("> Cache xyz trajectories for faster analysis:")
+        click.echo("> Loading...")
+        import pyqmmm.qm.xyz_cacher
+        pyqmmm.qm.xyz_cacher.xyz_cacher()
+
+    if merge_xyz:
+        click.echo("> Merge frames from multiple xyz trajectories:")
+        click.echo("> Loading...")
+        import pyqmmm.qm.traj_merger
+        pyqmmm.qm.traj_merger.xyz_merger(merge_spec)
+
 if __name__ == "__main__":
     # Run the command-line interface when this script is executed
     cli()
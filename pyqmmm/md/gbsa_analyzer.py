@@ -1,10 +1,45 @@
 """Process and analyze output from AMBER GBSA calculation"""
 
 import glob
+import gzip
+import io
+import mmap
+import os
 import pandas as pd
 import matplotlib.pyplot as plt
 from pandas.api.types import CategoricalDtype
 
+# Keywords of the MMPBSA decomposition output
+TOTAL_ENERGY_KEYWORD = b"D,E,L,T,A,S,:"
+SIDECHAIN_KEYWORD = b"S,i,d,e,c,h,a,i,n, ,E,n,e,r,g,y, ,D,e,c,o,m,p,o,s,i,t,i,o,n,:"
+GBSA_COLUMNS = [
+    "Resname 1",
+    "Resid 1",
+    "Resname 2",
+    "Resid 2",
+    "Internal",
+    "Internal SD",
+    "Internal SDM",
+    "VDW",
+    "VDW SD",
+    "VDW SDM",
+    "Electrostatic",
+    "Electrostatic SD",
+    "Electrostatic SDM",
+    "Polar",
+    "Polar SD",
+    "Polar SDM",
+    "Non-polar",
+    "Non-polar SD",
+    "Non-polar SDM",
+    "Total",
+    "Total SD",
+    "Total SDM",
+]
+# Bytes of the DELTAS section parsed at a time
+GBSA_BLOCK_SIZE = 1 << 26
+GZIP_MAGIC = b"\x1f\x8b"
+
 
 def format_plot() -> None:
     """
@@ -26,74 +61,220 @@ def format_plot() -> None:
     plt.rcParams["svg.fonttype"] = "none"
 
 
-def get_gbsa_df(raw, ignore_residues) -> pd.DataFrame:
+def open_gbsa(raw):
     """
-    Turn the GBSA file into a parsable pd.DataFrame.
+    Opens a GBSA output file in binary mode, decompressing it if it is gzipped.
 
     Parameters
     ----------
     raw: str
-        The name of the GBSA output file.
+        The name of the GBSA output file, optionally gzip compressed.
 
     Returns
     -------
-    df: pd.DataFrame
-        The raw GBSA file as a pd.DataFrame
+    raw_data: file
+        A binary file object positioned at the start of the file.
+
+    """
+    with open(raw, "rb") as raw_data:
+        compressed = raw_data.read(2) == GZIP_MAGIC
+    if compressed:
+        return gzip.open(raw, "rb")
+    return open(raw, "rb")
+
+
+def seek_deltas(raw_data, block_size=None):
+    """
+    Moves a GBSA output file to the line after the DELTAS keyword.
+
+    Uncompressed files are searched with mmap and the file seeks straight to the section.
+    Compressed files cannot be searched in place and are scanned in blocks.
+
+    Parameters
+    ----------
+    raw_data: file
+        A binary file object from open_gbsa().
+    block_size: int, optional
+        Number of bytes read at a time from compressed files, GBSA_BLOCK_SIZE by default.
+
+    Returns
+    -------
+    leftover: bytes or None
+        Already read bytes of the section that precede the file position,
+        None if there is no DELTAS section.
 
     """
+    block_size = block_size or GBSA_BLOCK_SIZE
+    if not isinstance(raw_data, gzip.GzipFile):
+        if os.fstat(raw_data.fileno()).st_size == 0:
+            return None
+        with mmap.mmap(raw_data.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if mm[: len(TOTAL_ENERGY_KEYWORD)] == TOTAL_ENERGY_KEYWORD:
+                position = 0
+            else:
+                position = mm.find(b"\n" + TOTAL_ENERGY_KEYWORD)
+                if position == -1:
+                    return None
+                position += 1
+        raw_data.seek(position)
+        raw_data.readline()
+        return b""
+
+    # Start with a newline so a keyword on the first line is found
+    buffer = b"\n"
+    while True:
+        position = buffer.find(b"\n" + TOTAL_ENERGY_KEYWORD)
+        if position != -1:
+            break
+        data = raw_data.read(block_size)
+        if not data:
+            return None
+        buffer = buffer[-len(TOTAL_ENERGY_KEYWORD):] + data
+
+    # Drop the keyword line, reading on if it is cut off
+    line_end = buffer.find(b"\n", position + 1)
+    while line_end == -1:
+        data = raw_data.read(block_size)
+        if not data:
+            return b""
+        buffer += data
+        line_end = buffer.find(b"\n", position + 1)
+
+    return buffer[line_end + 1:]
+
+
+def read_delta_blocks(raw, block_size=None):
+    """
+    Streams the DELTAS section of a GBSA output file in blocks of whole lines.
+
+    Parameters
+    ----------
+    raw: str
+        The name of the GBSA output file, optionally gzip compressed.
+    block_size: int, optional
+        Number of bytes read at a time, GBSA_BLOCK_SIZE by default.
+
+    Yields
+    ------
+    block: bytes
+        Consecutive lines of the section, ending before the sidechain decomposition.
+
+    """
+    block_size = block_size or GBSA_BLOCK_SIZE
+    with open_gbsa(raw) as raw_data:
+        pending = seek_deltas(raw_data, block_size)
+        if pending is None:
+            return
+
+        while True:
+            data = raw_data.read(block_size)
+            block = pending + data
+            end = block.find(SIDECHAIN_KEYWORD)
+            if end != -1:
+                yield block[: block.rfind(b"\n", 0, end) + 1]
+                return
+            if not data:
+                yield block
+                return
+            # Carry the last partial line, which may hold part of the keyword, to the next block
+            cut = block.rfind(b"\n") + 1
+            pending = block[cut:]
+            yield block[:cut]
+
+
+def strip_header_lines(block):
+    """
+    Removes the column header lines from a block of the DELTAS section.
+
+    Parameters
+    ----------
+    block: bytes
+        Lines from read_delta_blocks().
 
-    total_energy_keyword = "D,E,L,T,A,S,:"
-    sidechain_keyword = "S,i,d,e,c,h,a,i,n, ,E,n,e,r,g,y, ,D,e,c,o,m,p,o,s,i,t,i,o,n,:"
-    columns = [
-        "Resname 1",
-        "Resid 1",
-        "Resname 2",
-        "Resid 2",
-        "Internal",
-        "Internal SD",
-        "Internal SDM",
-        "VDW",
-        "VDW SD",
-        "VDW SDM",
-        "Electrostatic",
-        "Electrostatic SD",
-        "Electrostatic SDM",
-        "Polar",
-        "Polar SD",
-        "Polar SDM",
-        "Non-polar",
-        "Non-polar SD",
-        "Non-polar SDM",
-        "Total",
-        "Total SD",
-        "Total SDM",
-    ]
-    csv_file_name = "deltas.csv"
-
-    delta_section = False
-    with open(raw, "r") as raw_data, open(csv_file_name, "w") as csv_file:
-        for line in raw_data:
-            if delta_section:
-                if "T,o,t,a,l" in line or "Std" in line or "Resid" in line:
-                    if "Resid" in line:
-                        csv_file.write(",".join(columns) + "\n")
-                    continue
-                if sidechain_keyword in line:
-                    break
-                else:
-                    line = ",".join(line.split()) + "\n"
-                    csv_file.write(line)
-
-            if line.startswith(total_energy_keyword):
-                delta_section = True
-
-    df = pd.read_csv(csv_file_name)
-    df = df[~df["Resname 2"].isin(ignore_residues)]
-    df = df[df["Resid 1"] != df["Resid 2"]]
+    Returns
+    -------
+    block: bytes
+        Only the data lines.
+
+    """
+    for marker in (b"T,o,t,a,l", b"Std", b"Resid"):
+        position = block.find(marker)
+        while position != -1:
+            start = block.rfind(b"\n", 0, position) + 1
+            end = block.find(b"\n", position)
+            end = len(block) if end == -1 else end + 1
+            block = block[:start] + block[end:]
+            position = block.find(marker, start)
+
+    return block
+
+
+def parse_delta_block(block, first_row) -> pd.DataFrame:
+    """
+    Parses a block of DELTAS lines with the pandas C reader.
+
+    Residue names and numbers are separated by spaces and the energies by commas,
+    so both are treated as delimiters.
+
+    Parameters
+    ----------
+    block: bytes
+        Data lines from strip_header_lines().
+    first_row: int
+        Row number of the first line in the section, used as the index.
+
+    Returns
+    -------
+    df: pd.DataFrame
+        The block with the GBSA_COLUMNS columns.
+
+    """
+    block = block.replace(b",", b" ")
+    df = pd.read_csv(io.BytesIO(block), sep=r"\s+", header=None, names=GBSA_COLUMNS)
+    df.index += first_row
 
     return df
 
 
+def get_gbsa_df(raw, ignore_residues, block_size=None) -> pd.DataFrame:
+    """
+    Turn the GBSA file into a parsable pd.DataFrame.
+
+    The DELTAS section is parsed in memory in blocks,
+    and the ignored residues and self-interactions are dropped from each block as it is read.
+
+    Parameters
+    ----------
+    raw: str
+        The name of the GBSA output file, optionally gzip compressed.
+    ignore_residues: list[str]
+        Residue names whose interactions are dropped.
+    block_size: int, optional
+        Number of bytes read at a time, GBSA_BLOCK_SIZE by default.
+
+    Returns
+    -------
+    df: pd.DataFrame
+        The raw GBSA file as a pd.DataFrame
+
+    """
+    chunks = []
+    first_row = 0
+    for block in read_delta_blocks(raw, block_size):
+        block = strip_header_lines(block)
+        if not block.strip():
+            continue
+        df = parse_delta_block(block, first_row)
+        first_row += len(df)
+        df = df[~df["Resname 2"].isin(ignore_residues)]
+        df = df[df["Resid 1"] != df["Resid 2"]]
+        chunks.append(df)
+
+    if not chunks:
+        return pd.DataFrame(columns=GBSA_COLUMNS)
+    return pd.concat(chunks)
+
+
 def update_res_names(df) -> pd.DataFrame:
     """
     Updates odd residue names to more conventional names.
@@ -273,7 +454,7 @@ def analyze() -> None:
     print("| GBSA ANALYZER |")
     print(".---------------.\n")
     print("This script will process a single GBSA output file")
-    print("Looks for file24.dat\n")
+    print("Looks for file24.dat or file24.dat.gz\n")
 
     # Get user input
     sub_num = int(
@@ -282,14 +463,12 @@ def analyze() -> None:
     num_hits = int(input("Show me the top n residues: "))
     ignore_residues = input("What residues would you like ignored (e.g., LS1,LS2)? ").split(',')
 
-    file_extension = "*24.dat"
-
-    # Collect the GBSA data located in the current directory
-    raw_files = glob.glob(file_extension)
+    # Collect the GBSA data located in the current directory, gzipped or not
+    raw_files = glob.glob("*24.dat") + glob.glob("*24.dat.gz")
     raw_files = sorted(raw_files)
 
     if len(raw_files) == 0:
-        print("No *24.dat files found. Please check your directory.")
+        print("No *24.dat or *24.dat.gz files found. Please check your directory.")
         return
 
     raw = raw_files[0]
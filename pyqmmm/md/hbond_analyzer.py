@@ -1,13 +1,26 @@
 """Analyze data from hydrogen bonding analysis based on hbond.gnu file."""
 
+import functools
+import io
+import re
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
+from scipy import sparse
+from scipy.fft import next_fast_len
+from scipy.integrate import trapezoid
 from pathlib import Path
+from pyqmmm.md.worker_pool import map_tasks, pool_size
 import subprocess
 import sys
 import os
 import textwrap
 
+# Characters of hbond.gnu read at a time by the streaming parser
+HBOND_CHUNK_SIZE = 1 << 24
+# Atom names of backbone hbond donors and acceptors
+BACKBONE_ATOMS = ["N", "O"]
+
 
 def compute_hbonds(cpptraj_script, submit_script, script_name):
     """
@@ -52,6 +65,34 @@ def compute_hbonds(cpptraj_script, submit_script, script_name):
         print(" > A hbonding job has been submitted")
 
 
+def backbone_mask(labels, include_backbone=tuple("DHK")):
+    """
+    Flags backbone hbonds that should be ignored.
+
+    The include_backbone pattern is compiled once and matched against each unique
+    residue name only, the per-label test is then a vectorized isin lookup.
+
+    Parameters
+    ----------
+    labels: pd.DataFrame
+        Labels with acceptor, acceptor_atom, donor and donor_atom columns
+    include_backbone: tuple(str)
+        Patterns of residues whose backbone hbonds are kept
+
+    Returns
+    -------
+    mask: pd.Series
+        True for hbonds with a backbone donor or acceptor (N or O) outside include_backbone
+    """
+    include_regex = re.compile("|".join(include_backbone))
+    residues = pd.unique(pd.concat([labels["acceptor"], labels["donor"]]).dropna())
+    included = [residue for residue in residues if include_regex.search(residue)]
+    backbone_acceptor = labels["acceptor_atom"].isin(BACKBONE_ATOMS) & ~labels["acceptor"].isin(included)
+    backbone_donor = labels["donor_atom"].isin(BACKBONE_ATOMS) & ~labels["donor"].isin(included)
+
+    return backbone_acceptor | backbone_donor
+
+
 def bond_labels(file_path, ignore_backbone=True, include_backbone=tuple("DHK")):
     """
     Extracts bond labels from gnu file.
@@ -88,35 +129,238 @@ def bond_labels(file_path, ignore_backbone=True, include_backbone=tuple("DHK")):
     labels[["donor", "donor_atom"]] = labels["donor"].str.split("@", expand=True)
     # Ignore backbone hydrogen atom donors/acceptors if the acceptor or donor is not in include_backbone
     if ignore_backbone:
-        include_regex = "|".join(include_backbone)
-        labels = labels[
-            ~(
-                (
-                    labels["acceptor_atom"].isin(["N", "O"])
-                    & ~labels["acceptor"].str.contains(include_regex, regex=True)
-                )
-                | (
-                    labels["donor_atom"].isin(["N", "O"])
-                    & ~labels["donor"].str.contains(include_regex, regex=True)
-                )
-            )
-        ]
+        labels = labels[~backbone_mask(labels, include_backbone)]
     labels = labels.reset_index()
     grouped = labels.groupby(["acceptor", "donor"])["index"].apply(set).reset_index()
 
     return grouped
 
 
-def count_occurrences(file_path, labels):
+def read_gnu_chunks(file_path, chunk_size=HBOND_CHUNK_SIZE):
+    """
+    Streams the hbond series of a CPPTraj gnu file in chunks of whole frames.
+
+    Each data line holds the frame, the hbond index and whether the hbond is present.
+    Chunks are parsed with the pandas C reader and any frame cut off at the end of a chunk
+    is carried over to the next one, so memory is bounded by the chunk size.
+
+    Parameters
+    ----------
+    file_path: str
+        Path to hbond.gnu file
+    chunk_size: int
+        Approximate number of characters parsed at once
+
+    Yields
+    ------
+    frame_count: int
+        Number of frames with data completed in this chunk,
+        blank blocks such as the one before the closing "end" are not frames
+    frames: np.ndarray
+        Zero-based frame number of every hbond present in this chunk
+    bonds: np.ndarray
+        Index of every hbond present in this chunk, matching the labels from bond_labels()
+    """
+    carry = np.empty((0, 3))
+    first_frame = 0
+    with open(file_path, "r") as f:
+        for _ in range(8):
+            f.readline()
+        while True:
+            text = f.read(chunk_size)
+            finished = not text
+            if not finished:
+                # Finish the current line so no row is split between chunks
+                text += f.readline()
+                if "end" in text:
+                    text = text[: text.index("end")]
+                    finished = True
+
+            # The C parser of pandas is the fastest way to turn the text into numbers
+            if text.strip():
+                data = pd.read_csv(io.StringIO(text), sep=r"\s+", header=None, dtype=float)
+                data = np.concatenate([carry, data.to_numpy()[:, :3]])
+            else:
+                data = carry
+            frame_ids = data[:, 0]
+            frame_starts = np.flatnonzero(frame_ids[1:] != frame_ids[:-1]) + 1
+
+            # Keep the last frame back until we know it is complete
+            if finished:
+                carry = data[:0]
+            else:
+                cut = frame_starts[-1] if len(frame_starts) else 0
+                carry, data = data[cut:], data[:cut]
+                frame_starts = frame_starts[frame_starts < cut]
+
+            frames = np.zeros(len(data), dtype=np.int64)
+            frames[frame_starts] = 1
+            frames = first_frame + np.cumsum(frames)
+            present = data[:, 2].astype(int) == 1
+            # Frames are counted from the data so empty blocks are never frames
+            frame_count = len(frame_starts) + 1 if len(data) else 0
+            first_frame += frame_count
+
+            yield frame_count, frames[present], data[present, 1].astype(np.int64)
+            if finished:
+                break
+
+
+def group_lookup(labels):
+    """
+    Maps every hbond index to the row of its residue pair in the labels DataFrame.
+
+    Parameters
+    ----------
+    labels: pd.DataFrame
+        DataFrame from bond_labels() with a set of hbond indices per residue pair
+
+    Returns
+    -------
+    lookup: np.ndarray
+        Row of each hbond index, -1 for hbonds that were filtered out
+    """
+    max_index = max((max(bonds) for bonds in labels["index"] if bonds), default=-1)
+    lookup = np.full(max_index + 1, -1, dtype=np.int64)
+    for row, bonds in enumerate(labels["index"]):
+        lookup[list(bonds)] = row
+
+    return lookup
+
+
+def build_occupancy_matrix(frames, bonds, frame_count, bond_count):
+    """
+    Assembles the hbonds present in each frame into a sparse boolean matrix.
+
+    Parameters
+    ----------
+    frames: list[np.ndarray]
+        Frame number of each present hbond, one array per chunk from read_gnu_chunks()
+    bonds: list[np.ndarray]
+        Index of each present hbond, one array per chunk from read_gnu_chunks()
+    frame_count: int
+        Total number of frames, the number of rows
+    bond_count: int
+        Number of columns, at least one more than the largest hbond index
+
+    Returns
+    -------
+    occupancy: scipy.sparse.csr_matrix
+        Frames x hbond index matrix that is True where the hbond is present
+    """
+    rows = np.concatenate(frames) if frames else np.empty(0, dtype=np.int64)
+    cols = np.concatenate(bonds) if bonds else np.empty(0, dtype=np.int64)
+    bond_count = max(bond_count, cols.max() + 1 if len(cols) else 0)
+    occupancy = sparse.coo_matrix(
+        (np.ones(len(rows), dtype=bool), (rows, cols)), shape=(frame_count, bond_count)
+    ).tocsr()
+
+    return occupancy
+
+
+def save_occupancy_matrix(occupancy, matrix_file):
+    """
+    Saves a frames x hbond occupancy matrix in compressed sparse format.
+
+    Parameters
+    ----------
+    occupancy: scipy.sparse.csr_matrix
+        Matrix from build_occupancy_matrix()
+    matrix_file: str
+        Path of the .npz file to write
+    """
+    sparse.save_npz(matrix_file, occupancy, compressed=True)
+
+
+def load_occupancy_matrix(matrix_file):
+    """
+    Loads an occupancy matrix saved by save_occupancy_matrix().
+
+    Rows are frames and columns are hbond indices as listed in the gnu labels,
+    so time-resolved analyses can be done without parsing hbond.gnu again.
+
+    Parameters
+    ----------
+    matrix_file: str
+        Path of the saved .npz file
+
+    Returns
+    -------
+    occupancy: scipy.sparse.csr_matrix
+        Frames x hbond index boolean matrix
+    """
+    return sparse.load_npz(matrix_file).tocsr()
+
+
+def matrix_is_current(matrix_file, gnu_file):
+    """
+    Checks that a saved occupancy matrix was built from the current hbond.gnu.
+
+    Parameters
+    ----------
+    matrix_file: str
+        Path of the saved .npz file
+    gnu_file: str
+        Path to the hbond.gnu file the matrix was built from
+
+    Returns
+    -------
+    current: bool
+        True if the matrix exists and is not older than hbond.gnu
+    """
+    if not Path(matrix_file).is_file():
+        return False
+
+    return os.stat(matrix_file).st_mtime_ns >= os.stat(gnu_file).st_mtime_ns
+
+
+def count_groups(frames, bonds, lookup, group_count):
+    """
+    Counts the frames in which each residue pair has at least one hbond.
+
+    Parameters
+    ----------
+    frames: np.ndarray
+        Frame number of each present hbond
+    bonds: np.ndarray
+        Index of each present hbond
+    lookup: np.ndarray
+        Residue pair row of each hbond index from group_lookup()
+    group_count: int
+        Number of residue pairs
+
+    Returns
+    -------
+    counts: np.ndarray
+        Number of frames containing each residue pair
+    """
+    # Ignore hbonds beyond the labelled range or filtered out of the labels
+    in_range = bonds < len(lookup)
+    groups = lookup[bonds[in_range]]
+    frames = frames[in_range][groups >= 0]
+    groups = groups[groups >= 0]
+    # Count each residue pair at most once per frame
+    pairs = np.unique(frames * group_count + groups)
+
+    return np.bincount(pairs % group_count, minlength=group_count)
+
+
+def count_occurrences(file_path, labels, matrix_file=None):
     """
     Counts percent occurrences of each hydrogen bond.
 
+    The gnu file is streamed in chunks.
+    Hbond indices are mapped to their residue pair with an integer lookup array
+    and the frames containing each pair are counted with np.bincount.
+
     Parameters
     ----------
     file_path: str
         Path to hbond.gnu file
     labels: str
         Hbond labels as outputted by CPPTRAJ in gnu format
+    matrix_file: str, optional
+        If given, the frames x hbond occupancy matrix is also saved here in sparse format
 
     Returns
     -------
@@ -124,25 +368,224 @@ def count_occurrences(file_path, labels):
     frame_count: total number of frames in trajectory
     """
 
-    labels["count"] = 0
+    lookup = group_lookup(labels)
+    group_count = len(labels)
+    counts = np.zeros(group_count, dtype=np.int64)
     frame_count = 0
-    with open(file_path, "r") as f:
-        for _ in range(8):
-            next(f)
-        for frame in f.read().split("\n\n"):
-            frame_count += 1
-            bonds = set()
-            for line in frame.split("\n"):
-                if line == "end":
-                    break
-                arr = [int(float(x)) for x in line.split(" ") if x]
-                if arr[-1] == 1:
-                    bonds.add(arr[1])
-            contains_bond = [len(i & bonds) != 0 for i in labels["index"]]
-            labels.loc[contains_bond, "count"] += 1
+    present_frames, present_bonds = [], []
+    for chunk_frames, frames, bonds in read_gnu_chunks(file_path):
+        frame_count += chunk_frames
+        if matrix_file:
+            present_frames.append(frames)
+            present_bonds.append(bonds)
+        counts += count_groups(frames, bonds, lookup, group_count)
+    labels["count"] = counts
+
+    if matrix_file:
+        occupancy = build_occupancy_matrix(present_frames, present_bonds, frame_count, len(lookup))
+        save_occupancy_matrix(occupancy, matrix_file)
     return labels, frame_count
 
 
+def pair_time_series(occupancy, labels):
+    """
+    Collapses the hbond occupancy matrix into one time series per residue pair.
+
+    Parameters
+    ----------
+    occupancy: scipy.sparse.csr_matrix
+        Frames x hbond index matrix from build_occupancy_matrix()
+    labels: pd.DataFrame
+        DataFrame from bond_labels() with a set of hbond indices per residue pair
+
+    Returns
+    -------
+    series: scipy.sparse.csc_matrix
+        Frames x residue pair boolean matrix, True if any hbond of the pair is present
+    """
+    lookup = group_lookup(labels)
+    bonds = np.flatnonzero(lookup >= 0)
+    bonds = bonds[bonds < occupancy.shape[1]]
+    # Indicator matrix mapping each hbond index to its residue pair
+    grouping = sparse.csr_matrix(
+        (np.ones(len(bonds)), (bonds, lookup[bonds])), shape=(occupancy.shape[1], len(labels))
+    )
+    series = (occupancy.astype(float) @ grouping) > 0
+
+    return series.tocsc()
+
+
+def intermittent_acf(series, max_lag):
+    """
+    Intermittent hbond autocorrelation <h(0)h(t)>/<h> computed with an FFT.
+
+    The bond may break and reform between the two time origins.
+
+    Parameters
+    ----------
+    series: np.ndarray
+        Boolean presence of the hbond in each frame
+    max_lag: int
+        Largest lag in frames to return
+
+    Returns
+    -------
+    acf: np.ndarray
+        Autocorrelation for lags 0 to max_lag, 1 at lag 0
+    """
+    frame_count = len(series)
+    if not series.any():
+        return np.zeros(max_lag + 1)
+    # Zero padding to twice the length avoids the circular wrap of the FFT
+    fft_length = next_fast_len(2 * frame_count)
+    transform = np.fft.rfft(series.astype(float), fft_length)
+    correlation = np.fft.irfft(transform * transform.conj(), fft_length)[: max_lag + 1]
+    # Average over the number of time origins available at each lag
+    correlation /= frame_count - np.arange(max_lag + 1)
+
+    return correlation / correlation[0]
+
+
+def continuous_acf(series, max_lag):
+    """
+    Continuous hbond autocorrelation <h(0)H(t)>/<h> computed from run lengths.
+
+    H(t) is 1 only if the bond stayed formed for every frame from 0 to t.
+    A run of L frames contributes max(L - t, 0) time origins at lag t,
+    so the whole function follows from a histogram of the run lengths.
+
+    Parameters
+    ----------
+    series: np.ndarray
+        Boolean presence of the hbond in each frame
+    max_lag: int
+        Largest lag in frames to return
+
+    Returns
+    -------
+    acf: np.ndarray
+        Autocorrelation for lags 0 to max_lag, 1 at lag 0
+    runs: np.ndarray
+        Length in frames of every uninterrupted stretch of the hbond
+    """
+    frame_count = len(series)
+    edges = np.diff(np.concatenate([[0], series.astype(np.int8), [0]]))
+    runs = np.flatnonzero(edges == -1) - np.flatnonzero(edges == 1)
+    if not len(runs):
+        return np.zeros(max_lag + 1), runs
+
+    lags = np.arange(max_lag + 1)
+    histogram = np.bincount(runs, minlength=max_lag + 2).astype(float)
+    lengths = np.arange(len(histogram))
+    # Sums over all runs longer than each lag
+    longer = np.cumsum(histogram[::-1])[::-1]
+    longer_frames = np.cumsum((histogram * lengths)[::-1])[::-1]
+    origins = longer_frames[lags + 1] - lags * longer[lags + 1]
+    correlation = origins / (frame_count - lags)
+
+    return correlation / correlation[0], runs
+
+
+def hbond_lifetimes(occupancy, labels, max_lag=None, timestep=1.0):
+    """
+    Computes lifetimes and autocorrelation functions for every residue pair.
+
+    Parameters
+    ----------
+    occupancy: scipy.sparse.csr_matrix
+        Frames x hbond index matrix from build_occupancy_matrix()
+    labels: pd.DataFrame
+        DataFrame from bond_labels() with a set of hbond indices per residue pair
+    max_lag: int, optional
+        Largest lag in frames, defaults to half the trajectory
+    timestep: float
+        Time between frames, used for the lifetimes and lag column
+
+    Returns
+    -------
+    summary: pd.DataFrame
+        Occupancy, mean continuous lifetime and integrated correlation times per pair
+    continuous: pd.DataFrame
+        Continuous autocorrelation, one column per pair
+    intermittent: pd.DataFrame
+        Intermittent autocorrelation, one column per pair
+    """
+    series = pair_time_series(occupancy, labels)
+    frame_count = series.shape[0]
+    # A correlation needs at least one lag beyond the time origin
+    if frame_count < 2:
+        raise ValueError(f"Lifetimes need at least two frames but the trajectory has {frame_count}.")
+    if max_lag is None:
+        max_lag = frame_count // 2
+    if max_lag < 1:
+        raise ValueError(f"max_lag must be at least one frame, not {max_lag}.")
+    max_lag = min(max_lag, frame_count - 1)
+
+    names = (labels["acceptor"] + "-" + labels["donor"]).tolist()
+    rows = []
+    continuous, intermittent = {}, {}
+    for column, name in enumerate(names):
+        present = series[:, column].toarray().ravel()
+        continuous[name], runs = continuous_acf(present, max_lag)
+        intermittent[name] = intermittent_acf(present, max_lag)
+        rows.append(
+            {
+                "pair": name,
+                "occupancy": present.mean(),
+                "events": len(runs),
+                "mean_lifetime": runs.mean() * timestep if len(runs) else 0.0,
+                "tau_continuous": trapezoid(continuous[name], dx=timestep),
+                "tau_intermittent": trapezoid(intermittent[name], dx=timestep),
+            }
+        )
+
+    lag_index = pd.Index(np.arange(max_lag + 1) * timestep, name="lag")
+    summary = pd.DataFrame(rows).set_index("pair")
+    continuous = pd.DataFrame(continuous, index=lag_index)
+    intermittent = pd.DataFrame(intermittent, index=lag_index)
+
+    return summary, continuous, intermittent
+
+
+def analyze_lifetimes(file_path, max_lag=None, timestep=1.0):
+    """
+    Driver for the hbond lifetime analysis of a single hbond.gnu file.
+
+    Reuses hbond_occupancy.npz if it is newer than hbond.gnu,
+    otherwise hbond.gnu is parsed and the matrix saved.
+    Writes hbond_lifetimes.csv, hbond_acf_continuous.csv and hbond_acf_intermittent.csv.
+
+    Parameters
+    ----------
+    file_path: str
+        Path to the directory containing hbond.gnu
+    max_lag: int, optional
+        Largest lag in frames, defaults to half the trajectory
+    timestep: float
+        Time between frames
+    """
+    path = file_path + "hbond.gnu"
+    matrix_file = file_path + "hbond_occupancy.npz"
+    labels = bond_labels(path)
+    if matrix_is_current(matrix_file, path):
+        print(f"   > {matrix_file} already exists")
+        occupancy = load_occupancy_matrix(matrix_file)
+    else:
+        if Path(matrix_file).is_file():
+            print(f"   > {path} is newer than {matrix_file}, rebuilding it")
+        print(f"   > Processing: {path}")
+        count_occurrences(path, labels.copy(), matrix_file)
+        occupancy = load_occupancy_matrix(matrix_file)
+
+    summary, continuous, intermittent = hbond_lifetimes(occupancy, labels, max_lag, timestep)
+    summary.to_csv(file_path + "hbond_lifetimes.csv")
+    continuous.to_csv(file_path + "hbond_acf_continuous.csv")
+    intermittent.to_csv(file_path + "hbond_acf_intermittent.csv")
+    print(f"   > Lifetimes for {len(summary)} residue pairs written to {file_path}hbond_lifetimes.csv")
+
+    return summary
+
+
 def process_data(count_df, frame_count, name, substrate):
     """
     Cleans up hbonding data (formats residue names, dataframe index, etc.)
@@ -264,23 +707,26 @@ def plot(data, file_path):
 
 def plot_multi(data, file_path):
     """
-    Plot hbonding comparison between two trajectories.
+    Plot hbonding comparison between two or more trajectories.
 
     Parameters
     ----------
-    data: list of two dataframes
+    data: list of dataframes
     file_path: path to directory where output image should go
 
     """
     figure_formatting()
     new_df = (
-        pd.merge(data[0], data[1], on=["residue", "position"], how="inner")
+        functools.reduce(
+            lambda left, right: pd.merge(left, right, on=["residue", "position"], how="inner"), data
+        )
         .sort_index()
         .sort_values("position")
     )
     new_df = new_df.dropna(axis=0).drop(["position"], axis=1)
     new_df = new_df[new_df.ge(0.1).all(axis=1)]  # 10% ocurrence cutoff
-    ax = new_df.plot.bar(color=["Blue", "Red", "Orange"])
+    colors = ["Blue", "Red", "Orange"] if len(data) <= 3 else None
+    ax = new_df.plot.bar(color=colors)
     ax.set_ylabel("occurrence (%)", weight="bold")
     ax.set_xlabel("residue", weight="bold")
     ax.legend(bbox_to_anchor=(1.34, 1.02), frameon=False)
@@ -297,7 +743,127 @@ def plot_multi(data, file_path):
         )
 
 
-def analyze_hbonds(file_paths, names, substrate):
+def count_replicate(path):
+    """
+    Parses the labels and counts the hbonds of one replicate.
+
+    Parameters
+    ----------
+    path: str
+        Path to hbond.gnu file
+
+    Returns
+    -------
+    count_df: pd.DataFrame
+        Residue pairs with their hbond counts, see count_occurrences()
+    frame_count: int
+        Number of frames in the replicate
+    """
+    label_df = bond_labels(path)
+    return count_occurrences(path, label_df)
+
+
+def merge_replicates(results, substrate):
+    """
+    Combines the hbond counts of several replicates into one table.
+
+    Parameters
+    ----------
+    results: list[tuple]
+        (count_df, frame_count) of each replicate from count_replicate()
+    substrate: str
+        Residue name of the substrate
+
+    Returns
+    -------
+    merged_df: pd.DataFrame
+        Percent occurrence per replicate, their mean and standard error, indexed by residue
+    """
+    occurrences = []
+    for replicate, (count_df, frame_count) in enumerate(results, start=1):
+        occurrence = count_df.set_index(["acceptor", "donor"])["count"] / frame_count
+        occurrences.append(occurrence.rename(f"rep_{replicate}"))
+    # Residue pairs missing from a replicate never formed in it
+    occurrences = pd.concat(occurrences, axis=1).fillna(0.0)
+    replicate_columns = occurrences.columns
+
+    mean_df = occurrences.mean(axis=1).rename("count").reset_index()
+    merged_df = process_data(mean_df, 1, "mean", substrate)
+    for column in replicate_columns:
+        merged_df[column] = occurrences[column].to_numpy() * 100
+    sem = occurrences.std(axis=1, ddof=1) / np.sqrt(len(replicate_columns))
+    merged_df["sem"] = sem.fillna(0.0).to_numpy() * 100
+
+    return merged_df[[*replicate_columns, "mean", "sem", "position"]]
+
+
+def plot_replicates(data, file_path):
+    """
+    Plot the mean hbond occurrence across replicates with standard error bars.
+
+    Parameters
+    ----------
+    data: pd.DataFrame
+        Table from merge_replicates()
+    file_path: str
+        Path to directory where output image should go
+
+    """
+    figure_formatting()
+    df = data.sort_values("position")
+    df = df[df["mean"].ge(0.1)]  # 10% occurence cutoff
+    df = df.sort_values(by="mean", ascending=False).head(15)
+
+    ax = df["mean"].plot.bar(yerr=df["sem"], color="darkgray", capsize=3, figsize=(4, 4))
+    ax.set_ylabel("occurrence (%)", weight="bold")
+    ax.set_xlabel("residue", weight="bold")
+    ax.tick_params(axis="x", labelrotation=90)
+
+    extensions = ["png", "svg"]
+    for ext in extensions:
+        plt.savefig(file_path + f"hbond_replicates.{ext}", format=ext, dpi=600, bbox_inches="tight")
+
+
+def analyze_replicates(file_paths, substrate, processes=None):
+    """
+    Driver for analyzing replicate hbond.gnu files in parallel.
+
+    Each replicate is parsed in its own worker process.
+    The counts are then merged into hbond_replicates.csv in the first directory,
+    with the mean and standard error of the occurrence across replicates.
+
+    Parameters
+    ----------
+    file_paths: list[str]
+        A list of directories containing hbond.gnu files
+    substrate: str
+        Residue name of the substrate
+    processes: int, optional
+        Number of worker processes, defaults to one per core up to the number of replicates
+
+    Returns
+    -------
+    merged_df: pd.DataFrame
+        The merged occurrence table, None if there are no replicates
+    """
+    if not file_paths:
+        print("   > No replicates to analyze")
+        return None
+
+    paths = [file_path + "hbond.gnu" for file_path in file_paths]
+    processes = pool_size(len(paths), processes)
+    print(f"   > Processing {len(paths)} replicates with {processes} processes")
+    results = map_tasks(count_replicate, [(path,) for path in paths], processes)
+
+    merged_df = merge_replicates(results, substrate)
+    merged_df.to_csv(file_paths[0] + "hbond_replicates.csv")
+    plot_replicates(merged_df, file_paths[0])
+    print(f"   > Merged results written to {file_paths[0]}hbond_replicates.csv")
+
+    return merged_df
+
+
+def analyze_hbonds(file_paths, names, substrate, save_matrix=False):
     """
     Driver for analyzing hbonds from hbond.gnu file
 
@@ -307,19 +873,27 @@ def analyze_hbonds(file_paths, names, substrate):
         A list of paths to hbond.gnu files
     names: list[str]
         A list of names of each hbond.gnu files
+    save_matrix: bool
+        Also save the frames x hbond occupancy matrix as hbond_occupancy.npz,
+        which analyze_lifetimes() then reuses
     """
     data = []
     for file_path, name in zip(file_paths, names):
         data_path = Path(file_path + "hbond.csv")
+        path = file_path + "hbond.gnu"
+        matrix_file = file_path + "hbond_occupancy.npz" if save_matrix else None
         if data_path.is_file():
             print(f"   > {data_path} already exists")
             d = pd.read_csv(file_path + "hbond.csv")
             d = d.set_index("residue")
+            # The table can predate the matrix, which then still has to be built
+            if matrix_file and not matrix_is_current(matrix_file, path):
+                print(f"   > Saving the occupancy matrix: {matrix_file}")
+                count_occurrences(path, bond_labels(path), matrix_file)
         else:
-            path = file_path + "hbond.gnu"
             print(f"   > Processing: {path}")
             label_df = bond_labels(path)
-            count_df, frame_count = count_occurrences(path, label_df)
+            count_df, frame_count = count_occurrences(path, label_df, matrix_file)
             d = process_data(count_df, frame_count, name, substrate)
             d.to_csv(file_path + "hbond.csv")
         plot(d, file_path)
@@ -0,0 +1,394 @@
+"""Detect hydrogen bonds directly from an MD trajectory with MDAnalysis."""
+
+import MDAnalysis as mda
+from MDAnalysis.lib.distances import calc_angles, capped_distance
+import numpy as np
+import pandas as pd
+import os
+import time
+import warnings
+
+from pyqmmm.md.hbond_analyzer import (
+    backbone_mask,
+    count_groups,
+    group_lookup,
+    build_occupancy_matrix,
+    save_occupancy_matrix,
+    load_occupancy_matrix,
+    process_data,
+    plot,
+)
+from pyqmmm.md.worker_pool import map_tasks, pool_size
+
+# Ignore MDAnalysis UserWarnings
+warnings.filterwarnings("ignore", category=UserWarning, module="MDAnalysis")
+
+# Same defaults as the CPPTraj script from amber_toolkit.calculate_hbonds_script()
+HBOND_SELECTION = "not resname WAT HOH NA+ Na+ CL- Cl-"
+HBOND_DISTANCE = 3.2
+HBOND_ANGLE = 135.0
+# Elements that can donate or accept an hbond
+HBOND_ELEMENTS = ("N", "O", "F")
+# Outputs kept apart from the hbond.gnu matrix, whose columns are numbered differently
+NATIVE_MATRIX_FILE = "hbond_native_occupancy.npz"
+NATIVE_LABELS_FILE = "hbond_native_labels.csv"
+
+
+def load_universe(topology, trajectory):
+    """
+    Loads a trajectory, reading CPPTraj .crd/.mdcrd files as AMBER ASCII trajectories.
+
+    Parameters
+    ----------
+    topology: str
+        Path to the topology file (e.g., prmtop)
+    trajectory: str
+        Path to the trajectory file
+
+    Returns
+    -------
+    universe: MDAnalysis.Universe
+    """
+    if os.path.splitext(trajectory)[1] in (".crd", ".mdcrd"):
+        return mda.Universe(topology, trajectory, format="TRJ")
+    return mda.Universe(topology, trajectory)
+
+
+def hbond_candidates(universe, selection=HBOND_SELECTION):
+    """
+    Finds every donor, hydrogen and acceptor that could form an hbond.
+
+    Donors are N, O or F atoms with a bonded hydrogen, one entry per hydrogen.
+    Acceptors are all N, O and F atoms in the selection.
+
+    Parameters
+    ----------
+    universe: MDAnalysis.Universe
+        Universe with bonds, e.g., loaded from a prmtop
+    selection: str
+        MDAnalysis selection of the atoms to consider
+
+    Returns
+    -------
+    donors: np.ndarray
+        Atom index of the heavy atom donating each hydrogen
+    hydrogens: np.ndarray
+        Atom index of each donated hydrogen
+    acceptors: np.ndarray
+        Atom index of each acceptor
+    """
+    # Older prmtop files have no ATOMIC_NUMBER section
+    if not hasattr(universe.atoms, "elements"):
+        universe.guess_TopologyAttrs(to_guess=["elements"])
+    atoms = universe.select_atoms(selection)
+    polar = np.isin(atoms.elements, HBOND_ELEMENTS)
+    acceptors = atoms[polar]
+
+    donors, hydrogens = [], []
+    for hydrogen in atoms[atoms.elements == "H"]:
+        for heavy in hydrogen.bonded_atoms:
+            if heavy.element in HBOND_ELEMENTS:
+                donors.append(heavy.index)
+                hydrogens.append(hydrogen.index)
+                break
+
+    return np.array(donors, dtype=np.int64), np.array(hydrogens, dtype=np.int64), acceptors.indices
+
+
+def detect_block(topology, trajectory, donors, hydrogens, acceptors, frames, distance, angle, intermolecular):
+    """
+    Detects the hbonds present in a block of frames.
+    Each frame, donor-acceptor pairs within the distance cutoff are found with a
+    KD-tree or cell-list neighbor search and then filtered by the D-H...A angle.
+
+    Parameters
+    ----------
+    topology: str
+        Path to the topology file
+    trajectory: str
+        Path to the trajectory file
+    donors: np.ndarray
+        Donor atom indices from hbond_candidates()
+    hydrogens: np.ndarray
+        Hydrogen atom indices from hbond_candidates()
+    acceptors: np.ndarray
+        Acceptor atom indices from hbond_candidates()
+    frames: range
+        Trajectory frames to analyze
+    distance: float
+        Maximum donor-acceptor distance in Angstrom
+    angle: float
+        Minimum donor-hydrogen-acceptor angle in degrees
+    intermolecular: bool
+        Ignore hbonds where the donor and acceptor are in the same molecule
+
+    Returns
+    -------
+    present_frames: np.ndarray
+        Frame of each detected hbond, counted from the first analyzed frame
+    pairs: np.ndarray
+        Hydrogen position times the number of acceptors plus acceptor position of each hbond
+    """
+    universe = load_universe(topology, trajectory)
+    donor_atoms = universe.atoms[donors]
+    hydrogen_atoms = universe.atoms[hydrogens]
+    acceptor_atoms = universe.atoms[acceptors]
+    donor_fragments = donor_atoms.fragindices if intermolecular else None
+    acceptor_fragments = acceptor_atoms.fragindices if intermolecular else None
+
+    present_frames, pairs = [], []
+    for ts in universe.trajectory[frames.start:frames.stop:frames.step]:
+        box = ts.dimensions
+        # Each positions access copies the coordinates, so read them once per frame
+        donor_positions = donor_atoms.positions
+        hydrogen_positions = hydrogen_atoms.positions
+        acceptor_positions = acceptor_atoms.positions
+        hits = capped_distance(donor_positions, acceptor_positions, distance, box=box, return_distances=False)
+        donor, acceptor = hits[:, 0], hits[:, 1]
+        # A donor cannot accept its own hbond
+        keep = donors[donor] != acceptors[acceptor]
+        if intermolecular:
+            keep &= donor_fragments[donor] != acceptor_fragments[acceptor]
+        donor, acceptor = donor[keep], acceptor[keep]
+        angles = np.degrees(
+            calc_angles(
+                donor_positions[donor],
+                hydrogen_positions[donor],
+                acceptor_positions[acceptor],
+                box=box,
+            )
+        )
+        formed = angles >= angle
+        frame = (ts.frame - frames.start) // frames.step
+        present_frames.append(np.full(formed.sum(), frame, dtype=np.int64))
+        pairs.append(donor[formed] * len(acceptors) + acceptor[formed])
+
+    if not present_frames:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(present_frames), np.concatenate(pairs)
+
+
+def hbond_labels(universe, donors, hydrogens, acceptors, pairs):
+    """
+    Builds CPPTraj style labels for the detected hbonds.
+
+    Parameters
+    ----------
+    universe: MDAnalysis.Universe
+    donors: np.ndarray
+        Donor atom indices from hbond_candidates()
+    hydrogens: np.ndarray
+        Hydrogen atom indices from hbond_candidates()
+    acceptors: np.ndarray
+        Acceptor atom indices from hbond_candidates()
+    pairs: np.ndarray
+        Unique hbond pair codes from detect_block()
+
+    Returns
+    -------
+    labels: pd.DataFrame
+        Same columns as bond_labels() before grouping, indexed by hbond index
+    """
+    donor_atoms = universe.atoms[donors[pairs // len(acceptors)]]
+    hydrogen_atoms = universe.atoms[hydrogens[pairs // len(acceptors)]]
+    acceptor_atoms = universe.atoms[acceptors[pairs % len(acceptors)]]
+
+    def residue_names(atoms):
+        return [f"{resname}_{resid}" for resname, resid in zip(atoms.resnames, atoms.resids)]
+
+    labels = pd.DataFrame(
+        {
+            "acceptor": residue_names(acceptor_atoms),
+            "donor": residue_names(donor_atoms),
+            "hydrogen": hydrogen_atoms.names,
+            "acceptor_atom": acceptor_atoms.names,
+            "donor_atom": donor_atoms.names,
+        }
+    )
+
+    return labels
+
+
+def group_native_labels(labels, ignore_backbone=True, include_backbone=tuple("DHK")):
+    """
+    Groups per-hbond labels into residue pairs, as bond_labels() does for hbond.gnu.
+
+    Parameters
+    ----------
+    labels: pd.DataFrame
+        Labels from hbond_labels(), indexed by hbond index
+    ignore_backbone: bool
+        Whether to ignore backbone hydrogen bonds (donor/acceptor named N or O)
+    include_backbone: tuple(str)
+        If ignore_backbone, these residues are the exception
+
+    Returns
+    -------
+    grouped: pd.DataFrame
+        DataFrame containing residue pair and interaction index
+    """
+    if ignore_backbone:
+        labels = labels[~backbone_mask(labels, include_backbone)]
+    labels = labels.reset_index()
+
+    return labels.groupby(["acceptor", "donor"])["index"].apply(set).reset_index()
+
+
+def load_native_occupancy(file_path="./", ignore_backbone=True, include_backbone=tuple("DHK")):
+    """
+    Loads the occupancy matrix and labels saved by analyze_native_hbonds().
+
+    The result can be passed straight to hbond_analyzer.hbond_lifetimes().
+
+    Parameters
+    ----------
+    file_path: str
+        Directory containing hbond_native_occupancy.npz and hbond_native_labels.csv
+    ignore_backbone: bool
+        Whether to ignore backbone hydrogen bonds (donor/acceptor named N or O)
+    include_backbone: tuple(str)
+        If ignore_backbone, these residues are the exception
+
+    Returns
+    -------
+    occupancy: scipy.sparse.csr_matrix
+        Frames x hbond index boolean matrix
+    labels: pd.DataFrame
+        DataFrame containing residue pair and interaction index
+    """
+    occupancy = load_occupancy_matrix(file_path + NATIVE_MATRIX_FILE)
+    # Names such as NA must stay strings
+    labels = pd.read_csv(file_path + NATIVE_LABELS_FILE, index_col="index", keep_default_na=False)
+
+    return occupancy, group_native_labels(labels, ignore_backbone, include_backbone)
+
+
+def detect_hbonds(
+    topology,
+    trajectory,
+    selection=HBOND_SELECTION,
+    distance=HBOND_DISTANCE,
+    angle=HBOND_ANGLE,
+    intermolecular=True,
+    ignore_backbone=True,
+    include_backbone=tuple("DHK"),
+    processes=None,
+    matrix_file=None,
+    labels_file=None,
+):
+    """
+    Counts hydrogen bonds directly from a trajectory instead of a CPPTraj hbond.gnu file.
+
+    The trajectory is split into contiguous blocks of frames analyzed in parallel.
+    The result has the same layout as count_occurrences() so it can be passed to process_data().
+
+    Parameters
+    ----------
+    topology: str
+        Path to the topology file (e.g., prmtop)
+    trajectory: str
+        Path to the trajectory file
+    selection: str
+        MDAnalysis selection of the atoms to consider, solvent and ions are stripped by default
+    distance: float
+        Maximum donor-acceptor distance in Angstrom
+    angle: float
+        Minimum donor-hydrogen-acceptor angle in degrees
+    intermolecular: bool
+        Keep only hbonds between different molecules, like CPPTraj nointramol
+    ignore_backbone: bool
+        Whether to ignore backbone hydrogen bonds (donor/acceptor named N or O)
+    include_backbone: tuple(str)
+        If ignore_backbone, these residues are the exception
+    processes: int, optional
+        Number of worker processes, defaults to one per core
+    matrix_file: str, optional
+        If given, the frames x hbond occupancy matrix is also saved here in sparse format
+    labels_file: str, optional
+        If given, the label of every matrix column is saved here as a CSV indexed by hbond index
+
+    Returns
+    -------
+    labels: pd.DataFrame
+        Residue pairs with their hbond indices and counts
+    frame_count: int
+        Number of frames analyzed
+    """
+    universe = load_universe(topology, trajectory)
+    donors, hydrogens, acceptors = hbond_candidates(universe, selection)
+    frame_count = len(universe.trajectory)
+    processes = pool_size(frame_count, processes)
+    print(f"   > {len(hydrogens)} donor hydrogens and {len(acceptors)} acceptors")
+    print(f"   > Analyzing {frame_count} frames with {processes} processes")
+
+    bounds = np.linspace(0, frame_count, processes + 1).astype(int)
+    blocks = [range(start, stop) for start, stop in zip(bounds[:-1], bounds[1:])]
+    arguments = [
+        (topology, trajectory, donors, hydrogens, acceptors, block, distance, angle, intermolecular)
+        for block in blocks
+    ]
+    results = map_tasks(detect_block, arguments, processes)
+
+    frames = np.concatenate([block.start + block_frames for block, (block_frames, _) in zip(blocks, results)])
+    pairs = np.concatenate([block_pairs for _, block_pairs in results])
+    # Number the hbonds that formed at least once
+    unique_pairs, bonds = np.unique(pairs, return_inverse=True)
+    bonds = bonds.reshape(-1)
+
+    bond_table = hbond_labels(universe, donors, hydrogens, acceptors, unique_pairs)
+    labels = group_native_labels(bond_table, ignore_backbone, include_backbone)
+    labels["count"] = count_groups(frames, bonds, group_lookup(labels), len(labels))
+
+    if matrix_file:
+        occupancy = build_occupancy_matrix([frames], [bonds], frame_count, len(unique_pairs))
+        save_occupancy_matrix(occupancy, matrix_file)
+    if labels_file:
+        # Every detected hbond is kept so the backbone filter can be chosen when loading
+        bond_table.to_csv(labels_file, index_label="index")
+    return labels, frame_count
+
+
+def analyze_native_hbonds(topology, trajectory, name, substrate, file_path="./", processes=None, save_matrix=False):
+    """
+    Driver for analyzing hbonds without submitting a CPPTraj job.
+
+    Writes hbond.csv and the occupancy plot to file_path, the same outputs as
+    hbond_analyzer.analyze_hbonds() produces from hbond.gnu.
+
+    Parameters
+    ----------
+    topology: str
+        Path to the topology file (e.g., prmtop)
+    trajectory: str
+        Path to the trajectory file
+    name: str
+        System name
+    substrate: str
+        Residue name of the substrate
+    file_path: str
+        Directory for the outputs
+    processes: int, optional
+        Number of worker processes, defaults to one per core
+    save_matrix: bool
+        Also save the frames x hbond occupancy matrix as hbond_native_occupancy.npz
+        and its column labels as hbond_native_labels.csv, see load_native_occupancy()
+
+    Returns
+    -------
+    data: pd.DataFrame
+        The processed occupancy table
+    """
+    start_time = time.time()
+    print(f"   > Detecting hbonds in: {trajectory}")
+    matrix_file = file_path + NATIVE_MATRIX_FILE if save_matrix else None
+    labels_file = file_path + NATIVE_LABELS_FILE if save_matrix else None
+    count_df, frame_count = detect_hbonds(
+        topology, trajectory, processes=processes, matrix_file=matrix_file, labels_file=labels_file
+    )
+    data = process_data(count_df, frame_count, name, substrate)
+    data.to_csv(file_path + "hbond.csv")
+    plot(data, file_path)
+    total_time = round(time.time() - start_time, 3)
+    print(f"   > Results written to {file_path}hbond.csv in {total_time} seconds")
+
+    return data
@@ -4,6 +4,9 @@ import os
 import sys
 import shutil
 from typing import List
+import numpy as np
+
+from pyqmmm.md.residue_reducer import reduce_by_residue
 
 def clean_dir() -> str:
     """
@@ -162,33 +165,25 @@ def collect_charges(type) -> None:
     mask_atoms = open(f"./2_temp/{type}_mask", "r").readlines()
     link_atoms = open(f"./2_temp/{type}_link_atoms", "r").readlines()
 
-    # Initialize variables and lists
-    prev_res_index = 0
-    tot_charge = []
-    res_list = []
-    tot_charge_link = []
-    res_list_link = []
     mull_charges = open(f"./1_input/{type}_charge.xls", "r").readlines()
 
-    # Loop through each atom in mask file and get residue name and its index
-    for index, line in enumerate(mask_atoms):
-        mask_atom_info = line.split()
-        res_name = mask_atom_info[3]
-        res_index = int(mask_atom_info[4])
-
-        # For each new residue, record the current residue and set as previous
-        if res_index > prev_res_index:
-            res_name_index = res_name + str(res_index)
-            res_list.append(res_name_index)
-            res_list_link.append(res_name_index)
-            tot_charge.append(0.0)
-            tot_charge_link.append(0.0)
-            prev_res_index = res_index
-
-        # Create running list of all charges in charge.xls
-        curr_mull_charges = float(mull_charges[index].split()[2])
-        tot_charge[-1] += curr_mull_charges
-        tot_charge_link[-1] += curr_mull_charges
+    # A new residue starts only when the residue index exceeds every index seen so far,
+    # atoms with a repeated or lower index are added to the current residue
+    mask_atom_info = [line.split() for line in mask_atoms]
+    res_names = np.array([info[3] for info in mask_atom_info], dtype=str)
+    res_indices = np.array([int(info[4]) for info in mask_atom_info])
+    new_residue = res_indices > np.maximum.accumulate(np.r_[0, res_indices[:-1]])
+    starts = np.flatnonzero(new_residue)[np.cumsum(new_residue) - 1]
+    res_name_index = np.char.add(res_names[starts], res_indices[starts].astype(str))
+
+    # Sum the charges of each residue in the mask in one vectorized pass
+    curr_mull_charges = [float(line.split()[2]) for line in mull_charges[:len(mask_atoms)]]
+    per_residue = reduce_by_residue(curr_mull_charges, res_name_index, contiguous=True)
+
+    res_list = per_residue.index.tolist()
+    res_list_link = list(res_list)
+    tot_charge = per_residue["sum"].tolist()
+    tot_charge_link = list(tot_charge)
 
     # Get residue name and index for each line
     for index, line in enumerate(link_atoms):
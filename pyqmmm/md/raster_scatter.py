@@ -0,0 +1,209 @@
+"""Draw very large scatter plots as a density raster instead of one marker per point."""
+
+import numpy as np
+import matplotlib as mpl
+
+
+def marker_bins(ax, s, extent):
+    """
+    Picks a pixel grid whose cells are about the size of a scatter marker.
+
+    The grid only spans the data extent, so the number of cells is scaled by the
+    fraction of the axes the data covers. Explicitly set axes limits are used for that,
+    otherwise the limits are assumed to follow the data as autoscaling would.
+
+    Parameters
+    ----------
+    ax : matplotlib.axes.Axes
+        The axes that will hold the raster.
+    s : float
+        Marker size in points squared, as passed to plt.scatter.
+    extent : tuple
+        The (left, right, bottom, top) data limits of the grid.
+
+    Returns
+    -------
+    bins : tuple
+        Number of cells along x and y.
+
+    """
+    bbox = ax.get_window_extent()
+    width, height = bbox.width / ax.figure.dpi * 72, bbox.height / ax.figure.dpi * 72
+    diameter = np.sqrt(s)
+    left, right, bottom, top = extent
+
+    x_fraction = y_fraction = 1.0
+    if not ax.get_autoscalex_on():
+        x_fraction = (right - left) / abs(np.diff(ax.get_xlim())[0])
+    if not ax.get_autoscaley_on():
+        y_fraction = (top - bottom) / abs(np.diff(ax.get_ylim())[0])
+
+    return max(int(width * x_fraction / diameter), 1), max(int(height * y_fraction / diameter), 1)
+
+
+def fit_limits(ax, x, y):
+    """
+    Fixes the axes limits to those autoscaling would pick for the points.
+
+    Call this before drawing several rasters on the same axes, e.g., one per cluster,
+    so they are all binned with the same cell size.
+
+    Parameters
+    ----------
+    ax : matplotlib.axes.Axes
+        The axes that will hold the rasters.
+    x, y : array
+        Coordinates of all the points that will be drawn.
+
+    """
+    ax.update_datalim(np.column_stack([x, y]))
+    ax.autoscale_view()
+    ax.set_xlim(ax.get_xlim())
+    ax.set_ylim(ax.get_ylim())
+
+
+def density_grid(x, y, bins, extent, values=None):
+    """
+    Aggregates points onto a regular pixel grid.
+
+    Parameters
+    ----------
+    x, y : array
+        Coordinates of the points.
+    bins : tuple
+        Number of cells along x and y.
+    extent : tuple
+        The (left, right, bottom, top) data limits of the grid.
+    values : array, optional
+        A value per point, the largest value in each cell is kept.
+
+    Returns
+    -------
+    grid : array
+        Point count per cell, or the largest value per cell (NaN where empty),
+        with rows ordered from bottom to top for imshow(origin="lower").
+
+    """
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    left, right, bottom, top = extent
+    nx, ny = bins
+    col = np.clip(((x - left) / (right - left) * nx).astype(int), 0, nx - 1)
+    row = np.clip(((y - bottom) / (top - bottom) * ny).astype(int), 0, ny - 1)
+    cell = row * nx + col
+
+    if values is None:
+        return np.bincount(cell, minlength=nx * ny).reshape(ny, nx)
+
+    grid = np.full(nx * ny, -np.inf)
+    np.maximum.at(grid, cell, np.asarray(values, dtype=float))
+    grid[np.isinf(grid)] = np.nan
+
+    return grid.reshape(ny, nx)
+
+
+def data_extent(x, y):
+    """
+    Gets the data limits of the points, widened when all points share a coordinate.
+
+    Parameters
+    ----------
+    x, y : array
+        Coordinates of the points.
+
+    Returns
+    -------
+    extent : tuple
+        The (left, right, bottom, top) limits for imshow.
+
+    """
+    left, right = float(np.min(x)), float(np.max(x))
+    bottom, top = float(np.min(y)), float(np.max(y))
+    if right == left:
+        left, right = left - 0.5, right + 0.5
+    if top == bottom:
+        bottom, top = bottom - 0.5, top + 0.5
+
+    return left, right, bottom, top
+
+
+def raster_scatter(
+    ax,
+    x,
+    y,
+    s=9,
+    color="k",
+    alpha=1.0,
+    c=None,
+    cmap=None,
+    vmin=None,
+    vmax=None,
+    label=None,
+    bins=None,
+):
+    """
+    Draws a scatter plot as an image of aggregated points.
+
+    The image is embedded as a bitmap while the axes, ticks and labels stay vector graphics,
+    so the time to draw and the size of the saved figure do not depend on the number of points.
+
+    Parameters
+    ----------
+    ax : matplotlib.axes.Axes
+        The axes to draw on.
+    x, y : array
+        Coordinates of the points.
+    s : float
+        Marker size in points squared, sets the cell size when bins is not given.
+        Set the axes limits first, or call fit_limits(), when the data does not fill the axes.
+    color : str
+        Color of the points when c is not given.
+        Cells get the opacity that overlapping markers with the given alpha would have.
+    alpha : float
+        Opacity of a single point.
+    c : array, optional
+        A value per point mapped through cmap, each cell shows its largest value.
+    cmap, vmin, vmax : optional
+        Colormap and limits used with c, as in plt.scatter.
+    label : str, optional
+        Legend label, drawn with a hollow marker proxy.
+    bins : tuple, optional
+        Number of cells along x and y, defaults to about one cell per marker.
+
+    Returns
+    -------
+    image : matplotlib.image.AxesImage
+        The drawn image, None when there are no points.
+
+    """
+    if label is not None:
+        ax.scatter([], [], edgecolors=color, facecolors="none", s=s, label=label)
+    if len(x) == 0:
+        return None
+
+    extent = data_extent(x, y)
+    bins = bins or marker_bins(ax, s, extent)
+
+    if c is None:
+        counts = density_grid(x, y, bins, extent)
+        rgba = np.zeros(counts.shape + (4,))
+        rgba[..., :3] = mpl.colors.to_rgb(color)
+        rgba[..., 3] = 1 - (1 - alpha) ** counts
+        image = ax.imshow(
+            rgba, extent=extent, origin="lower", aspect="auto", interpolation="nearest"
+        )
+    else:
+        grid = density_grid(x, y, bins, extent, values=c)
+        cmap = mpl.colormaps.get_cmap(cmap).with_extremes(bad=(0, 0, 0, 0))
+        image = ax.imshow(
+            np.ma.masked_invalid(grid),
+            extent=extent,
+            origin="lower",
+            aspect="auto",
+            interpolation="nearest",
+            cmap=cmap,
+            vmin=vmin,
+            vmax=vmax,
+            alpha=alpha,
+        )
+
+    return image
@@ -0,0 +1,72 @@
+"""Reduce per-atom metrics (RMSF, B-factors, charges) to per-residue statistics."""
+
+import numpy as np
+import pandas as pd
+
+
+def residue_groups(residue_ids, contiguous=False):
+    """
+    Assign each atom to a residue group.
+
+    Parameters
+    ----------
+    residue_ids : array-like
+        Residue identifier of each atom, e.g., MDAnalysis resindices or PDB residue numbers.
+    contiguous : bool
+        Start a new group whenever the identifier changes between consecutive atoms,
+        instead of grouping all atoms that share an identifier.
+
+    Returns
+    -------
+    groups : numpy.ndarray
+        Group of each atom, numbered in order of first appearance.
+    residues : numpy.ndarray
+        Residue identifier of each group.
+
+    """
+    residue_ids = np.asarray(residue_ids)
+    if contiguous:
+        starts = np.flatnonzero(np.r_[True, residue_ids[1:] != residue_ids[:-1]])
+        groups = np.cumsum(np.r_[False, residue_ids[1:] != residue_ids[:-1]])
+        return groups, residue_ids[starts]
+
+    groups, residues = pd.factorize(residue_ids, sort=False)
+    return groups, np.asarray(residues)
+
+
+def reduce_by_residue(values, residue_ids, contiguous=False):
+    """
+    Compute per-residue statistics of a per-atom metric in one vectorized pass.
+
+    Sums come from np.bincount over the residue group of each atom,
+    the standard deviation is the population standard deviation within each residue.
+
+    Parameters
+    ----------
+    values : array-like
+        Metric of each atom.
+    residue_ids : array-like
+        Residue identifier of each atom, see residue_groups().
+    contiguous : bool
+        Treat every run of consecutive identical identifiers as its own residue.
+
+    Returns
+    -------
+    df : pandas.DataFrame
+        Columns atoms, sum, mean and std, indexed by residue identifier in order of appearance.
+
+    """
+    values = np.asarray(values, dtype=np.float64)
+    groups, residues = residue_groups(residue_ids, contiguous)
+    atoms = np.bincount(groups, minlength=len(residues))
+    sums = np.bincount(groups, weights=values, minlength=len(residues))
+    means = sums / atoms
+    deviations = values - means[groups]
+    stds = np.sqrt(np.bincount(groups, weights=deviations**2, minlength=len(residues)) / atoms)
+
+    df = pd.DataFrame(
+        {"atoms": atoms, "sum": sums, "mean": means, "std": stds},
+        index=pd.Index(residues, name="residue"),
+    )
+
+    return df
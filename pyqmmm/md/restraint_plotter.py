@@ -2,6 +2,7 @@
 
 import os.path
 import numpy as np
+import pandas as pd
 import glob
 import sys
 import configparser as cp
@@ -13,10 +14,14 @@ from matplotlib.ticker import MultipleLocator
 import matplotlib.ticker as ticker
 import matplotlib.colors as mplc
 from scipy.stats import gaussian_kde
+from scipy.signal import fftconvolve
 from matplotlib.patches import Rectangle
 from matplotlib.font_manager import FontProperties
 from matplotlib import rc, rcParams
 
+from pyqmmm.md.raster_scatter import raster_scatter
+from pyqmmm.md.worker_pool import map_tasks
+
 mpl.rcParams["pdf.fonttype"] = "42"
 mpl.rcParams["ps.fonttype"] = "42"
 
@@ -62,16 +67,66 @@ def config():
     return labels, plot_params
 
 
+def read_cpptraj_data(filename, column=1):
+    """
+    Reads one column of a CPPTRAJ data file into an array.
+
+    Uses the pandas C parser, which is much faster than np.loadtxt on long trajectories.
+
+    Parameters
+    ----------
+    filename : str
+        The name of the CPPTRAJ output file, e.g., 1_angles.dat.
+    column : int
+        The column to read, the first column holds the frame numbers.
+
+    Returns
+    -------
+    values : array
+        The values of the column, comment lines are skipped.
+
+    """
+    data = pd.read_csv(
+        filename, sep=r"\s+", comment="#", header=None, usecols=[column], dtype=np.float64
+    )
+
+    return data[column].to_numpy()
+
+
+def get_xy_data(num):
+    """
+    Pairs the distances and angles of one plot.
+
+    Parameters
+    ----------
+    num : int
+        The number of the plot, as in 1_angles.dat and 1_distances.dat.
+
+    Returns
+    -------
+    x : array
+        The x-values, most likely a list of distances.
+    y : array
+        The y-values, most likely a list of angles.
+
+    """
+    x = read_cpptraj_data(f"./1_in/{num}_distances.dat")
+    y = read_cpptraj_data(f"./1_in/{num}_angles.dat")
+
+    # Pair the frames present in both files
+    length = min(len(x), len(y))
+
+    return x[:length], y[:length]
+
+
 def combine_inp():
     """
     Combines a CPPTRAJ output file with angles and another with distances.
 
     Returns
     -------
-    combined : file
-        Generates a file with the combined distances and angles for each plot.
-    file_array : list
-        List of all the files that are generated.
+    xy_pairs : list
+        The (distances, angles) arrays for each plot.
 
     """
     # Determine the number of plots the user wants based on angle and dist files
@@ -84,62 +139,201 @@ def combine_inp():
         print("The number of distance and angle files is not the same.")
         sys.exit()
 
-    # Combine the dist and angle files into a single file
-    file_array = []
-    for num in range(1, num_plots + 1):
-        combined_file_path = f"./2_temp/{num}_combined.dat"
-        file_array.append(combined_file_path)
+    # Pair the dist and angle values in memory
+    xy_pairs = [get_xy_data(num) for num in range(1, num_plots + 1)]
+
+    return xy_pairs
+
+
+def kde_bandwidth(xy_matrix):
+    """
+    Gets the kernel covariance the exact gaussian_kde would use.
+
+    Parameters
+    ----------
+    xy_matrix : array
+        The x and y values stacked as a 2 x N array.
 
-        with open(combined_file_path, "w") as combined, open(
-            f"./1_in/{num}_angles.dat", "r"
-        ) as ang_file, open(f"./1_in/{num}_distances.dat", "r") as dist_file:
-            for ang_line, dist_line in zip(ang_file, dist_file):
-                if "#" in ang_line:
-                    continue
+    Returns
+    -------
+    covariance : array
+        The 2 x 2 kernel covariance matrix, from Scott's rule.
 
-                angle = ang_line.split()[1]
-                dist = dist_line.split()[1]
-                combined.write(f"{dist} {angle}\n")
+    """
+    factor = xy_matrix.shape[1] ** (-1.0 / 6.0)
 
-    return file_array
+    return np.cov(xy_matrix) * factor**2
 
 
-def get_xy_data(filename):
+def binned_kde(x, y, grid_size=256, cutoff=4.0):
     """
-    Takes a combined file and destructures it into arrays.
+    Estimates the point density with a binned KDE.
+
+    The points are linearly binned onto a regular grid,
+    the grid is convolved with the Gaussian kernel using the FFT,
+    and the density is interpolated bilinearly back to each point.
+    The cost grows linearly with the number of points instead of quadratically.
 
     Parameters
     ----------
-    filename : str
-        The name of the file.
+    x : array
+        The x-values, most likely a list of distances.
+    y : array
+        The y-values, most likely a list of angles.
+    grid_size : int
+        Number of grid points in each dimension.
+    cutoff : float
+        The kernel is truncated this many standard deviations from its center.
 
     Returns
     -------
+    z : array
+        The estimated density at each point, comparable to gaussian_kde.
+
+    """
+    covariance = kde_bandwidth(np.vstack([x, y]))
+    lower = np.array([x.min(), y.min()])
+    spacing = (np.array([x.max(), y.max()]) - lower) / (grid_size - 1)
+    spacing[spacing == 0] = 1.0
+
+    # Linear binning, each point is shared among the four surrounding grid points
+    position = (np.vstack([x, y]).T - lower) / spacing
+    cell = np.minimum(position.astype(int), grid_size - 2)
+    fraction = position - cell
+    corners = [(0, 0), (1, 0), (0, 1), (1, 1)]
+    indices, weights = [], []
+    for dx, dy in corners:
+        indices.append((cell[:, 0] + dx) * grid_size + cell[:, 1] + dy)
+        weights.append(
+            (fraction[:, 0] if dx else 1 - fraction[:, 0])
+            * (fraction[:, 1] if dy else 1 - fraction[:, 1])
+        )
+    counts = np.zeros(grid_size * grid_size)
+    for index, weight in zip(indices, weights):
+        counts += np.bincount(index, weights=weight, minlength=grid_size * grid_size)
+    counts = counts.reshape(grid_size, grid_size)
+
+    # Gaussian kernel sampled on the grid offsets out to the cutoff
+    reach = np.maximum(np.ceil(cutoff * np.sqrt(np.diag(covariance)) / spacing).astype(int), 1)
+    reach = np.minimum(reach, grid_size - 1)
+    offsets = np.meshgrid(
+        np.arange(-reach[0], reach[0] + 1) * spacing[0],
+        np.arange(-reach[1], reach[1] + 1) * spacing[1],
+        indexing="ij",
+    )
+    offsets = np.stack(offsets, axis=-1)
+    inverse = np.linalg.inv(covariance)
+    exponent = np.einsum("...i,ij,...j->...", offsets, inverse, offsets)
+    kernel = np.exp(-0.5 * exponent) / (2 * np.pi * np.sqrt(np.linalg.det(covariance)))
+
+    density = fftconvolve(counts, kernel, mode="same") / len(x)
+
+    # Bilinear interpolation back to the points reuses the binning weights
+    density = density.reshape(-1)
+    z = sum(density[index] * weight for index, weight in zip(indices, weights))
+
+    return np.maximum(z, 0.0)
+
+
+def point_density(x, y, method="binned"):
+    """
+    Estimates the density of the points around each point.
+
+    Parameters
+    ----------
     x : array
         The x-values, most likely a list of distances.
     y : array
         The y-values, most likely a list of angles.
+    method : str
+        "binned" for the fast grid estimate or "exact" for scipy's gaussian_kde,
+        which scales quadratically and is kept for validation.
+
+    Returns
+    -------
+    z : array
+        The estimated density at each point.
+
+    """
+    if method == "binned":
+        return binned_kde(x, y)
+    if method == "exact":
+        xy_matrix = np.vstack([x, y])
+        return gaussian_kde(xy_matrix)(xy_matrix)
+    raise ValueError(f"Unknown KDE method: {method}")
+
+
+def exact_kde_chunk(xy_matrix, points):
+    """
+    Evaluates the exact KDE of a dataset at a subset of its points.
+
+    Parameters
+    ----------
+    xy_matrix : array
+        The x and y values of the whole dataset stacked as a 2 x N array.
+    points : array
+        The 2 x M points at which the density is evaluated.
+
+    Returns
+    -------
+    z : array
+        The density at each of the points.
+
+    """
+    return gaussian_kde(xy_matrix)(points)
+
 
+def parallel_density(xy_pairs, method="binned", processes=None, split=1):
     """
-    # Read data from file and split by white space
-    with open(filename, "r") as file:
-        data = np.loadtxt(file)
+    Estimates the point density of several datasets in worker processes.
 
-    # Separate x and y values
-    x = data[:, 0]
-    y = data[:, 1]
+    Parameters
+    ----------
+    xy_pairs : list
+        The (x, y) arrays of each dataset.
+    method : str
+        The density estimator, see point_density().
+    processes : int, optional
+        Number of worker processes, defaults to one per core.
+    split : int
+        With the exact method, the points of each dataset are split into this many
+        chunks evaluated by different workers, so a single large dataset also uses several cores.
 
-    return x, y
+    Returns
+    -------
+    z_data : list
+        The density at each point of each dataset.
+
+    """
+    if method == "exact" and split > 1:
+        tasks = []
+        for x, y in xy_pairs:
+            xy_matrix = np.vstack([x, y])
+            tasks.extend((xy_matrix, chunk) for chunk in np.array_split(xy_matrix, split, axis=1))
+        chunks = map_tasks(exact_kde_chunk, tasks, processes)
+        z_data = [np.concatenate(chunks[start:start + split]) for start in range(0, len(chunks), split)]
+    else:
+        z_data = map_tasks(point_density, [(x, y, method) for x, y in xy_pairs], processes)
 
+    return z_data
 
-def collect_xyz_data(filenames):
+
+def collect_xyz_data(xy_pairs, method="binned", processes=1, split=1):
     """
-    Retrieves the x and y data from the files.
+    Estimates the density of each dataset and sorts the points by it.
 
     Parameters
     ----------
-    filenames : list
-        List of the combined file names that were generated.
+    xy_pairs : list
+        The (x, y) arrays of each plot from combine_inp().
+    method : str
+        The density estimator, see point_density().
+    processes : int, optional
+        Number of worker processes for the exact method, None uses one per core.
+        The binned method takes milliseconds per dataset,
+        so it always runs in this process without starting a pool.
+    split : int
+        Chunks each dataset is split into for the exact method, see parallel_density().
 
     Returns
     -------
@@ -157,14 +351,13 @@ def collect_xyz_data(filenames):
     y_data = []
     z_data = []
 
-    for filename in filenames:
-        # Unpack the x and y values from the combined file
-        x, y = get_xy_data(filename)
-
-        # Calculate the point density using Gaussian kernel density estimation
-        xy_matrix = np.vstack([x, y])
-        z = gaussian_kde(xy_matrix)(xy_matrix)
+    # Calculate the point density using Gaussian kernel density estimation
+    if processes == 1 or method != "exact":
+        densities = [point_density(x, y, method) for x, y in xy_pairs]
+    else:
+        densities = parallel_density(xy_pairs, method, processes, split)
 
+    for (x, y), z in zip(xy_pairs, densities):
         # Sort x, y, and z arrays by z values
         index = z.argsort()
         x_data.append(x[index])
@@ -244,7 +437,25 @@ def get_plot_limits(x_data, y_data, plot_params):
     return xlims, ylims
 
 
-def graph_datasets(x_data, y_data, z_data, labels, plot_params, show_crosshairs):
+def graph_datasets(x_data, y_data, z_data, labels, plot_params, show_crosshairs, render="scatter"):
+    """
+    Plots every dataset colored by its point density.
+
+    Parameters
+    ----------
+    x_data, y_data, z_data : list
+        The sorted points and densities of each dataset from collect_xyz_data().
+    labels : dictionary
+        The axis labels from the config file.
+    plot_params : list
+        The per plot parameters from the config file.
+    show_crosshairs : bool
+        Draw the experimental patch and its crosshairs.
+    render : str
+        "scatter" draws one marker per frame,
+        "raster" draws each dataset as a density image so large runs render quickly.
+
+    """
     plt.rcParams.update(
         {
             "font.family": "sans-serif",
@@ -273,10 +484,16 @@ def graph_datasets(x_data, y_data, z_data, labels, plot_params, show_crosshairs)
     fig.text(0.5, -0.03, labels["xlabel"], ha="center")
     plt.ylabel(labels["ylabel"], fontweight="bold")
     xlims, ylims = get_plot_limits(x_data, y_data, plot_params)
+    # Limits are set before drawing so raster cells match the marker size
+    ax.set_xlim(2.8, 5)
+    ax.set_ylim(10, 125)
 
     for i, (x, y, z) in enumerate(zip(x_data, y_data, z_data)):
         cmap = mpl.colors.ListedColormap(color_map[plot_params[i]["color"]][5:, :-1])
-        ax.scatter(x, y, c=z, s=40, vmin=0.0, vmax=0.3, cmap=cmap)
+        if render == "raster":
+            raster_scatter(ax, x, y, c=z, s=40, vmin=0.0, vmax=0.3, cmap=cmap)
+        else:
+            ax.scatter(x, y, c=z, s=40, vmin=0.0, vmax=0.3, cmap=cmap)
 
         if show_crosshairs:
             height_min, height_max, width_min, width_max = [
@@ -312,8 +529,6 @@ def graph_datasets(x_data, y_data, z_data, labels, plot_params, show_crosshairs)
                 linewidth=2.0,
             )
 
-        ax.set_xlim(2.8, 5)
-        ax.set_ylim(10, 125)
         ax.xaxis.set_ticks(np.arange(3, 5, 0.5))
         ax.xaxis.set_ticks(np.arange(2.8, 5, 0.1), minor=True)
         ax.yaxis.set_ticks(np.arange(20, 121, 20))
@@ -326,7 +541,22 @@ def graph_datasets(x_data, y_data, z_data, labels, plot_params, show_crosshairs)
     )
 
 
-def restraint_plots():
+def restraint_plots(render="scatter", method="binned", processes=None, split=1):
+    """
+    Generates the KDE plots of every dataset listed in the config file.
+
+    Parameters
+    ----------
+    render : str
+        How the points are drawn, "scatter" or "raster".
+    method : str
+        The density estimator, "binned" or "exact", see point_density().
+    processes : int, optional
+        Number of worker processes for the exact method, None uses one per core.
+    split : int
+        Chunks each dataset is split into for the exact method, see parallel_density().
+
+    """
     print("\n.--------------------------.")
     print("|WELCOME TO RESTRAINT PLOTS|")
     print(".--------------------------.\n")
@@ -340,15 +570,15 @@ def restraint_plots():
     # show_crosshairs = input('Would you like crosshairs (y/n)?  ') == 'y'
     show_crosshairs = "n"
 
-    # Get filenames from output directory
-    filenames = combine_inp()
+    # Pair the distances and angles of each plot
+    xy_pairs = combine_inp()
 
     # Get coordinates from config file
     labels, plot_params = config()
 
     # Execute the main functions and generate plot
-    x_data, y_data, z_data = collect_xyz_data(filenames)
-    graph_datasets(x_data, y_data, z_data, labels, plot_params, show_crosshairs)
+    x_data, y_data, z_data = collect_xyz_data(xy_pairs, method, processes, split)
+    graph_datasets(x_data, y_data, z_data, labels, plot_params, show_crosshairs, render)
 
 
 # Execute the Quick CSA when run as a script but not if used as a pyQM/MM module
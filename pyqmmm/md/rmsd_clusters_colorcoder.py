@@ -4,6 +4,8 @@ import pandas as pd
 import matplotlib.pyplot as plt
 from pathlib import Path
 
+from pyqmmm.md.raster_scatter import fit_limits, raster_scatter
+
 
 def dat2df(dat_file, rows_to_skip=1):
     """
@@ -28,7 +30,7 @@ def dat2df(dat_file, rows_to_skip=1):
     return df
 
 
-def get_plot(final_df, centroid_frame_ns, yaxis_title, cluster_count, layout='wide'):
+def get_plot(final_df, centroid_frame_ns, yaxis_title, cluster_count, layout='wide', render='scatter'):
     """
     General plotting function.
 
@@ -40,6 +42,8 @@ def get_plot(final_df, centroid_frame_ns, yaxis_title, cluster_count, layout='wi
         The frame number of the computed centroid.
     layout : str
         'square' for square dimensions, 'wide' for default.
+    render : str
+        'scatter' for one marker per frame, 'raster' for a density image per cluster.
 
     """
     if layout == 'square':
@@ -70,6 +74,9 @@ def get_plot(final_df, centroid_frame_ns, yaxis_title, cluster_count, layout='wi
 
     max_cluster_index = max(cluster_count, final_df["Cluster"].max())
     other_label_added = False
+    # Every cluster raster is binned on the limits of the whole trajectory
+    if render == 'raster':
+        fit_limits(plt.gca(), final_df["Frame"], final_df["RMSD"])
 
     for cluster in range(max_cluster_index + 1):
         indicesToKeep = final_df["Cluster"] == cluster
@@ -79,14 +86,24 @@ def get_plot(final_df, centroid_frame_ns, yaxis_title, cluster_count, layout='wi
         if label == "Other" and other_label_added:
             label = None
 
-        plt.scatter(
-            final_df.loc[indicesToKeep, "Frame"],
-            final_df.loc[indicesToKeep, "RMSD"],
-            edgecolors=color,
-            s=9,
-            facecolors="none",
-            label=label
-        )
+        if render == 'raster':
+            raster_scatter(
+                plt.gca(),
+                final_df.loc[indicesToKeep, "Frame"],
+                final_df.loc[indicesToKeep, "RMSD"],
+                s=9,
+                color=color,
+                label=label
+            )
+        else:
+            plt.scatter(
+                final_df.loc[indicesToKeep, "Frame"],
+                final_df.loc[indicesToKeep, "RMSD"],
+                edgecolors=color,
+                s=9,
+                facecolors="none",
+                label=label
+            )
 
         if label == "Other":
             other_label_added = True
@@ -112,7 +129,7 @@ def get_plot(final_df, centroid_frame_ns, yaxis_title, cluster_count, layout='wi
     plt.savefig(filename, bbox_inches="tight", dpi=600)
 
 
-def rmsd_clusters_colorcoder(yaxis_title, cluster_count, layout='wide'):
+def rmsd_clusters_colorcoder(yaxis_title, cluster_count, layout='wide', render='scatter'):
     # Welcome user and print some instructions
     print("\n.--------------------------.")
     print("| RMSD CLUSTERS COLORCODER |")
@@ -143,7 +160,7 @@ def rmsd_clusters_colorcoder(yaxis_title, cluster_count, layout='wide'):
     final_df = pd.concat([rmsd_df, clus_df], axis=1)
     final_df.columns = ["RMSD", "Cluster"]
     final_df["Frame"] = final_df.index
-    get_plot(final_df, centroid_frame_ns, yaxis_title, cluster_count, layout)
+    get_plot(final_df, centroid_frame_ns, yaxis_title, cluster_count, layout, render)
 
 
 # Execute the function when run as a script but not if used as a pyQM/MM module
@@ -4,6 +4,8 @@ import pandas as pd
 import matplotlib.pyplot as plt
 from pathlib import Path
 
+from pyqmmm.md.raster_scatter import raster_scatter
+
 def format_plot() -> None:
     """
     General plotting parameters for the Kulik Lab.
@@ -46,7 +48,7 @@ def dat2df(dat_file, rows_to_skip=1):
     return df
 
 
-def get_plot(rmsd_df, yaxis_title, layout='wide'):
+def get_plot(rmsd_df, yaxis_title, layout='wide', render='scatter'):
     """
     General plotting function for RMSD.
 
@@ -56,6 +58,8 @@ def get_plot(rmsd_df, yaxis_title, layout='wide'):
         Dataframe with RMSD data.
     layout : str
         'square' for square dimensions, 'wide' for default.
+    render : str
+        'scatter' for one marker per frame, 'raster' for a density image.
 
     """
     if layout == 'square':
@@ -65,14 +69,17 @@ def get_plot(rmsd_df, yaxis_title, layout='wide'):
         plt.figure(figsize=(6, 4))
         filename = f"rmsd_{layout}.png"
 
-    plt.scatter(
-        rmsd_df.index,
-        rmsd_df[1],
-        edgecolors="#808080",
-        s=9,
-        facecolors="none",
-        alpha = 0.25
-    )
+    if render == 'raster':
+        raster_scatter(plt.gca(), rmsd_df.index, rmsd_df[1], s=9, color="#808080", alpha=0.25)
+    else:
+        plt.scatter(
+            rmsd_df.index,
+            rmsd_df[1],
+            edgecolors="#808080",
+            s=9,
+            facecolors="none",
+            alpha = 0.25
+        )
 
     plt.rc("axes", linewidth=2.5)
     plt.ylabel(f"{yaxis_title}", fontsize=16, weight="bold")
@@ -83,7 +90,7 @@ def get_plot(rmsd_df, yaxis_title, layout='wide'):
     plt.savefig(filename, bbox_inches="tight", dpi=600)
 
 
-def rmsd_plotter(yaxis_title, layout='wide'):
+def rmsd_plotter(yaxis_title, layout='wide', render='scatter'):
     # Welcome user and print some instructions
     print("\n.--------------.")
     print("| RMSD PLOTTER |")
@@ -106,7 +113,7 @@ def rmsd_plotter(yaxis_title, layout='wide'):
         exit()
 
     rmsd_df = dat2df(expected_dat)
-    get_plot(rmsd_df, yaxis_title, layout)
+    get_plot(rmsd_df, yaxis_title, layout, render)
 
 
 # Execute the function when run as a script
@@ -1,7 +1,7 @@
 """Calculate the RMSF across replicates using MDAnalysis"""
 
 import MDAnalysis as mda
-from MDAnalysis.analysis import align, rms
+from MDAnalysis.analysis import align
 import numpy as np
 import pandas as pd
 import time
@@ -9,10 +9,251 @@ import os
 from pathlib import Path
 import warnings
 
+from pyqmmm.md.residue_reducer import reduce_by_residue
+from pyqmmm.md.worker_pool import map_tasks, pool_size
+
 # Ignore MDAnalysis UserWarnings
 warnings.filterwarnings('ignore', category=UserWarning, module='MDAnalysis')
 
-def calculate_rmsf_per_trajectory(topology, trajectory, reference, count):
+def reference_positions(reference, select="all"):
+    """
+    Get the centered reference coordinates each frame is superimposed onto.
+
+    Parameters
+    ----------
+    reference : MDAnalysis.core.universe.Universe
+        The reference structure, its current frame is used.
+    select : str
+        Selection of the atoms that are aligned and analyzed.
+
+    Returns
+    -------
+    target : numpy.ndarray
+        Reference coordinates centered on their center of geometry.
+
+    """
+    target = reference.select_atoms(select).positions.astype(np.float64)
+    target -= target.mean(axis=0)
+
+    return target
+
+def accumulate_rmsf(universe, target, select="all", frames=None):
+    """
+    Accumulate the mean and variance of aligned positions in a single pass.
+
+    Each frame is superimposed onto the target as it is read
+    and the mean and variance of the aligned positions are accumulated with Welford's algorithm,
+    so only one frame is held in memory at a time.
+
+    Parameters
+    ----------
+    universe : MDAnalysis.core.universe.Universe
+        The trajectory to analyze.
+    target : numpy.ndarray
+        Centered reference coordinates from reference_positions().
+    select : str
+        Selection of the atoms that are aligned and analyzed.
+    frames : range, optional
+        Frames to analyze, see frame_window(), defaults to the whole trajectory.
+
+    Returns
+    -------
+    partial : tuple
+        Number of frames, mean positions and summed squared deviations.
+
+    """
+    mobile = universe.select_atoms(select)
+    frame_count = 0
+    mean = np.zeros((len(mobile), 3))
+    sum_squares = np.zeros((len(mobile), 3))
+    if frames is None:
+        frames = range(len(universe.trajectory))
+    if frames.step < 0:
+        raise ValueError(f"Frames must be analyzed in order, step {frames.step} is negative.")
+    # Slicing the reader skips the unwanted frames without decoding them
+    for _ in universe.trajectory[frames.start:frames.stop:frames.step]:
+        positions = mobile.positions.astype(np.float64)
+        positions -= positions.mean(axis=0)
+        rotation, _ = align.rotation_matrix(positions, target)
+        positions = positions @ rotation.T
+
+        frame_count += 1
+        delta = positions - mean
+        mean += delta / frame_count
+        sum_squares += delta * (positions - mean)
+
+    return frame_count, mean, sum_squares
+
+def frame_window(universe, start=None, stop=None, step=None, begin=None, end=None):
+    """
+    Select the frames of a trajectory by index and/or by simulation time.
+
+    Parameters
+    ----------
+    universe : MDAnalysis.core.universe.Universe
+        The trajectory to select frames from.
+    start, stop, step : int, optional
+        Frame slice, as in universe.trajectory[start:stop:step], stop is exclusive.
+        The step must be positive.
+    begin, end : float, optional
+        Time window in the units of the trajectory time, both inclusive.
+        Frames outside it are dropped from the frame slice.
+
+    Returns
+    -------
+    frames : range
+        Indices of the selected frames.
+
+    """
+    if step is not None and step < 1:
+        raise ValueError(f"The frame step must be a positive integer, not {step}.")
+    frames = range(len(universe.trajectory))[start:stop:step]
+    if begin is not None or end is not None:
+        dt = universe.trajectory.dt
+        first_time = universe.trajectory[0].time
+        times = first_time + np.array(frames) * dt
+        selected = np.ones(len(frames), dtype=bool)
+        if begin is not None:
+            selected &= times >= begin - 1e-6 * dt
+        if end is not None:
+            selected &= times <= end + 1e-6 * dt
+        selected = np.flatnonzero(selected)
+        frames = frames[selected[0]:selected[-1] + 1] if len(selected) else frames[0:0]
+
+    return frames
+
+def merge_rmsf_partials(partials):
+    """
+    Combine partial results of accumulate_rmsf() from blocks of the same trajectory.
+
+    Uses the pairwise update of Chan et al., so blocks can be computed independently.
+
+    Parameters
+    ----------
+    partials : list[tuple]
+        Results of accumulate_rmsf() for each block.
+
+    Returns
+    -------
+    partial : tuple
+        Number of frames, mean positions and summed squared deviations of all blocks.
+
+    """
+    frame_count, mean, sum_squares = partials[0]
+    for block_count, block_mean, block_squares in partials[1:]:
+        if block_count == 0:
+            continue
+        total = frame_count + block_count
+        delta = block_mean - mean
+        mean = mean + delta * block_count / total
+        sum_squares = sum_squares + block_squares + delta**2 * frame_count * block_count / total
+        frame_count = total
+
+    return frame_count, mean, sum_squares
+
+def partial_to_rmsf(partial):
+    """
+    Convert accumulated positions into the per-atom RMSF.
+
+    Parameters
+    ----------
+    partial : tuple
+        Result of accumulate_rmsf() or merge_rmsf_partials().
+
+    Returns
+    -------
+    rmsf_values : numpy.ndarray
+        The RMSF of each atom.
+
+    """
+    frame_count, _, sum_squares = partial
+
+    return np.sqrt(sum_squares.sum(axis=1) / frame_count)
+
+def streaming_rmsf(universe, reference, select="all", frames=None):
+    """
+    Calculate the per-atom RMSF in a single pass over a trajectory.
+
+    Parameters
+    ----------
+    universe : MDAnalysis.core.universe.Universe
+        The trajectory to analyze.
+    reference : MDAnalysis.core.universe.Universe
+        The reference structure to which each frame is aligned.
+    select : str
+        Selection of the atoms that are aligned and analyzed.
+    frames : range, optional
+        Frames to analyze, see frame_window(), defaults to the whole trajectory.
+
+    Returns
+    -------
+    rmsf_values : numpy.ndarray
+        The RMSF of each selected atom.
+
+    """
+    target = reference_positions(reference, select)
+
+    return partial_to_rmsf(accumulate_rmsf(universe, target, select, frames))
+
+def rmsf_block(topology, trajectory, target, frames):
+    """
+    Accumulate the RMSF of one block of frames in a worker process.
+
+    Parameters
+    ----------
+    topology : str
+        Path to the topology file.
+    trajectory : str
+        Path to the trajectory file.
+    target : numpy.ndarray
+        Centered reference coordinates from reference_positions().
+    frames : range
+        Block of frames to analyze.
+
+    Returns
+    -------
+    partial : tuple
+        Result of accumulate_rmsf() for the block.
+
+    """
+    u = mda.Universe(topology, trajectory, dt=0.2, format="TRJ")
+
+    return accumulate_rmsf(u, target, "all", frames)
+
+def residue_rmsf(u, rmsf_values, count):
+    """
+    Average the atomic RMSF of each residue.
+
+    Parameters
+    ----------
+    u : MDAnalysis.core.universe.Universe
+        Universe providing the residues.
+    rmsf_values : numpy.ndarray
+        The RMSF of each atom.
+    count : int
+        The index of the trajectory, used for naming in the resulting DataFrame.
+
+    Returns
+    -------
+    df : pandas.DataFrame
+        DataFrame containing resIDs, residue names, and RMSFs for a trajectory.
+
+    """
+    # Calculate average RMSF per residue and store residue info
+    per_residue = reduce_by_residue(rmsf_values, u.atoms.resindices)
+    residues = u.residues[per_residue.index.to_numpy()]
+
+    # Create a DataFrame for each trajectory with the residue and RMSF
+    trajectory_name = "Traj_" + str(count + 1)  # Count as trajectory name
+    df = pd.DataFrame({
+        'ResID': residues.resids,
+        'ResName': residues.resnames,
+        trajectory_name: per_residue["mean"].to_numpy()
+    })
+
+    return df
+
+def calculate_rmsf_per_trajectory(topology, trajectory, reference, count, window=None):
     """
     Calculate the RMSF per trajectory.
 
@@ -30,6 +271,8 @@ def calculate_rmsf_per_trajectory(topology, trajectory, reference, count):
         The reference structure to which the trajectory is aligned.
     count : int
         The index of the trajectory, used for naming in the resulting DataFrame.
+    window : dict, optional
+        Keyword arguments of frame_window() selecting the frames to analyze.
 
     Returns
     -------
@@ -40,43 +283,75 @@ def calculate_rmsf_per_trajectory(topology, trajectory, reference, count):
     print(f"   > Reading: {trajectory}")
     u = mda.Universe(topology, trajectory, dt=0.2, format="TRJ")
 
-    # Use 'all' to select all atoms
-    aligner = align.AlignTraj(u, reference, select="all", in_memory=True)
-    # Perform trajectory alignment
-    aligner.run()
-
+    # Align each frame to the reference while accumulating the RMSF
     print(f"   > Computing the RMSF: {trajectory}")
-    R = rms.RMSF(u.select_atoms("all")).run()
-    rmsf_values = R.results.rmsf
+    frames = frame_window(u, **(window or {}))
+    rmsf_values = streaming_rmsf(u, reference, select="all", frames=frames)
 
-    # Calculate average RMSF per residue and store residue info
-    rmsf_residues = []
-    resnames = []
-    resids = []
-    min_index = min(u.atoms.indices)
-    for residue in u.atoms.residues:
-        # Adjust indices
-        atoms_in_residue = [index - min_index for index in residue.atoms.indices]
-        # Check if the index is within the rmsf_values range
-        if max(atoms_in_residue) >= len(rmsf_values):
-            print(f"Skipping residue {residue.resname}{residue.resid}")
-            continue
-        avg_rmsf = np.mean(rmsf_values[atoms_in_residue])
-        rmsf_residues.append(avg_rmsf)
-        resnames.append(residue.resname)
-        resids.append(residue.resid)
+    return residue_rmsf(u, rmsf_values, count)
 
-    # Create a DataFrame for each trajectory with the residue and RMSF
-    trajectory_name = "Traj_" + str(count + 1)  # Count as trajectory name
-    df = pd.DataFrame({
-        'ResID': resids,
-        'ResName': resnames,
-        trajectory_name: rmsf_residues
-    })
+def parallel_rmsf(topology, trajectories, reference, processes=None, blocks=1, window=None):
+    """
+    Calculate the RMSF of several trajectories in worker processes.
 
-    return df
+    Each trajectory is split into blocks of frames that are accumulated independently
+    and merged with merge_rmsf_partials(), so a single long replicate can also use several cores.
+
+    Parameters
+    ----------
+    topology : str
+        Path to the topology file.
+    trajectories : list[str]
+        Paths to the trajectory files.
+    reference : MDAnalysis.core.universe.Universe
+        The reference structure to which the trajectories are aligned.
+    processes : int, optional
+        Number of worker processes, defaults to one per core up to the number of tasks.
+    blocks : int
+        Number of frame blocks each trajectory is split into.
+    window : dict, optional
+        Keyword arguments of frame_window() selecting the frames to analyze.
+
+    Returns
+    -------
+    dfs : list[pandas.DataFrame]
+        Per-residue RMSF of each trajectory, see residue_rmsf().
 
-def calculate_rmsf(topology, trajectories, reference_file=None):
+    """
+    target = reference_positions(reference)
+    universes = [mda.Universe(topology, trajectory, dt=0.2, format="TRJ") for trajectory in trajectories]
+    tasks = []
+    for trajectory, u in zip(trajectories, universes):
+        frames = frame_window(u, **(window or {}))
+        bounds = np.linspace(0, len(frames), blocks + 1).astype(int)
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            tasks.append((topology, trajectory, target, frames[start:stop]))
+
+    processes = pool_size(len(tasks), processes)
+    print(f"   > Computing {len(tasks)} blocks with {processes} processes")
+    partials = map_tasks(rmsf_block, tasks, processes)
+
+    dfs = []
+    tasks_per_trajectory = len(tasks) // len(trajectories)
+    for count, u in enumerate(universes):
+        trajectory_partials = partials[count * tasks_per_trajectory:(count + 1) * tasks_per_trajectory]
+        rmsf_values = partial_to_rmsf(merge_rmsf_partials(trajectory_partials))
+        dfs.append(residue_rmsf(u, rmsf_values, count))
+
+    return dfs
+
+def calculate_rmsf(
+    topology,
+    trajectories,
+    reference_file=None,
+    processes=None,
+    blocks=None,
+    start=None,
+    stop=None,
+    step=None,
+    begin=None,
+    end=None,
+):
     """
     Calculate the RMSF with MDAnalysis.
 
@@ -88,6 +363,16 @@ def calculate_rmsf(topology, trajectories, reference_file=None):
     ----------
     reference_file : str
         The path to a PDB file that you would like to use as a reference.
+    processes : int, optional
+        Number of worker processes, defaults to one per core, 1 runs serially.
+    blocks : int, optional
+        Number of frame blocks each trajectory is split into for the workers,
+        defaults to enough blocks to give every worker a task.
+    start, stop, step : int, optional
+        Frame slice of each trajectory to analyze, e.g., step=10 uses every tenth frame.
+        stop is exclusive and step must be positive.
+    begin, end : float, optional
+        Time window of each trajectory to analyze, e.g., to skip equilibration.
 
     """
     # Greet the user
@@ -106,13 +391,23 @@ def calculate_rmsf(topology, trajectories, reference_file=None):
         reference = mda.Universe(reference_file)
     # Otherwise use the first frame of the first trajectory as reference
     else:
-        mda.Universe(topology, trajectories[0], dt=0.2, format="TRJ")
+        reference = mda.Universe(topology, trajectories[0], dt=0.2, format="TRJ")
     
     # Iterate over trajectories
-    rmsf_residue_df = pd.DataFrame()
-    for count, trajectory in enumerate(trajectories):
-        df = calculate_rmsf_per_trajectory(topology, trajectory, reference, count)
+    window = {"start": start, "stop": stop, "step": step, "begin": begin, "end": end}
+    if processes == 1:
+        dfs = [
+            calculate_rmsf_per_trajectory(topology, trajectory, reference, count, window)
+            for count, trajectory in enumerate(trajectories)
+        ]
+    else:
+        if blocks is None:
+            # Split the trajectories so that fewer replicates than cores still keep every core busy
+            blocks = -(-(processes or os.cpu_count() or 1) // len(trajectories))
+        dfs = parallel_rmsf(topology, trajectories, reference, processes, blocks, window)
 
+    rmsf_residue_df = pd.DataFrame()
+    for count, df in enumerate(dfs):
         # Concatenate current trajectory DataFrame with the total DataFrame
         if rmsf_residue_df.empty:
             rmsf_residue_df = df
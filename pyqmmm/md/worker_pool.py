@@ -0,0 +1,57 @@
+"""Run independent analysis tasks in a pool of worker processes."""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+
+def pool_size(task_count, processes=None):
+    """
+    Decide how many worker processes to start for a set of tasks.
+
+    Parameters
+    ----------
+    task_count : int
+        Number of tasks to run.
+    processes : int, optional
+        Requested number of processes, defaults to one per core.
+
+    Returns
+    -------
+    processes : int
+        At least one and never more than the number of tasks.
+
+    """
+    return max(1, min(processes or os.cpu_count() or 1, task_count))
+
+
+def map_tasks(function, tasks, processes=None):
+    """
+    Call a function once per task and collect the results in task order.
+
+    The function must be defined at module level so it can be sent to the workers.
+    With a single process, or a single task, the calls run in the current process
+    and no pool is started.
+
+    Parameters
+    ----------
+    function : callable
+        Function called as function(*task).
+    tasks : list[tuple]
+        Positional arguments of each call.
+    processes : int, optional
+        Number of worker processes, see pool_size().
+
+    Returns
+    -------
+    results : list
+        The return value of each call.
+
+    """
+    if not tasks:
+        return []
+    processes = pool_size(len(tasks), processes)
+    if processes == 1:
+        return [function(*task) for task in tasks]
+
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        return list(pool.map(function, *zip(*tasks)))
@@ -1,5 +1,7 @@
 import glob
 import re
+import numpy as np
+from pyqmmm.qm.xyz_trajectory import XYZTrajectory
 
 def get_sorted_xyz_files():
     """
@@ -20,51 +22,64 @@ def get_sorted_xyz_files():
     numeric_xyz_files.sort(key=lambda x: int(x.split(".")[0]))
     return numeric_xyz_files
 
-def extract_frames(xyz_filename):
+def frames_match(first, second, decimals=4):
     """
-    Reads all frames from an xyz file and returns them as a list of strings.
-    
+    Checks whether two frames have the same elements and geometry.
+
+    Frames that differ only in their comment line or beyond the given decimal
+    are considered the same, so NEB endpoints that were rewritten
+    by another job are still recognized as duplicates.
+    The coordinates are compared with a tolerance rather than rounded,
+    so values on either side of a rounding boundary still match.
+
     Parameters
     ----------
-    xyz_filename : str
-        The filename of the xyz file.
-    
+    first, second : pyqmmm.qm.xyz_trajectory.Frame
+        The frames to compare.
+    decimals : int
+        Number of decimals in Å the coordinates must agree to.
+
     Returns
     -------
-    list
-        A list of strings, each string representing a frame in the xyz file.
+    bool
+        True if the frames are duplicates.
     """
-    frames = []
-    with open(xyz_filename, 'r') as file:
-        lines = file.readlines()
-        atom_count = lines[0].strip()
-        frame_length = int(atom_count) + 2
-        for i in range(0, len(lines), frame_length):
-            frames.append("".join(lines[i:i + frame_length]))
-    return frames
+    if first.natoms != second.natoms or not np.array_equal(first.elements, second.elements):
+        return False
+    return np.allclose(first.coordinates, second.coordinates, rtol=0, atol=10.0**-decimals)
 
-def combine_trajectories():
+def combine_trajectories(decimals=4):
     """
     Combines xyz files into a single xyz trajectory file while removing duplicate frames.
     Only processes files named with numbers, skipping any specified files to ignore.
+
+    Files are streamed into the output one at a time.
+    Only the previous file's last frame is kept
+    to decide if the first frame of the next file is a duplicate.
+
+    Parameters
+    ----------
+    decimals : int
+        Number of decimals in Å two frames must agree to for them to count as duplicates.
     """
     output_filename = "combined_nebs.xyz"
     xyz_files = get_sorted_xyz_files()
-    combined_frames = []
-    
-    for idx, xyz_file in enumerate(xyz_files):
-        frames = extract_frames(xyz_file)
-        
-        # If not the first file, check for duplicate with the last frame of previous file
-        if idx > 0 and frames[0] == combined_frames[-1]:
-            frames = frames[1:]  # Remove the first frame if it's a duplicate
+    last_frame = None
+
+    # Frames are copied straight from each file without being decoded
+    with open(output_filename, "wb") as outfile:
+        for xyz_file in xyz_files:
+            trajectory = XYZTrajectory(xyz_file)
+            frames = range(len(trajectory))
+            if not frames:
+                continue
 
-        combined_frames.extend(frames)
+            # If not the first file, check for duplicate with the last frame of previous file
+            if last_frame is not None and frames_match(last_frame, trajectory[0], decimals):
+                frames = frames[1:]  # Remove the first frame if it's a duplicate
 
-    # Write the combined frames to a new file
-    with open(output_filename, "w") as outfile:
-        for frame in combined_frames:
-            outfile.write(frame)
+            trajectory.write_frames(outfile, frames)
+            last_frame = trajectory[-1]
     
     print(f"Combined trajectory written to {output_filename}")
 
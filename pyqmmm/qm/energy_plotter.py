@@ -4,8 +4,17 @@ import matplotlib.pyplot as plt
 import numpy as np
 import csv
 import time
+from pyqmmm.qm.xyz_trajectory import XYZTrajectory, load_cache
 
 HARTREE_TO_KCAL = 627.509
+# Whitespace-separated column of the comment line that holds the energy
+ENERGY_COLUMNS = {
+    "ORCA-MEP": 5,
+    "ORCA-IRC": 5,
+    "ORCA": 4,
+    "TeraChem-scan": 4,
+    "TeraChem-opt": 0,
+}
 
 def write_energies_to_csv(energies_by_file, energies_hartrees_by_file, filename="energy_plot_data.csv"):
     """
@@ -45,20 +54,49 @@ def parse_energy(line, software):
         The energy extracted from the line, in Hartrees.
 
     """
-    if software == "ORCA-MEP" or software == "ORCA-IRC":
-        energy_str = line.split()[5]
-    elif software == "ORCA":
-        energy_str = line.split()[4]
-    elif software == "TeraChem-scan":
-        energy_str = line.split()[4]
-    elif software == "TeraChem-opt":
-        energy_str = line.split()[0]
-    else:
+    if software not in ENERGY_COLUMNS:
         raise ValueError(f"Unsupported software: {software}")
+    energy_str = line.split()[ENERGY_COLUMNS[software]]
 
     return float(energy_str)
 
 
+def read_energies(filename, software):
+    """
+    Read the energy of every frame in an xyz trajectory.
+
+    Energies stored in the binary cache are used when it is up to date.
+    Otherwise only the comment line of each frame is read.
+    The frame index lets us seek from one comment line to the next
+    without touching the atom lines in between.
+
+    Parameters
+    ----------
+    filename : str
+        Path to the trajectory file.
+    software: str
+        Software used for the calculation.
+
+    Returns
+    -------
+    numpy.ndarray
+        The absolute energy of each frame, in Hartrees.
+
+    """
+    if software not in ENERGY_COLUMNS:
+        raise ValueError(f"Unsupported software: {software}")
+
+    # Prefer energies from an up-to-date binary cache of the same software
+    cache = load_cache(filename, keys=["software", "energies"])
+    if cache is not None and cache["software"] == software:
+        return cache["energies"]
+
+    column = ENERGY_COLUMNS[software]
+    comments = XYZTrajectory(filename).comments()
+
+    return np.array([comment.split()[column] for comment in comments], dtype=float)
+
+
 def get_trajectory_energies(filename, software):
     """
     Parse the energies from an xyz trajectory file.
@@ -78,27 +116,13 @@ def get_trajectory_energies(filename, software):
         Third value is a list of absolute energies in Hartrees.
 
     """
-    energies_hartrees = []
-    with open(filename, "r") as f:
-        while True:
-            line = f.readline()
-            if not line:
-                break  # end of file
-
-            atom_count = int(line.strip())
-            # next line should contain energy
-            energy_line = f.readline().strip()
-            # parse and append energy
-            energies_hartrees.append(parse_energy(energy_line, software))
-            # skip atom lines
-            for _ in range(atom_count):
-                f.readline()
+    energies_hartrees = read_energies(filename, software)
 
     # convert energies to kcal/mol and subtract first energy to make it relative
     first_energy = energies_hartrees[0] * HARTREE_TO_KCAL
-    energies_kcal = [(e - energies_hartrees[0]) * HARTREE_TO_KCAL for e in energies_hartrees]
+    energies_kcal = (energies_hartrees - energies_hartrees[0]) * HARTREE_TO_KCAL
 
-    return energies_kcal, first_energy, energies_hartrees
+    return energies_kcal.tolist(), first_energy, energies_hartrees.tolist()
 
 
 def identify_software(line):
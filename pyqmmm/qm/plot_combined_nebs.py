@@ -6,6 +6,7 @@ import csv
 import time
 import os
 import re
+import pyqmmm.qm.energy_plotter
 
 HARTREE_TO_KCAL = 627.509
 
@@ -35,36 +36,6 @@ def write_energies_to_csv(total_energies, filename="energy_plot_data.csv"):
         for i, energy in enumerate(total_energies):
             writer.writerow([i, energy])
 
-def parse_energy(line, software):
-    """
-    Parse the energy from a line based on the software used.
-
-    Parameters
-    ----------
-    line : str
-        Line from the file containing energy information.
-    software: str
-        The software used for the calculation.
-
-    Returns
-    -------
-    float
-        The energy extracted from the line, in Hartrees.
-
-    """
-    if software == "ORCA-MEP" or software == "ORCA-IRC":
-        energy_str = line.split()[5]
-    elif software == "ORCA":
-        energy_str = line.split()[4]
-    elif software == "TeraChem-scan":
-        energy_str = line.split()[4]
-    elif software == "TeraChem-opt":
-        energy_str = line.split()[0]
-    else:
-        raise ValueError(f"Unsupported software: {software}")
-
-    return float(energy_str)
-
 def get_trajectory_energies(filename, software):
     """
     Parse the energies from an xyz trajectory file.
@@ -84,25 +55,13 @@ def get_trajectory_energies(filename, software):
         Third value is a list of absolute energies in Hartrees.
 
     """
-    energies_hartrees = []
-    with open(filename, "r") as f:
-        while True:
-            line = f.readline()
-            if not line:
-                break  # end of file
-
-            atom_count = int(line.strip())
-            # next line should contain energy
-            energy_line = f.readline().strip()
-            # parse and append energy
-            energies_hartrees.append(parse_energy(energy_line, software))
-            # skip atom lines
-            for _ in range(atom_count):
-                f.readline()
+    # Header-only scan shared with energy_plotter
+    energies_hartrees = pyqmmm.qm.energy_plotter.read_energies(filename, software)
 
     # Convert energies to kcal/mol (absolute energies)
-    energies_kcal_abs = [e * HARTREE_TO_KCAL for e in energies_hartrees]
+    energies_kcal_abs = (energies_hartrees * HARTREE_TO_KCAL).tolist()
     first_energy_kcal = energies_kcal_abs[0]
+    energies_hartrees = energies_hartrees.tolist()
 
     return energies_kcal_abs, first_energy_kcal, energies_hartrees
 
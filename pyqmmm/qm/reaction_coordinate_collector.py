@@ -1,8 +1,9 @@
 """Extract RC against energy and generate CSV."""
 
-from scipy.spatial import distance
 import numpy as np
+import pandas as pd
 import os
+from pyqmmm.qm.xyz_trajectory import XYZTrajectory
 
 
 def request_rc(rc_request):
@@ -16,6 +17,7 @@ def request_rc(rc_request):
 
     """
     # What atoms define your reaction coordinate
+    atoms = []
     request = input(f"Atoms in your {rc_request} RC? (e.g., 1_2): ")
 
     # Check if RC is requested and onvert to a list even if it is hyphenated
@@ -44,25 +46,184 @@ def get_distance(atoms, xyz_file):
         List of values mapping to the distance that two atoms have moved.
 
     """
-    atom_count = 0
-    coords_list = []
-    dist_list = []
-    with open(xyz_file, "r") as scan_optim:
-        for line in scan_optim:
-            if line[:9] == "Converged":
-                atom_count = 0
-            if atom_count in atoms:
-                line_elements = line.split()
-                coords = line_elements[1:4]
-                coords_list.append(list(map(float, coords)))
-                if len(coords_list) and len(coords_list) % 2 == 0:
-                    atom_1 = tuple(coords_list[-1])
-                    atom_2 = tuple(coords_list[-2])
-                    dist = distance.euclidean(atom_1, atom_2)
-                    dist_list.append(dist)
-            atom_count += 1
+    dist_list = compute_coordinates(xyz_file, [tuple(atoms)], get_converged_frames(xyz_file))
 
-    return dist_list
+    return dist_list[:, 0].tolist()
+
+
+def measure_distances(a, b):
+    """Distance between two (frames, 3) arrays of positions for every frame."""
+    return np.linalg.norm(a - b, axis=1)
+
+
+def measure_angles(a, b, c):
+    """Angle a-b-c in degrees for every frame, with b as the vertex."""
+    ba = a - b
+    bc = c - b
+    cosine = np.einsum("ij,ij->i", ba, bc) / (
+        np.linalg.norm(ba, axis=1) * np.linalg.norm(bc, axis=1)
+    )
+    return np.degrees(np.arccos(np.clip(cosine, -1.0, 1.0)))
+
+
+def measure_dihedrals(a, b, c, d):
+    """Dihedral angle a-b-c-d in degrees for every frame, in the range (-180, 180]."""
+    b0 = a - b
+    b1 = c - b
+    b2 = d - c
+    b1 = b1 / np.linalg.norm(b1, axis=1)[:, None]
+    # Project the outer bonds onto the plane perpendicular to the central bond
+    v = b0 - np.einsum("ij,ij->i", b0, b1)[:, None] * b1
+    w = b2 - np.einsum("ij,ij->i", b2, b1)[:, None] * b1
+    x = np.einsum("ij,ij->i", v, w)
+    y = np.einsum("ij,ij->i", np.cross(b1, v), w)
+    return np.degrees(np.arctan2(y, x))
+
+
+MEASUREMENTS = {2: measure_distances, 3: measure_angles, 4: measure_dihedrals}
+MEASUREMENT_NAMES = {2: "distance", 3: "angle", 4: "dihedral"}
+
+
+def check_definitions(definitions, natoms):
+    """
+    Make sure every reaction coordinate can be measured in the trajectory.
+
+    Parameters
+    ----------
+    definitions : list[tuple[int]]
+        One-based atom indices of each coordinate.
+    natoms : int
+        Number of atoms in each frame of the trajectory.
+
+    Raises
+    ------
+    ValueError
+        If a coordinate does not have 2, 3 or 4 atoms or an atom is not between 1 and natoms.
+
+    """
+    for definition in definitions:
+        if len(definition) not in MEASUREMENTS:
+            raise ValueError(f"A reaction coordinate needs 2, 3 or 4 atoms, {list(definition)} has {len(definition)}.")
+        for atom in definition:
+            if not 1 <= atom <= natoms:
+                raise ValueError(f"Atom {atom} in {list(definition)} is not between 1 and {natoms}.")
+
+
+def coordinate_names(definitions):
+    """
+    Name each reaction coordinate after its atoms, e.g., 1_2 for a distance.
+
+    A coordinate defined more than once gets a numbered suffix, e.g., 1_2.1,
+    so every column of the reaction table is unique.
+
+    Parameters
+    ----------
+    definitions : list[tuple[int]]
+        One-based atom indices of each coordinate.
+
+    Returns
+    -------
+    names : list[str]
+        A unique name for each coordinate in the same order.
+
+    """
+    names = []
+    seen = {}
+    for definition in definitions:
+        name = "_".join(map(str, definition))
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+
+    return names
+
+
+def get_converged_frames(xyz_file):
+    """
+    Find the frames of a TeraChem scan whose comment line marks a converged step.
+
+    These are the frames get_opt_energies() reports energies for.
+
+    Returns
+    -------
+    frames : list[int]
+        Zero-based indices of the converged frames.
+
+    """
+    comments = XYZTrajectory(xyz_file).comments()
+
+    return [index for index, comment in enumerate(comments) if comment[:9] == "Converged"]
+
+
+def compute_coordinates(xyz_file, definitions, frames=None):
+    """
+    Evaluate any number of distances, angles and dihedrals for every frame.
+
+    The coordinates of only the referenced atoms are read, in a single pass over the file.
+    Each reaction coordinate is then computed for all frames at once with NumPy.
+
+    Parameters
+    ----------
+    xyz_file : str
+        The file name of a trajectory.
+    definitions : list[tuple[int]]
+        One-based atom indices of each coordinate.
+        Two atoms define a distance, three an angle and four a dihedral.
+    frames : list[int], optional
+        Zero-based frames to evaluate, all frames by default.
+
+    Returns
+    -------
+    values : numpy.ndarray
+        Array of shape (frames, coordinates), distances in Å and angles in degrees.
+
+    """
+    trajectory = XYZTrajectory(xyz_file)
+    check_definitions(definitions, trajectory.natoms)
+
+    atoms = sorted({atom for definition in definitions for atom in definition})
+    column = {atom: index for index, atom in enumerate(atoms)}
+    positions = trajectory.coordinates(frames, [atom - 1 for atom in atoms])
+
+    values = np.empty((len(positions), len(definitions)))
+    for index, definition in enumerate(definitions):
+        points = [positions[:, column[atom]] for atom in definition]
+        values[:, index] = MEASUREMENTS[len(definition)](*points)
+
+    return values
+
+
+def get_reaction_table(xyz_file, definitions):
+    """
+    Build a table of reaction coordinates and energies for each converged frame.
+
+    Parameters
+    ----------
+    xyz_file : str
+        The file name of a trajectory.
+    definitions : list[tuple[int]]
+        One-based atom indices of each coordinate, see compute_coordinates().
+
+    Returns
+    -------
+    rc_df : pandas.DataFrame
+        One row per converged frame with the frame index, each coordinate named by coordinate_names(),
+        the absolute energy in Hartrees and the relative energy in kcal/mol.
+
+    """
+    frames = get_converged_frames(xyz_file)
+    values = compute_coordinates(xyz_file, definitions, frames)
+    DE_list, E_list = get_opt_energies(xyz_file)
+
+    rc_df = pd.DataFrame(values, columns=coordinate_names(definitions))
+    rc_df.insert(0, "frame", frames)
+    rc_df["energy"] = E_list
+    rc_df["relative_energy"] = DE_list
+
+    return rc_df
 
 
 def get_opt_energies(xyz_file):
@@ -79,18 +240,18 @@ def get_opt_energies(xyz_file):
     """
     DE_list = []
     E_list = []
-    with open(xyz_file, "r") as file:
-        first_energy = None
-        for line in file:
-            if line[:9] == "Converged":
-                line = line.split()
-                energy = float(line[4])
-                if first_energy is None:
-                    first_energy = energy
-                relative_energy = (energy - first_energy) * 627.5
-                absolute_energy = energy
-                DE_list.append(relative_energy)
-                E_list.append(absolute_energy)
+    first_energy = None
+    # The comment lines are found through the (cached) frame index
+    for line in XYZTrajectory(xyz_file).comments():
+        if line[:9] == "Converged":
+            line = line.split()
+            energy = float(line[4])
+            if first_energy is None:
+                first_energy = energy
+            relative_energy = (energy - first_energy) * 627.5
+            absolute_energy = energy
+            DE_list.append(relative_energy)
+            E_list.append(absolute_energy)
 
     # Return lists of relative and absolute energies
     return DE_list, E_list
@@ -140,30 +301,33 @@ def reaction_coordinate_collector():
     else:
         xyz_file = input("   > What xyz file would you like to use?")
 
-    DE_list, E_list = get_opt_energies(xyz_file)
-    # Energy against first distance coordinate
-    rc1_dist_atoms, rc1_request = request_rc("first")
-    if rc1_request != "":
-        rc1_dist_list = get_distance(rc1_dist_atoms, xyz_file)
-        get_reaction_csv(rc1_dist_list, E_list, "rc1_v_energy")
-
-    # Energy against second distance coordinate
-    rc2_dist_atoms, rc2_request = request_rc("second")
-    if rc2_request != "":
-        rc2_dist_list = get_distance(rc2_dist_atoms, xyz_file)
-        get_reaction_csv(rc2_dist_list, E_list, "rc2_v_energy")
+    # Collect both distance coordinates before making a single pass over the file
+    rc_requests = [request_rc("first"), request_rc("second")]
+    rc_names = [name for name, (atoms, request) in zip(["rc1", "rc2"], rc_requests) if request != ""]
+    definitions = [tuple(atoms) for atoms, request in rc_requests if request != ""]
+    rc_df = get_reaction_table(xyz_file, definitions)
+    rc_df.to_csv("./reaction_coordinates.csv", index=False)
+    E_list = rc_df["energy"]
+
+    # Energy against each coordinate
+    rc_dist_lists = []
+    for name, definition, column in zip(rc_names, definitions, coordinate_names(definitions)):
+        print(f"   > {name} is the {MEASUREMENT_NAMES[len(definition)]} between atoms {list(definition)}")
+        rc_dist_list = rc_df[column].to_numpy()
+        get_reaction_csv(rc_dist_list, E_list, f"{name}_v_energy")
+        rc_dist_lists.append(rc_dist_list)
 
     # Calculate differences of differences
-    rc1_dist_list = np.array(rc1_dist_list)
-    rc2_dist_list = np.array(rc2_dist_list)
-    # Check to see which coordinate is larger
-    if rc1_dist_list[0] > rc2_dist_list[0]:
-        diff_dist_list = rc2_dist_list - rc1_dist_list
-    else:
-        diff_dist_list = rc1_dist_list - rc2_dist_list
-    get_reaction_csv(diff_dist_list, E_list, "dd_v_energy")
-    get_reaction_csv(diff_dist_list, rc1_dist_list, "dd_v_rc1")
-    get_reaction_csv(diff_dist_list, rc2_dist_list, "dd_v_rc2")
+    if len(rc_dist_lists) == 2:
+        rc1_dist_list, rc2_dist_list = rc_dist_lists
+        # Check to see which coordinate is larger
+        if rc1_dist_list[0] > rc2_dist_list[0]:
+            diff_dist_list = rc2_dist_list - rc1_dist_list
+        else:
+            diff_dist_list = rc1_dist_list - rc2_dist_list
+        get_reaction_csv(diff_dist_list, E_list, "dd_v_energy")
+        get_reaction_csv(diff_dist_list, rc1_dist_list, "dd_v_rc1")
+        get_reaction_csv(diff_dist_list, rc2_dist_list, "dd_v_rc2")
 
 
 if __name__ == "__main__":
@@ -4,6 +4,7 @@ import os
 import sys
 import numpy
 from typing import List
+from pyqmmm.qm.xyz_trajectory import XYZTrajectory
 
 
 def get_selection():
@@ -28,61 +29,91 @@ def get_selection():
     return selection
 
 
-def remove_atoms(selection: List[int]) -> List[List[str]]:
+def remove_atoms(selection: List[int]) -> int:
     """
     Removes an atom and creates a new xyz.
 
     Takes an atom selection as input.
     Generates a new trajectory with those atoms removed.
     The final format is the .xyz format.
+    Frames are filtered and written one at a time,
+    so the memory used does not grow with the length of the trajectory.
 
     Parameters
     ----------
     selection : list[int]
         A list of atoms.
 
+    Returns
+    -------
+    frame_count : int
+        The number of frames written to new_traj.xyz.
+
     """
     # Search the current directory for the .xyz file
     xyz_files = [f for f in os.listdir(".") if f.endswith("xyz")]
     if len(xyz_files) != 1:
         raise ValueError("   > More than one .xyz file found.")
     xyz_file = xyz_files[0]
+    trajectory = XYZTrajectory(xyz_file)
+
+    # Build the keep mask once from the one-based selection
+    selection = numpy.asarray(selection, dtype=int)
+    outside = selection[(selection < 1) | (selection > trajectory.natoms)]
+    if len(outside):
+        raise ValueError(
+            f"   > Atoms {outside.tolist()} are not between 1 and {trajectory.natoms} in {xyz_file}."
+        )
+    keep = numpy.ones(trajectory.natoms, dtype=bool)
+    keep[selection - 1] = False
+    kept_atoms = numpy.flatnonzero(keep).tolist()
+
+    # Write out the new xyz file as each frame is filtered
+    frame_count = 0
+    with open("new_traj.xyz", "w") as new_traj_out:
+        for frame in trajectory.iter_text():
+            lines = frame.splitlines()
+            atom_lines = lines[2:]
+            new_traj_out.write(f"{len(kept_atoms)}\n{lines[1].strip()}\n")
+            new_traj_out.writelines(atom_lines[index].strip() + "\n" for index in kept_atoms)
+            frame_count += 1
+
+    return frame_count
+
+
+def read_pdb_template(template_file: str = "template.pdb") -> str:
+    """
+    Parses a PDB template into a format string for a whole frame.
 
-    # Lines in the molecule plus the header lines
-    with open(xyz_file) as traj_orig:
-        section_length = int(traj_orig.readline().strip()) + 2
-
-    with open(xyz_file) as traj_orig:
-        # Convert file to list of lists
-        unsorted_lines: list[str] = []
-        for line in traj_orig:
-            stripped_line = line.strip()
-            unsorted_lines.append(stripped_line)
-
-        # Place each frame in its own list
-        n = section_length
-        frames = [
-            unsorted_lines[i * n : (i + 1) * n]
-            for i in range((len(unsorted_lines) + n - 1) // n)
-        ]
-        new_frames: list[list[str]] = []
+    The ATOM and HETATM records are split once into the fixed-width columns
+    before (1-30) and after (55-80) the coordinates.
+    The coordinate columns are replaced with %8.3f placeholders,
+    so a frame is formatted with a single string operation.
+
+    Parameters
+    ----------
+    template_file : str
+        The name of the PDB template with one record per atom in the xyz.
 
-        # Loop over the frames and delete all rows that match the selection
-        for frame in frames:
-            for index in sorted(selection, reverse=True):
-                index += 1
-                del frame[index]
-            # Update the header line to match the new atom count
-            frame[0] = str(int(frame[0]) - len(selection))
-            new_frames.append(frame)
+    Returns
+    -------
+    frame_format : str
+        Format string expecting the x, y and z of every atom in order.
 
-    # Write out the new xyz file
-    new_traj_out = open("new_traj.xyz", "w")
-    for frame in new_frames:
-        for line in frame:
-            new_traj_out.write(line + "\n")
+    """
+    with open(template_file, "r") as template:
+        records = [
+            line.rstrip("\n").ljust(80) for line in template if line[:6] in ("ATOM  ", "HETATM")
+        ]
+
+    # Literal percent signs in the template must not be read as placeholders
+    prefixes = [record[:30].replace("%", "%%") for record in records]
+    suffixes = [record[54:80].rstrip().replace("%", "%%") for record in records]
+    frame_format = "".join(
+        f"{prefix}%8.3f%8.3f%8.3f{suffix}\n" for prefix, suffix in zip(prefixes, suffixes)
+    )
 
-    return new_frames
+    return frame_format
 
 
 def get_pdb_ensemble():
@@ -90,36 +121,23 @@ def get_pdb_ensemble():
     Takes an xyz trajectory and a PDB template file.
     Creates a PDB ensemble file.
 
+    The template is parsed once and each frame is written as its own MODEL block,
+    so the trajectory never has to be held in memory.
+
     """
-    # Initialize files
-    template = open("template.pdb", "r").readlines()
-    xyz_file = open("new_traj.xyz", "r").readlines()
-    pdb_file = open("new_traj.pdb", "w")
-
-    # Initialize count variables
-    max_atom = int(
-        open("template.pdb", "r").readlines()[-1].split()[1]
-    )  # Final atom number
-    atom = -1  # Account for two header lines in the xyz
-    model = 2  # MODEL 1 was already written
-
-    pdb_file.write("MODEL        1\n")
-    for index, line in enumerate(xyz_file):
-        # If we have passed the xyz header lines
-        if atom > 0:
-            x, y, z = line.strip("\n").split()[1:5]
-            pdb_file.write(
-                f"{template[atom - 1][0:32]}{x[0:6]}  {y[0:6]}  {z[0:6]}{template[atom - 1][54:80]}\n"
-            )
-            atom += 1
-        # If it is the first line continue
-        else:
-            atom += 1
-        # If we have reached the end of the file
-        if atom > max_atom:
-            pdb_file.write(f"TER\nENDMDL\nMODEL        {model}\n")
-            atom = -1
-            model += 1
+    frame_format = read_pdb_template("template.pdb")
+    atom_count = frame_format.count("\n")
+    trajectory = XYZTrajectory("new_traj.xyz", use_sidecar=False)
+
+    with open("new_traj.pdb", "w") as pdb_file:
+        for model, frame in enumerate(trajectory.iter_frames(), start=1):
+            if frame.natoms != atom_count:
+                raise ValueError(
+                    f"   > Frame {model} has {frame.natoms} atoms but template.pdb has {atom_count}."
+                )
+            pdb_file.write(f"MODEL     {model:4d}\n")
+            pdb_file.write(frame_format % tuple(frame.coordinates.ravel()))
+            pdb_file.write("TER\nENDMDL\n")
 
 
 def traj_atom_filter():
@@ -1,7 +1,9 @@
 """Combine frames into a single file."""
 
 import glob
+import json
 import pyqmmm.qm.reaction_coordinate_collector
+from pyqmmm.qm.xyz_trajectory import XYZTrajectory
 
 
 def get_xyz_filenames():
@@ -50,6 +52,29 @@ def get_xyz_filenames():
     return xyz_filename_list
 
 
+def parse_frames(request):
+    """
+    Convert a frame request such as "1-5,8" into a list of frame numbers.
+
+    Parameters
+    ----------
+    request : str
+        Comma-separated one-based frame numbers or hyphenated ranges.
+
+    Returns
+    -------
+    frames : list
+        The one-based frame numbers in the order they were requested.
+    """
+    temp = [
+        (lambda sub: range(sub[0], sub[-1] + 1))(list(map(int, ele.split("-"))))
+        for ele in request.split(",")
+    ]
+    frames = [b for a in temp for b in a]
+
+    return frames
+
+
 def request_frames(xyz_filename):
     """
     Get the request frames for each file from the user.
@@ -72,60 +97,98 @@ def request_frames(xyz_filename):
     if request == "":
         return request
     # Check the request and convert it to a list even if it is hyphenated
-    temp = [
-        (lambda sub: range(sub[0], sub[-1] + 1))(list(map(int, ele.split("-"))))
-        for ele in request.split(",")
-    ]
-    frames = [b for a in temp for b in a]
+    frames = parse_frames(request)
 
     print(f"   > For {xyz_filename} you requested frames {frames}.")
 
     return frames
 
 
-def multiframe_xyz_to_list(xyz_filename):
+def merge_xyz_files(selections, combined_filename="combined.xyz"):
+    """
+    Writes the selected frames of several xyz files into one trajectory.
+
+    Each file is opened with the indexed reader and only the requested frames
+    are copied, so the work grows with the number of frames written
+    rather than with the size of the input files.
+
+    Parameters
+    ----------
+    selections : list[tuple]
+        Tuples of (xyz_filename, frames, reverse).
+        frames is a list of one-based frame numbers, or None for all frames.
+        Frames are taken in file order and reversed if reverse is True.
+    combined_filename : str
+        The name of the merged trajectory.
+
+    Raises
+    ------
+    ValueError
+        If a requested frame is not in its trajectory, before anything is written.
+    """
+    # Check every request before the combined file is created
+    plan = []
+    for xyz_filename, frames, reverse in selections:
+        trajectory = XYZTrajectory(xyz_filename)
+        if frames is None:
+            indices = list(range(len(trajectory)))
+        else:
+            outside = sorted({frame for frame in frames if not 0 < frame <= len(trajectory)})
+            if outside:
+                raise ValueError(f"Frames {outside} are not between 1 and {len(trajectory)} in {xyz_filename}.")
+            # Duplicate requests are written once, in file order
+            indices = sorted({frame - 1 for frame in frames})
+        if reverse:
+            indices.reverse()
+        plan.append((trajectory, indices))
+
+    with open(combined_filename, "wb") as combined_file:
+        for trajectory, indices in plan:
+            trajectory.write_frames(combined_file, indices)
+            print(f"   > Added {len(indices)} of {len(trajectory)} frames from {trajectory.filename}.")
+    print(f"   > Your combined xyz was written to {combined_filename}\n")
+
+
+def read_merge_spec(spec_file):
     """
-    Turns an xyz trajectory file into a list of lists where each element is a frame.
+    Reads a JSON file describing a merge so it can run without prompts.
+
+    Example spec::
+
+        {
+            "output": "combined.xyz",
+            "files": [
+                {"file": "1.xyz", "frames": "1-40"},
+                {"file": "2.xyz", "frames": "3-25,27", "reverse": true}
+            ]
+        }
+
+    "frames" uses the same syntax as the interactive prompt and defaults to all frames.
+    "reverse" defaults to false and "output" to combined.xyz.
 
     Parameters
     ----------
-    xyz_filename : string
-        The file name of a trajectory.
+    spec_file : str
+        Path to the JSON spec.
 
     Returns
     -------
-    trajectory_list : list
-        List of lists containing the trajectory with each frame saved as an element.
-
+    selections : list[tuple]
+        Tuples of (xyz_filename, frames, reverse) for merge_xyz_files().
+    combined_filename : str
+        The name of the merged trajectory.
     """
-    # Variables that measure our progress in parsing the optim.xyz file
-    xyz_as_list = []  # List of lists containing all frames
-    frame_contents = ""
-    line_count = 0
-    frame_count = 0
-    first_line = True  # Marks if we've looked at the atom count yet
-
-    # Loop through optim.xyz and collect distances, energies and frame contents
-    with open(xyz_filename, "r") as trajectory:
-        for line in trajectory:
-            # We determine the section length using the atom count in first line
-            if first_line == True:
-                section_length = int(line.strip()) + 2
-                first_line = False
-            # At the end of the section reset the frame-specific variables
-            if line_count == section_length:
-                line_count = 0
-                xyz_as_list.append(frame_contents)
-                frame_contents = ""
-                frame_count += 1
-            frame_contents += line
-            line_count += 1
-
-        xyz_as_list.append(frame_contents)
-
-    print(f"   > We found {len(xyz_as_list)} frames in {xyz_filename}.")
-
-    return xyz_as_list
+    with open(spec_file, "r") as f:
+        spec = json.load(f)
+
+    selections = []
+    for entry in spec["files"]:
+        frames = entry.get("frames")
+        if isinstance(frames, str):
+            frames = parse_frames(frames)
+        selections.append((entry["file"], frames, bool(entry.get("reverse", False))))
+
+    return selections, spec.get("output", "combined.xyz")
 
 
 def combine_xyz_files():
@@ -136,34 +199,21 @@ def combine_xyz_files():
     # Find xyz trajectories in the current directory
     combined_filename = "combined.xyz"
     xyz_filename_list = get_xyz_filenames()
-    # For each xyz file convert to a list with only the requested frames
-    combined_xyz_list = []
+    # For each xyz file collect the requested frames
+    selections = []
     for file in xyz_filename_list:
         requested_frames = request_frames(file)
         # The user can skip files by with enter which returns an empty string
-        if requested_frames == "":
+        if not requested_frames:
             continue
-        # Convert the xyz files to a list
-        xyz_list = multiframe_xyz_to_list(file)
-        requested_xyz_list = [
-            frame
-            for index, frame in enumerate(xyz_list)
-            if index + 1 in requested_frames
-        ]
         # Ask the user if they want the frames reversed for a given xyz file
         reverse = input(f"   > Any key to reverse {file} else Return: ")
-        if reverse:
-            requested_xyz_list.reverse()
-            reverse = False
-        combined_xyz_list += requested_xyz_list
+        selections.append((file, requested_frames, bool(reverse)))
     # Write the combined trajectories out to a new file called combined.xyz
-    with open(combined_filename, "w") as combined_file:
-        for entry in combined_xyz_list:
-            combined_file.write(entry)
-    print(f"   > Your combined xyz was written to {combined_filename}\n")
+    merge_xyz_files(selections, combined_filename)
 
 
-def xyz_merger():
+def xyz_merger(spec_file=None):
     """
     Reaction path calculations often need to be restarted from a later point.
 
@@ -171,6 +221,13 @@ def xyz_merger():
     Afterwards, the .xyz files of the two scans need to be stitched together.
     Here, users can specify the frames from each file that need to be combined.
     The script will generate a new combined file.
+
+    If a JSON spec is given (see read_merge_spec()), the merge runs without any prompts.
+
+    Parameters
+    ----------
+    spec_file : str, optional
+        Path to a JSON spec describing the merge, the prompts are used by default.
     """
 
     # Welcome the user to the file and introduce basic functionality
@@ -180,7 +237,15 @@ def xyz_merger():
     print("Searches current directory for xyz trajectory files.")
     print("You can combine as many xyz files as you need.")
     print("Name your xyz file as 1.xyz, 2.xyz, etc.")
-    print("Leave the prompt blank to ignore an xyz file.\n")
+    print("Leave the prompt blank to ignore an xyz file.")
+    print("Pass a JSON spec with --spec to merge without prompts.\n")
+
+    # Run unattended if the merge is described in a spec file
+    if spec_file:
+        print(f"   > Using the merge described in {spec_file}")
+        selections, combined_filename = read_merge_spec(spec_file)
+        merge_xyz_files(selections, combined_filename)
+        return
 
     # STEP 1: Combine two different xyz files
     combine_xyz_files()
@@ -188,7 +253,7 @@ def xyz_merger():
     # STEP 2: Perform reaction coordinate analysis
     perform_rc_analysis = input("   > Any key to perform analyze RC, else Return: ")
     if perform_rc_analysis:
-        reaction_coordinate_collector.reaction_coordinate_collector()
+        pyqmmm.qm.reaction_coordinate_collector.reaction_coordinate_collector()
 
 
 if __name__ == "__main__":
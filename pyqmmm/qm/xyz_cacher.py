@@ -0,0 +1,67 @@
+"""Convert xyz trajectories into binary caches for faster repeated analysis."""
+
+import time
+import pyqmmm.qm.energy_plotter
+from pyqmmm.qm.xyz_trajectory import XYZTrajectory, write_cache
+
+
+def cache_xyz(xyz_filename):
+    """
+    Parse an xyz trajectory once and store it as a binary cache.
+
+    The software is identified from the first comment line.
+    If it is recognized, the energy of each frame is stored as well.
+
+    Parameters
+    ----------
+    xyz_filename : str
+        The file name of a trajectory.
+
+    Returns
+    -------
+    cache_filename : str
+        The name of the cache file that was written.
+
+    """
+    trajectory = XYZTrajectory(xyz_filename, use_cache=False)
+    try:
+        software = pyqmmm.qm.energy_plotter.identify_software(trajectory.comments(0)[0])
+    except ValueError:
+        print(f"   > Could not identify the software for {xyz_filename}, energies not cached.")
+        return write_cache(xyz_filename)
+
+    energies = pyqmmm.qm.energy_plotter.read_energies(xyz_filename, software)
+    return write_cache(xyz_filename, energies, software)
+
+
+def xyz_cacher():
+    """
+    Converts the requested xyz trajectories into binary caches.
+
+    The caches are written next to each trajectory (e.g., scan_optim.xyz.npz and scan_optim.xyz.npy).
+    Analyses use a cache automatically as long as the xyz file has not changed.
+
+    """
+    print("\n.------------.")
+    print("| XYZ CACHER |")
+    print(".------------.\n")
+    print("Converts xyz trajectories into binary caches.")
+    print("Later analyses of the same trajectories skip parsing the text file.\n")
+
+    start_time = time.time()  # Used to report the execution speed
+
+    filenames_input = input(
+        "   > What trajectories would you like to cache (omit .xyz extension)? "
+    ).split(",")
+    filenames = [f"{name.strip()}.xyz" for name in filenames_input]
+
+    for filename in filenames:
+        cache_filename = cache_xyz(filename)
+        print(f"   > Cached {filename} as {cache_filename}")
+
+    total_time = round(time.time() - start_time, 3)  # Seconds to run the function
+    print(f"   > Cached {len(filenames)} trajectories in {total_time} seconds.\n")
+
+
+if __name__ == "__main__":
+    xyz_cacher()
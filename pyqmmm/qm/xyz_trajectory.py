@@ -0,0 +1,611 @@
+"""Indexed, random-access reader for multi-frame xyz trajectories."""
+
+import collections
+import mmap
+import os
+import numpy as np
+
+# Bytes read at a time when scanning a trajectory for frame boundaries
+CHUNK_SIZE = 1 << 24
+# Sidecar frame index written next to the trajectory, e.g. scan_optim.xyz.idx
+INDEX_EXTENSION = ".idx"
+INDEX_VERSION = 2
+# Binary copy of the parsed trajectory, e.g. scan_optim.xyz.npz
+CACHE_EXTENSION = ".npz"
+# Coordinates are stored on their own so they can be memory-mapped, e.g. scan_optim.xyz.npy
+COORDINATES_EXTENSION = ".npy"
+# Arrays stored in the binary cache besides the file stamp
+CACHE_KEYS = ("coordinates", "elements", "comments", "energies", "software")
+
+Frame = collections.namedtuple("Frame", ["natoms", "comment", "elements", "coordinates"])
+
+
+def _scan_lines(xyz_filename):
+    """
+    Yield the byte offset of the start of every line in a file.
+
+    Parameters
+    ----------
+    xyz_filename : str
+        The file name of a trajectory.
+
+    Yields
+    ------
+    offsets : numpy.ndarray
+        Offsets of the line starts found in the current chunk of the file.
+
+    """
+    position = 0
+    with open(xyz_filename, "rb") as trajectory:
+        yield np.zeros(1, dtype=np.int64)
+        while True:
+            chunk = trajectory.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            newlines = np.flatnonzero(np.frombuffer(chunk, dtype=np.uint8) == 10)
+            yield newlines.astype(np.int64) + position + 1
+            position += len(chunk)
+
+
+def _walk_frames(xyz_filename):
+    """
+    Build a frame index by reading every frame header in turn.
+
+    Slower than the fixed-length scan in build_frame_index(),
+    but handles trajectories whose atom count changes between frames.
+
+    Parameters
+    ----------
+    xyz_filename : str
+        The file name of a trajectory.
+
+    Returns
+    -------
+    offsets : numpy.ndarray
+        Array of shape (frames, 2) with the byte offsets of the start and end of each frame.
+
+    """
+    offsets = []
+    with open(xyz_filename, "rb") as trajectory:
+        while True:
+            start = trajectory.tell()
+            line = trajectory.readline()
+            if not line:
+                break
+            # Skip blank lines between frames
+            if not line.strip():
+                continue
+            natoms = int(line)
+            for _ in range(natoms + 1):
+                trajectory.readline()
+            offsets.append((start, trajectory.tell()))
+
+    return np.array(offsets, dtype=np.int64).reshape(-1, 2)
+
+
+def build_frame_index(xyz_filename):
+    """
+    Find the byte offset of every frame in an xyz trajectory.
+
+    The atom count in the first line determines the frame length.
+    Newlines are located chunk by chunk with NumPy so that the whole file never sits in memory.
+    If the headers found at the expected offsets do not all match the first one,
+    the trajectory is walked frame by frame instead.
+    Each frame ends after its last atom line, so blank lines between or after frames
+    are never part of a frame.
+
+    Parameters
+    ----------
+    xyz_filename : str
+        The file name of a trajectory.
+
+    Returns
+    -------
+    offsets : numpy.ndarray
+        Array of shape (frames, 2) with the byte offsets of the start and end of each frame.
+
+    """
+    with open(xyz_filename, "rb") as trajectory:
+        header = trajectory.readline()
+        if not header.strip():
+            return _walk_frames(xyz_filename)
+        section_length = int(header) + 2
+        trajectory.seek(0, 2)
+        file_size = trajectory.tell()
+
+    # Keep every section_length-th line start, tracking the line number across chunks
+    frame_starts = []
+    line_count = 0
+    for line_starts in _scan_lines(xyz_filename):
+        first = (-line_count) % section_length
+        frame_starts.append(line_starts[first::section_length])
+        line_count += len(line_starts)
+    starts = np.concatenate(frame_starts)
+    # A frame ends where the line after its last atom starts, or at the end of the file
+    ends = np.append(starts[1:], file_size)
+
+    # Drop offsets at the end of the file or in trailing blank lines
+    frame_count = len(starts)
+    with open(xyz_filename, "rb") as trajectory:
+        while frame_count and starts[frame_count - 1] >= file_size:
+            frame_count -= 1
+        while frame_count:
+            trajectory.seek(starts[frame_count - 1])
+            if trajectory.readline().strip():
+                break
+            frame_count -= 1
+
+        # Confirm every frame starts with the same atom count
+        for offset in starts[:frame_count]:
+            trajectory.seek(offset)
+            if trajectory.readline().strip() != header.strip():
+                return _walk_frames(xyz_filename)
+
+    return np.column_stack([starts[:frame_count], ends[:frame_count]])
+
+
+def _file_stamp(xyz_filename):
+    """Size and modification time used to decide if a sidecar file is stale."""
+    stat = os.stat(xyz_filename)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def load_frame_index(xyz_filename):
+    """
+    Load the sidecar frame index of a trajectory if it is still valid.
+
+    Parameters
+    ----------
+    xyz_filename : str
+        The file name of a trajectory.
+
+    Returns
+    -------
+    offsets : numpy.ndarray or None
+        The stored frame offsets, or None if the index is missing or stale.
+
+    """
+    try:
+        stored = np.load(xyz_filename + INDEX_EXTENSION)
+    except (OSError, ValueError, EOFError):
+        return None
+    # The first three entries are the index version, file size and mtime
+    if len(stored) < 3 or tuple(stored[:3]) != (INDEX_VERSION, *_file_stamp(xyz_filename)):
+        return None
+    if (len(stored) - 3) % 2:
+        return None
+
+    return stored[3:].reshape(-1, 2)
+
+
+def save_frame_index(xyz_filename, offsets, stamp=None):
+    """
+    Write the frame index of a trajectory to its sidecar file.
+
+    Failing to write, for example in a read-only directory, is not an error.
+    The index will simply be rebuilt the next time the trajectory is opened.
+
+    Parameters
+    ----------
+    xyz_filename : str
+        The file name of a trajectory.
+    offsets : numpy.ndarray
+        Frame offsets as returned by build_frame_index().
+    stamp : tuple[int, int], optional
+        Size and modification time of the trajectory when it was scanned, read now by default.
+
+    """
+    if stamp is None:
+        stamp = _file_stamp(xyz_filename)
+    header = np.array([INDEX_VERSION, *stamp], dtype=np.int64)
+    try:
+        with open(xyz_filename + INDEX_EXTENSION, "wb") as index_file:
+            np.save(index_file, np.concatenate([header, np.ravel(offsets)]))
+    except OSError:
+        pass
+
+
+def get_frame_index(xyz_filename, use_sidecar=True):
+    """
+    Get the frame offsets of a trajectory, reusing the sidecar index when it is fresh.
+
+    The sidecar is keyed by the size and modification time of the trajectory.
+    If either has changed, the index is rebuilt and the sidecar overwritten.
+    A trajectory that changes while it is scanned, such as a scan that is still running,
+    is indexed but not stored, so the truncated index is never reused.
+
+    Parameters
+    ----------
+    xyz_filename : str
+        The file name of a trajectory.
+    use_sidecar : bool
+        Read and write the sidecar index file.
+
+    Returns
+    -------
+    offsets : numpy.ndarray
+        Array of shape (frames, 2) with the byte offsets of the start and end of each frame.
+
+    """
+    if not use_sidecar:
+        return build_frame_index(xyz_filename)
+
+    offsets = load_frame_index(xyz_filename)
+    if offsets is None:
+        # Stamp the file before scanning so frames appended during the scan are noticed
+        stamp = _file_stamp(xyz_filename)
+        offsets = build_frame_index(xyz_filename)
+        if _file_stamp(xyz_filename) == stamp:
+            save_frame_index(xyz_filename, offsets, stamp)
+
+    return offsets
+
+
+def load_cache(xyz_filename, keys=CACHE_KEYS):
+    """
+    Load the binary cache of a trajectory if it matches the current text file.
+
+    Only the requested arrays are read from the npz archive,
+    so reading the energies does not pull the coordinates into memory.
+    Coordinates are memory-mapped from their own .npy file,
+    so indexing them reads only the requested frames and atoms from disk.
+
+    Parameters
+    ----------
+    xyz_filename : str
+        The file name of a trajectory.
+    keys : iterable of str
+        The cached arrays to read, any of CACHE_KEYS.
+
+    Returns
+    -------
+    cache : dict or None
+        The requested arrays, or None if there is no cache,
+        the trajectory changed since it was written or a key is missing.
+
+    """
+    try:
+        with np.load(xyz_filename + CACHE_EXTENSION) as stored:
+            if tuple(stored["stamp"]) != _file_stamp(xyz_filename):
+                return None
+            cache = {key: stored[key] for key in keys if key != "coordinates"}
+        if "coordinates" in keys:
+            cache["coordinates"] = np.load(xyz_filename + COORDINATES_EXTENSION, mmap_mode="r")
+    except (OSError, ValueError, EOFError, KeyError):
+        return None
+    if "software" in cache:
+        cache["software"] = str(cache["software"])
+
+    return cache
+
+
+def write_cache(xyz_filename, energies=None, software=""):
+    """
+    Convert a trajectory into a compact binary cache next to the text file.
+
+    Coordinates are stored as a float32 .npy array of shape (frames, atoms, 3),
+    the elements, comments and energies in an npz archive next to it.
+    The cache is keyed by the size and modification time of the trajectory
+    before it is parsed, so it is ignored as soon as the text file changes,
+    including while it is being cached.
+
+    Parameters
+    ----------
+    xyz_filename : str
+        The file name of a trajectory.
+    energies : numpy.ndarray, optional
+        The energy of each frame in Hartrees.
+    software : str, optional
+        Software tag as returned by energy_plotter.identify_software().
+
+    Returns
+    -------
+    cache_filename : str
+        The name of the cache file that was written.
+
+    """
+    # Stamp the file before parsing so frames appended in the meantime make the cache stale
+    stamp = _file_stamp(xyz_filename)
+    trajectory = XYZTrajectory(xyz_filename, use_cache=False)
+    elements = trajectory.elements
+    coordinates = np.empty((len(trajectory), len(elements), 3), dtype=np.float32)
+    for index, frame in enumerate(trajectory.iter_frames()):
+        if frame.natoms != len(elements):
+            raise ValueError(f"Frame {index} of {xyz_filename} has a different atom count.")
+        coordinates[index] = frame.coordinates
+    if energies is None:
+        energies = np.full(len(trajectory), np.nan)
+    if len(energies) != len(trajectory):
+        raise ValueError(f"Got {len(energies)} energies for {len(trajectory)} frames of {xyz_filename}.")
+
+    # The archive is written last, so its stamp only matches once both files are complete
+    np.save(xyz_filename + COORDINATES_EXTENSION, coordinates)
+    cache_filename = xyz_filename + CACHE_EXTENSION
+    with open(cache_filename, "wb") as cache_file:
+        np.savez(
+            cache_file,
+            stamp=np.array(stamp, dtype=np.int64),
+            elements=elements,
+            comments=np.array(trajectory.comments()),
+            energies=np.asarray(energies, dtype=float),
+            software=np.array(software),
+        )
+
+    return cache_filename
+
+
+class XYZTrajectory:
+    """
+    Random-access view of an xyz trajectory.
+
+    Frame offsets are found once and stored in a sidecar file next to the trajectory.
+    Frames are then read on demand, so any frame or slice of a multi-GB trajectory
+    can be extracted without loading the rest of the file.
+
+    Parameters
+    ----------
+    xyz_filename : str
+        The file name of a trajectory.
+    use_sidecar : bool
+        Reuse and store the frame index in a sidecar file, see get_frame_index().
+    use_cache : bool
+        Serve elements, comments and coordinates from the binary cache when it is up to date,
+        see write_cache(). Raw frames are always read from the text file.
+
+    Examples
+    --------
+    >>> traj = XYZTrajectory("scan_optim.xyz")
+    >>> len(traj)
+    >>> traj[-1].coordinates
+    >>> traj.coordinates(frames=slice(0, 10), atoms=[0, 5])
+
+    """
+
+    def __init__(self, xyz_filename, use_sidecar=True, use_cache=True):
+        self.filename = xyz_filename
+        self.offsets = get_frame_index(xyz_filename, use_sidecar)
+        self.use_cache = use_cache
+        self._cache = {}
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def _cached(self, key):
+        """Read one array from the binary cache on first use, or None if unavailable."""
+        if not self.use_cache:
+            return None
+        if key not in self._cache:
+            stored = load_cache(self.filename, keys=[key])
+            # Remember a missing or stale cache so it is not looked for again
+            self._cache[key] = None if stored is None else stored[key]
+        return self._cache[key]
+
+    def __iter__(self):
+        return self.iter_frames()
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self._parse_frame(text) for text in self.iter_text(range(len(self))[key])]
+        return self._parse_frame(self.frame_text(key))
+
+    def _frame_indices(self, frames):
+        """Convert an int, slice, iterable or None into a list of frame indices."""
+        if frames is None:
+            return range(len(self))
+        if isinstance(frames, slice):
+            return range(len(self))[frames]
+        if isinstance(frames, (int, np.integer)):
+            frames = [frames]
+        return [range(len(self))[int(index)] for index in frames]
+
+    def frame_bytes(self, index):
+        """
+        Read the raw contents of a single frame.
+
+        Parameters
+        ----------
+        index : int
+            Zero-based frame index, negative values count from the end.
+
+        Returns
+        -------
+        frame : bytes
+            The header, comment and atom lines of the frame.
+
+        """
+        start, end = self.offsets[range(len(self))[index]]
+        with open(self.filename, "rb") as trajectory:
+            trajectory.seek(start)
+            return trajectory.read(end - start)
+
+    def frame_text(self, index):
+        """Read a single frame as a string, see frame_bytes()."""
+        return self.frame_bytes(index).decode()
+
+    def iter_text(self, frames=None):
+        """
+        Yield the requested frames as strings, keeping only one in memory.
+
+        Parameters
+        ----------
+        frames : int, slice or list[int], optional
+            Zero-based frames to read, all frames by default.
+
+        """
+        with open(self.filename, "rb") as trajectory:
+            for index in self._frame_indices(frames):
+                start, end = self.offsets[index]
+                trajectory.seek(start)
+                yield trajectory.read(end - start).decode()
+
+    def iter_frames(self, frames=None):
+        """Yield the requested frames parsed into Frame tuples, see iter_text()."""
+        for text in self.iter_text(frames):
+            yield self._parse_frame(text)
+
+    @staticmethod
+    def _parse_frame(text):
+        """
+        Split the text of a frame into its atom count, comment, elements and coordinates.
+
+        Parameters
+        ----------
+        text : str
+            Raw contents of a single frame.
+
+        Returns
+        -------
+        frame : Frame
+            Named tuple with the frame contents, coordinates as an (natoms, 3) array.
+
+        """
+        lines = text.splitlines()
+        natoms = int(lines[0])
+        atom_lines = [line.split() for line in lines[2 : natoms + 2]]
+        elements = np.array([columns[0] for columns in atom_lines])
+        coordinates = np.array([columns[1:4] for columns in atom_lines], dtype=float)
+
+        return Frame(natoms, lines[1].strip(), elements, coordinates.reshape(natoms, 3))
+
+    @property
+    def natoms(self):
+        """Number of atoms in the first frame."""
+        elements = self._cached("elements")
+        if elements is not None:
+            return len(elements)
+        return self[0].natoms
+
+    @property
+    def elements(self):
+        """Element symbols of the first frame."""
+        elements = self._cached("elements")
+        if elements is not None:
+            return elements
+        return self[0].elements
+
+    def comments(self, frames=None):
+        """
+        Read the comment line of each requested frame.
+
+        Parameters
+        ----------
+        frames : int, slice or list[int], optional
+            Zero-based frames to read, all frames by default.
+
+        Returns
+        -------
+        comments : list[str]
+            The stripped comment line of each frame.
+
+        """
+        indices = self._frame_indices(frames)
+        if not len(indices):
+            return []
+        cached = self._cached("comments")
+        if cached is not None:
+            return cached[list(indices)].tolist()
+
+        # Jump from each frame offset over the header line to the comment line
+        comments = []
+        with open(self.filename, "rb") as trajectory:
+            with mmap.mmap(trajectory.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                for index in indices:
+                    start = mapped.find(b"\n", int(self.offsets[index, 0])) + 1
+                    end = mapped.find(b"\n", start)
+                    comments.append(mapped[start : end if end != -1 else len(mapped)].decode().strip())
+
+        return comments
+
+    def coordinates(self, frames=None, atoms=None):
+        """
+        Collect coordinates for a subset of frames and atoms.
+
+        Parameters
+        ----------
+        frames : int, slice or list[int], optional
+            Zero-based frames to read, all frames by default.
+        atoms : list[int], optional
+            Zero-based atom indices to keep, all atoms by default.
+
+        Returns
+        -------
+        coordinates : numpy.ndarray
+            Array of shape (frames, atoms, 3).
+
+        """
+        indices = self._frame_indices(frames)
+        cached = self._cached("coordinates")
+        if cached is not None:
+            # Index the memory map so only the requested frames and atoms are read
+            frame_index = np.asarray(indices, dtype=np.intp)
+            if atoms is None:
+                return np.asarray(cached[frame_index], dtype=float)
+            return np.asarray(cached[frame_index[:, None], np.asarray(atoms, dtype=np.intp)], dtype=float)
+
+        # Only the lines of the requested atoms are split and converted
+        blocks = []
+        for text in self.iter_text(indices):
+            lines = text.splitlines()
+            if atoms is None:
+                rows = lines[2 : int(lines[0]) + 2]
+            else:
+                rows = [lines[atom + 2] for atom in atoms]
+            blocks.append(np.array([row.split()[1:4] for row in rows], dtype=float).reshape(-1, 3))
+        if not blocks:
+            return np.empty((0, 0 if atoms is None else len(atoms), 3))
+
+        return np.stack(blocks)
+
+    def _byte_ranges(self, frames):
+        """Yield (start, end) byte ranges of the requested frames, merging adjacent frames."""
+        start = end = None
+        for index in self._frame_indices(frames):
+            frame_start, frame_end = (int(offset) for offset in self.offsets[index])
+            if frame_start == end:
+                end = frame_end
+                continue
+            if start is not None:
+                yield start, end
+            start, end = frame_start, frame_end
+        if start is not None:
+            yield start, end
+
+    def write_frames(self, output, frames=None):
+        """
+        Copy the raw bytes of the requested frames to an output file.
+
+        The trajectory is memory-mapped and frames are written straight from the map
+        without being decoded, so reversing, subsetting or concatenating trajectories
+        runs at disk speed with constant memory.
+        Runs of consecutive frames are copied as a single block.
+
+        Parameters
+        ----------
+        output : file object
+            A file opened in binary write or append mode.
+        frames : int, slice or list[int], optional
+            Zero-based frames to copy in the order they should be written, all by default.
+
+        Returns
+        -------
+        frame_count : int
+            The number of frames written.
+
+        """
+        indices = self._frame_indices(frames)
+        if not len(indices):
+            return 0
+
+        with open(self.filename, "rb") as trajectory:
+            with mmap.mmap(trajectory.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                try:
+                    for start, end in self._byte_ranges(indices):
+                        output.write(view[start:end])
+                        # The last frame of a file may be missing its final newline
+                        if mapped[end - 1] != 10:
+                            output.write(b"\n")
+                finally:
+                    view.release()
+
+        return len(indices)
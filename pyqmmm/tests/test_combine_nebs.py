@@ -0,0 +1,42 @@
+"""
+Tests for combining NEB trajectories without duplicated endpoints.
+"""
+
+import pytest
+
+from pyqmmm.qm import combine_nebs
+
+
+def neb_frame(comment, z):
+    """A two atom frame whose second atom sits at the given z."""
+    return f"2\n{comment}\nO 0.0 0.0 0.0\nH 0.0 0.0 {z}\n"
+
+
+@pytest.mark.parametrize(
+    "first_z, second_z, duplicate",
+    [
+        # Straddles the 1.00005 rounding boundary at four decimals
+        ("1.00004999", "1.00005001", True),
+        ("-0.00000001", "0.00000001", True),
+        ("1.0000", "1.0010", False),
+    ],
+)
+def test_combine_trajectories(tmp_path, monkeypatch, first_z, second_z, duplicate):
+    (tmp_path / "1.xyz").write_text(neb_frame("neb 1 start", "0.5") + neb_frame("neb 1 end", first_z))
+    (tmp_path / "2.xyz").write_text(neb_frame("neb 2 start", second_z) + neb_frame("neb 2 end", "1.5"))
+    monkeypatch.chdir(tmp_path)
+
+    combine_nebs.combine_trajectories()
+
+    comments = (tmp_path / "combined_nebs.xyz").read_text().splitlines()[1::4]
+    expected = ["neb 1 start", "neb 1 end"] + ([] if duplicate else ["neb 2 start"]) + ["neb 2 end"]
+    assert comments == expected
+
+
+def test_frames_with_different_elements_do_not_match(tmp_path):
+    path = tmp_path / "1.xyz"
+    path.write_text(neb_frame("a", "1.0") + neb_frame("b", "1.0").replace("H ", "F "))
+    trajectory = combine_nebs.XYZTrajectory(str(path))
+
+    assert not combine_nebs.frames_match(trajectory[0], trajectory[1])
+    assert combine_nebs.frames_match(trajectory[0], trajectory[0])
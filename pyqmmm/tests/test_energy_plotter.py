@@ -0,0 +1,46 @@
+"""
+Tests for reading trajectory energies from comment lines and from the binary cache.
+"""
+
+import pytest
+
+from pyqmmm.qm import energy_plotter
+from pyqmmm.qm.xyz_cacher import cache_xyz
+
+ENERGIES = [-100.5, -100.25, -100.125]
+
+
+@pytest.fixture
+def orca_xyz(tmp_path):
+    """An ORCA trajectory with the energy in the comment line of each frame."""
+    path = tmp_path / "orca.xyz"
+    frames = [
+        f"2\nCoordinates from ORCA-job qmscript {energy}\nO 0.0 0.0 {index}.0\nH 0.0 0.0 {index + 1}.0\n"
+        for index, energy in enumerate(ENERGIES)
+    ]
+    path.write_text("".join(frames))
+    return str(path)
+
+
+def test_read_energies_from_comments_and_cache(orca_xyz, monkeypatch):
+    software = energy_plotter.identify_software("Coordinates from ORCA-job qmscript -100.5")
+
+    assert software == "ORCA"
+    assert energy_plotter.read_energies(orca_xyz, software).tolist() == ENERGIES
+
+    cache_xyz(orca_xyz)
+
+    # With an up-to-date cache the trajectory is not opened at all
+    def no_trajectory(*args, **kwargs):
+        raise AssertionError("The text trajectory was read despite the cache.")
+
+    monkeypatch.setattr(energy_plotter, "XYZTrajectory", no_trajectory)
+    assert energy_plotter.read_energies(orca_xyz, software).tolist() == ENERGIES
+
+
+def test_cache_of_another_software_is_ignored(orca_xyz):
+    cache_xyz(orca_xyz)
+
+    # ORCA-MEP reads a sixth column that these comment lines do not have
+    with pytest.raises(IndexError):
+        energy_plotter.read_energies(orca_xyz, "ORCA-MEP")
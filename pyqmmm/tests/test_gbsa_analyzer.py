@@ -0,0 +1,114 @@
+"""
+Tests for the in-memory parser of the GBSA DELTAS section.
+"""
+
+import gzip
+import random
+
+import pandas as pd
+import pytest
+
+from pyqmmm.md import gbsa_analyzer
+
+HEADER = (
+    "Resid 1,Resid 2,Internal,,,van der Waals,,,Electrostatic,,,Polar Solvation,,,"
+    "Non-Polar Solv.,,,TOTAL,,\n"
+    ",,Avg.,Std. Dev.,Std. Err. of Mean,Avg.,Std. Dev.,Std. Err. of Mean,Avg.,Std. Dev.,"
+    "Std. Err. of Mean,Avg.,Std. Dev.,Std. Err. of Mean,Avg.,Std. Dev.,Std. Err. of Mean,"
+    "Avg.,Std. Dev.,Std. Err. of Mean\n"
+)
+
+
+def decomposition_rows(rng, count):
+    """Random residue pair rows in the MMPBSA decomposition layout."""
+    rows = []
+    for _ in range(count):
+        first = f"{rng.choice(['ARG', 'LIG', 'TYR', 'LS1'])} {rng.randint(1, 60):3d}"
+        second = f"{rng.choice(['ARG', 'LIG', 'TYR', 'LS1'])} {rng.randint(1, 60):3d}"
+        energies = ",".join(f"{rng.uniform(-5, 5):.3f}" for _ in range(18))
+        rows.append(f"{first},{second},{energies}\n")
+    return rows
+
+
+def write_gbsa(path, delta_rows, seed=0):
+    """Write complex, DELTAS and sidechain sections around the given DELTAS rows."""
+    rng = random.Random(seed)
+    text = "Some header\nC,o,m,p,l,e,x,:\nT,o,t,a,l, ,E,n,e,r,g,y, ,D,e,c,o,m,p,o,s,i,t,i,o,n,:\n"
+    text += HEADER + "".join(decomposition_rows(rng, 20)) + "\n"
+    text += "D,E,L,T,A,S,:\nT,o,t,a,l, ,E,n,e,r,g,y, ,D,e,c,o,m,p,o,s,i,t,i,o,n,:\n"
+    text += HEADER + "".join(delta_rows) + "\n"
+    text += "S,i,d,e,c,h,a,i,n, ,E,n,e,r,g,y, ,D,e,c,o,m,p,o,s,i,t,i,o,n,:\n"
+    text += HEADER + "".join(decomposition_rows(rng, 20))
+    data = text.encode()
+    if path.endswith(".gz"):
+        data = gzip.compress(data)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def expected_deltas(delta_rows, ignore_residues):
+    """Parse the DELTAS rows one line at a time."""
+    records = []
+    for row in delta_rows:
+        first, second, *energies = row.strip().split(",")
+        records.append([*first.split(), *second.split(), *map(float, energies)])
+    df = pd.DataFrame(records, columns=gbsa_analyzer.GBSA_COLUMNS)
+    df[["Resid 1", "Resid 2"]] = df[["Resid 1", "Resid 2"]].astype(int)
+    df = df[~df["Resname 2"].isin(ignore_residues)]
+    return df[df["Resid 1"] != df["Resid 2"]]
+
+
+@pytest.mark.parametrize("filename", ["FINAL_24.dat", "FINAL_24.dat.gz"])
+# Blocks shorter than a line or a keyword exercise the carried partial line and keyword search
+@pytest.mark.parametrize("block_size", [7, 64, 512, None])
+def test_get_gbsa_df(tmp_path, monkeypatch, filename, block_size):
+    delta_rows = decomposition_rows(random.Random(1), 300)
+    # A self interaction that must be dropped
+    delta_rows[5] = "LIG  12,LIG  12," + delta_rows[5].split(",", 2)[2]
+    path = str(tmp_path / filename)
+    write_gbsa(path, delta_rows)
+    monkeypatch.chdir(tmp_path)
+
+    df = gbsa_analyzer.get_gbsa_df(path, ["LS1"], block_size)
+    expected = expected_deltas(delta_rows, ["LS1"])
+
+    assert df.index.tolist() == expected.index.tolist()
+    pd.testing.assert_frame_equal(df, expected, check_dtype=False)
+    assert not (tmp_path / "deltas.csv").exists()
+
+
+@pytest.mark.parametrize("compressed", [False, True])
+def test_get_gbsa_df_without_deltas(tmp_path, compressed):
+    path = tmp_path / "FINAL_24.dat"
+    data = b"no decomposition here\n" * 10
+    path.write_bytes(gzip.compress(data) if compressed else data)
+
+    df = gbsa_analyzer.get_gbsa_df(str(path), [], block_size=16)
+
+    assert df.empty
+    assert df.columns.tolist() == gbsa_analyzer.GBSA_COLUMNS
+
+
+@pytest.mark.parametrize("filename", ["FINAL_24.dat", "FINAL_24.dat.gz"])
+def test_analyze(tmp_path, monkeypatch, filename):
+    delta_rows = decomposition_rows(random.Random(2), 50)
+    # Substrate interactions whose totals rank AG2 7 first, then TYR 3, and an ignored LS1
+    for partner, total in [("AG2   7", -9.0), ("TYR   3", -6.0), ("LS1  20", -12.0), ("ARG   9", 1.0)]:
+        energies = ["0.000"] * 18
+        energies[15] = f"{total:.3f}"
+        delta_rows.append(f"SUB  99,{partner},{','.join(energies)}\n")
+    write_gbsa(str(tmp_path / filename), delta_rows)
+    monkeypatch.chdir(tmp_path)
+
+    answers = iter(["99", "2", "LS1"])
+    monkeypatch.setattr("builtins.input", lambda prompt: next(answers))
+    plotted = []
+    monkeypatch.setattr(gbsa_analyzer, "plot_single_total_gbsa", lambda df, file_name: plotted.append(df))
+    monkeypatch.setattr(gbsa_analyzer, "plot_all_gbsa", lambda *args: None)
+
+    gbsa_analyzer.analyze()
+
+    assert len(plotted) == 1
+    assert plotted[0]["Residue"].tolist() == ["ARG7", "TYR3"]
+    assert plotted[0]["Total"].tolist() == [-9.0, -6.0]
+    assert (tmp_path / "top_hits.csv").exists()
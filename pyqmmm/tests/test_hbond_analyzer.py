@@ -0,0 +1,212 @@
+"""
+Tests for the streaming hbond.gnu parser and the lifetime analysis.
+"""
+
+import os
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pyqmmm.md import hbond_analyzer
+
+RESIDUES = ["ARG_5", "HIE_10", "GLU_20", "ASP_7", "SER_3", "DHK_355"]
+
+
+def write_gnu(path, frames, bonds, occupancy=0.3, seed=0, blank_before_end=False):
+    """Write a synthetic hbond.gnu file in the CPPTraj gnuplot layout."""
+    rng = random.Random(seed)
+    labels = []
+    for index in range(1, bonds + 1):
+        acceptor, donor = rng.sample(RESIDUES, 2)
+        acceptor_atom = rng.choice(["O", "OD1", "OE2"])
+        donor_atom = rng.choice(["N", "NE", "OG"])
+        labels.append(f'"{acceptor}@{acceptor_atom}-{donor}@{donor_atom}-H{index}" {index}')
+
+    with open(path, "w") as f:
+        f.write("set pm3d map corners2color c1\n")
+        f.write('set xlabel "Frame"\n')
+        f.write('set ylabel ""\n')
+        f.write(f"set yrange [0.0:{bonds + 1}.0]\n")
+        f.write(f"set xrange [0.0:{frames + 1}.0]\n")
+        f.write(f"set ytics({','.join(labels)})\n")
+        f.write('set title "hbond"\n')
+        f.write('splot "-" with pm3d title "hbond"\n')
+        for frame in range(1, frames + 1):
+            if frame > 1:
+                f.write("\n")
+            for index in range(1, bonds + 1):
+                f.write(f"{frame} {index} {int(rng.random() < occupancy)}\n")
+        if blank_before_end:
+            f.write("\n")
+        f.write("end\n")
+
+
+def write_gnu_bonds(path, labels, present, frames):
+    """Write an hbond.gnu file with the given labels and the one-based frames each hbond is present in."""
+    tics = ",".join(f'"{label}" {index}' for index, label in enumerate(labels, start=1))
+    with open(path, "w") as f:
+        f.write("set pm3d map corners2color c1\n")
+        f.write('set xlabel "Frame"\n')
+        f.write('set ylabel ""\n')
+        f.write(f"set yrange [0.0:{len(labels) + 1}.0]\n")
+        f.write(f"set xrange [0.0:{frames + 1}.0]\n")
+        f.write(f"set ytics({tics})\n")
+        f.write('set title "hbond"\n')
+        f.write('splot "-" with pm3d title "hbond"\n')
+        for frame in range(1, frames + 1):
+            if frame > 1:
+                f.write("\n")
+            for index in range(1, len(labels) + 1):
+                f.write(f"{frame} {index} {int(frame in present[index - 1])}\n")
+        f.write("end\n")
+
+
+def legacy_count(path, labels):
+    """Per-frame line walk of the original count_occurrences()."""
+    counts = np.zeros(len(labels), dtype=int)
+    frame_count = 0
+    with open(path, "r") as f:
+        for _ in range(8):
+            next(f)
+        for frame in f.read().split("\n\n"):
+            bonds = set()
+            for line in frame.split("\n"):
+                if line == "end":
+                    break
+                arr = [int(float(x)) for x in line.split(" ") if x]
+                if arr and arr[-1] == 1:
+                    bonds.add(arr[1])
+            # Only blocks with data are frames
+            if frame.strip() and frame.strip() != "end":
+                frame_count += 1
+            counts += [len(index & bonds) != 0 for index in labels["index"]]
+    return counts, frame_count
+
+
+@pytest.mark.parametrize("chunk_size", [16, 100, 1 << 20])
+@pytest.mark.parametrize("blank_before_end", [False, True])
+def test_read_gnu_chunks_matches_legacy(tmp_path, chunk_size, blank_before_end):
+    path = str(tmp_path / "hbond.gnu")
+    write_gnu(path, frames=40, bonds=9, blank_before_end=blank_before_end)
+    labels = hbond_analyzer.bond_labels(path, ignore_backbone=False)
+
+    expected_counts, expected_frames = legacy_count(path, labels)
+    frame_count = 0
+    frames, bonds = [], []
+    for chunk_frames, chunk_present, chunk_bonds in hbond_analyzer.read_gnu_chunks(path, chunk_size):
+        frame_count += chunk_frames
+        frames.append(chunk_present)
+        bonds.append(chunk_bonds)
+    frames, bonds = np.concatenate(frames), np.concatenate(bonds)
+    lookup = hbond_analyzer.group_lookup(labels)
+    counts = hbond_analyzer.count_groups(frames, bonds, lookup, len(labels))
+
+    assert frame_count == expected_frames == 40
+    assert frames.min() >= 0 and frames.max() < 40
+    assert counts.tolist() == expected_counts.tolist()
+
+
+def test_count_occurrences_matrix(tmp_path):
+    path = str(tmp_path / "hbond.gnu")
+    matrix_file = str(tmp_path / "hbond_occupancy.npz")
+    write_gnu(path, frames=25, bonds=6, blank_before_end=True)
+    labels = hbond_analyzer.bond_labels(path, ignore_backbone=False)
+
+    counts, frame_count = hbond_analyzer.count_occurrences(path, labels.copy(), matrix_file)
+    occupancy = hbond_analyzer.load_occupancy_matrix(matrix_file)
+
+    assert frame_count == 25
+    assert occupancy.shape[0] == 25
+    series = hbond_analyzer.pair_time_series(occupancy, labels).toarray()
+    assert series.sum(axis=0).tolist() == counts["count"].tolist()
+
+
+def test_lifetimes_need_two_frames(tmp_path):
+    path = str(tmp_path / "hbond.gnu")
+    matrix_file = str(tmp_path / "hbond_occupancy.npz")
+    write_gnu(path, frames=1, bonds=3, occupancy=1.0)
+    labels = hbond_analyzer.bond_labels(path, ignore_backbone=False)
+    hbond_analyzer.count_occurrences(path, labels.copy(), matrix_file)
+
+    with pytest.raises(ValueError):
+        hbond_analyzer.hbond_lifetimes(hbond_analyzer.load_occupancy_matrix(matrix_file), labels)
+
+
+def test_lifetimes_rebuild_a_stale_matrix(tmp_path):
+    path = str(tmp_path / "hbond.gnu")
+    matrix_file = str(tmp_path / "hbond_occupancy.npz")
+    write_gnu(path, frames=20, bonds=4)
+    hbond_analyzer.analyze_lifetimes(str(tmp_path) + "/")
+    assert hbond_analyzer.load_occupancy_matrix(matrix_file).shape[0] == 20
+
+    # A regenerated hbond.gnu is newer than the saved matrix
+    write_gnu(path, frames=30, bonds=4, seed=1)
+    stat = os.stat(path)
+    os.utime(matrix_file, ns=(stat.st_atime_ns, stat.st_mtime_ns - 1_000_000_000))
+    assert not hbond_analyzer.matrix_is_current(matrix_file, path)
+
+    hbond_analyzer.analyze_lifetimes(str(tmp_path) + "/")
+
+    assert hbond_analyzer.load_occupancy_matrix(matrix_file).shape[0] == 30
+    assert hbond_analyzer.matrix_is_current(matrix_file, path)
+
+
+@pytest.mark.parametrize("save_matrix", [False, True])
+def test_analyze_hbonds_saves_the_matrix_for_an_existing_table(tmp_path, monkeypatch, save_matrix):
+    write_gnu(str(tmp_path / "hbond.gnu"), frames=12, bonds=4)
+    table = pd.DataFrame({"residue": ["R5"], "unrestrained": [50.0], "position": [5]})
+    table.to_csv(tmp_path / "hbond.csv", index=False)
+    monkeypatch.setattr(hbond_analyzer, "plot", lambda data, file_path: None)
+
+    hbond_analyzer.analyze_hbonds([str(tmp_path) + "/"], ["unrestrained"], "DHK", save_matrix=save_matrix)
+
+    matrix_file = tmp_path / "hbond_occupancy.npz"
+    assert matrix_file.exists() == save_matrix
+    if save_matrix:
+        assert hbond_analyzer.load_occupancy_matrix(str(matrix_file)).shape[0] == 12
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_analyze_replicates(tmp_path, monkeypatch, processes):
+    first, second = tmp_path / "1", tmp_path / "2"
+    first.mkdir()
+    second.mkdir()
+    # The replicates share the ARG pair, the HIE and SER pairs only form in one of them
+    write_gnu_bonds(
+        str(first / "hbond.gnu"),
+        ["DHK_355@O1-ARG_5@NE-HE", "HIE_10@ND1-DHK_355@N1-H1"],
+        [{1, 2, 3}, {2}],
+        frames=4,
+    )
+    write_gnu_bonds(
+        str(second / "hbond.gnu"),
+        ["DHK_355@O1-ARG_5@NE-HE", "DHK_355@O2-SER_3@OG-HG"],
+        [{1}, {1, 2, 3, 4, 5}],
+        frames=5,
+    )
+    monkeypatch.setattr(hbond_analyzer, "plot_replicates", lambda data, file_path: None)
+
+    merged = hbond_analyzer.analyze_replicates([f"{first}/", f"{second}/"], "DHK", processes)
+
+    assert sorted(merged.index) == ["H10", "R5", "S3"]
+    assert merged.columns.tolist() == ["rep_1", "rep_2", "mean", "sem", "position"]
+    expected = {"R5": (75.0, 20.0), "H10": (25.0, 0.0), "S3": (0.0, 100.0)}
+    for residue, reps in expected.items():
+        row = merged.loc[residue]
+        assert row[["rep_1", "rep_2"]].tolist() == pytest.approx(reps)
+        assert row["mean"] == pytest.approx(np.mean(reps))
+        assert row["sem"] == pytest.approx(np.std(reps, ddof=1) / np.sqrt(2))
+    assert (first / "hbond_replicates.csv").exists()
+
+
+def test_acfs_of_a_permanent_hbond():
+    series = np.ones(10, dtype=bool)
+
+    continuous, runs = hbond_analyzer.continuous_acf(series, 5)
+    intermittent = hbond_analyzer.intermittent_acf(series, 5)
+
+    assert runs.tolist() == [10]
+    assert np.allclose(continuous, 1.0)
+    assert np.allclose(intermittent, 1.0)
@@ -0,0 +1,132 @@
+"""
+Tests for the in-process hbond detection with MDAnalysis.
+"""
+
+import pytest
+
+from pyqmmm.md import hbond_detector
+
+# One molecule per test case, 20 Å apart so the cases never interact.
+# Each atom is (name, resname, resid, element, position), the bonds are zero-based atom pairs.
+ATOMS = [
+    # Formed while the acceptor is close: 2.9 Å and a linear D-H...A
+    ("OG", "SER", 1, "O", (0.0, 0.0, 0.0)),
+    ("HG", "SER", 1, "H", (0.97, 0.0, 0.0)),
+    ("OD1", "ASP", 2, "O", (2.9, 0.0, 0.0)),
+    # Linear but 3.5 Å apart, beyond the distance cutoff
+    ("NE", "ARG", 3, "N", (20.0, 0.0, 0.0)),
+    ("HE", "ARG", 3, "H", (21.0, 0.0, 0.0)),
+    ("OD2", "ASP", 4, "O", (23.5, 0.0, 0.0)),
+    # Within 3.0 Å but the hydrogen points away, a D-H...A angle of about 72 degrees
+    ("NZ", "LYS", 5, "N", (40.0, 0.0, 0.0)),
+    ("HZ1", "LYS", 5, "H", (40.0, 1.0, 0.0)),
+    ("OE1", "GLU", 6, "O", (43.0, 0.0, 0.0)),
+    # Donor and acceptor in the same molecule
+    ("O1", "LIG", 7, "O", (60.0, 0.0, 0.0)),
+    ("H1", "LIG", 7, "H", (60.97, 0.0, 0.0)),
+    ("C1", "LIG", 7, "C", (61.5, 1.5, 0.0)),
+    ("O2", "LIG", 7, "O", (62.9, 0.0, 0.0)),
+]
+BONDS = [(0, 1), (3, 4), (6, 7), (9, 10), (9, 11), (11, 12)]
+FRAMES = 4
+
+
+def write_system(path):
+    """
+    Write a multi-model PDB of the test cases with CONECT records for the bonds.
+
+    The SER-ASP hbond forms in the first two frames and breaks in the last two,
+    when the acceptor moves to 3.5 Å.
+
+    """
+    text = ""
+    for frame in range(FRAMES):
+        text += f"MODEL     {frame + 1:4d}\n"
+        for serial, (name, resname, resid, element, (x, y, z)) in enumerate(ATOMS, start=1):
+            if serial == 3 and frame >= 2:
+                x = 3.5
+            text += (
+                f"ATOM  {serial:5d} {name:<4} {resname:3} A{resid:4d}    "
+                f"{x:8.3f}{y:8.3f}{z:8.3f}  1.00  0.00          {element:>2}\n"
+            )
+        text += "ENDMDL\n"
+    for first, second in BONDS:
+        text += f"CONECT{first + 1:5d}{second + 1:5d}\n"
+    text += "END\n"
+    path.write_text(text)
+    return str(path)
+
+
+@pytest.fixture
+def system(tmp_path):
+    return write_system(tmp_path / "system.pdb")
+
+
+def pair_counts(labels):
+    return {(row.acceptor, row.donor): row.count for row in labels.itertuples()}
+
+
+def test_hbond_candidates(system):
+    universe = hbond_detector.load_universe(system, system)
+
+    donors, hydrogens, acceptors = hbond_detector.hbond_candidates(universe)
+
+    assert universe.atoms[hydrogens].names.tolist() == ["HG", "HE", "HZ1", "H1"]
+    assert universe.atoms[donors].names.tolist() == ["OG", "NE", "NZ", "O1"]
+    assert universe.atoms[acceptors].names.tolist() == ["OG", "OD1", "NE", "OD2", "NZ", "OE1", "O1", "O2"]
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_detect_hbonds_applies_every_cutoff(system, processes):
+    labels, frame_count = hbond_detector.detect_hbonds(system, system, processes=processes)
+
+    assert frame_count == FRAMES
+    assert pair_counts(labels) == {("ASP_2", "SER_1"): 2}
+
+
+def test_intramolecular_hbonds_are_kept_on_request(system):
+    labels, _ = hbond_detector.detect_hbonds(system, system, intermolecular=False, processes=1)
+
+    assert pair_counts(labels) == {("ASP_2", "SER_1"): 2, ("LIG_7", "LIG_7"): 4}
+
+
+def test_parallel_matches_serial(system, tmp_path):
+    results = {}
+    for processes in (1, 2):
+        matrix_file = str(tmp_path / f"occupancy_{processes}.npz")
+        labels_file = str(tmp_path / f"labels_{processes}.csv")
+        labels, _ = hbond_detector.detect_hbonds(
+            system,
+            system,
+            intermolecular=False,
+            processes=processes,
+            matrix_file=matrix_file,
+            labels_file=labels_file,
+        )
+        occupancy = hbond_detector.load_occupancy_matrix(matrix_file)
+        results[processes] = (labels, occupancy.toarray(), (tmp_path / f"labels_{processes}.csv").read_text())
+
+    serial, parallel = results[1], results[2]
+    assert serial[0].to_dict() == parallel[0].to_dict()
+    assert (serial[1] == parallel[1]).all()
+    assert serial[2] == parallel[2]
+    # Frames 0-1 have both hbonds, frames 2-3 only the intramolecular one
+    assert serial[1].sum(axis=1).tolist() == [2, 2, 1, 1]
+
+
+def test_load_native_occupancy(system, tmp_path):
+    file_path = str(tmp_path) + "/"
+    hbond_detector.detect_hbonds(
+        system,
+        system,
+        processes=1,
+        matrix_file=file_path + hbond_detector.NATIVE_MATRIX_FILE,
+        labels_file=file_path + hbond_detector.NATIVE_LABELS_FILE,
+    )
+
+    occupancy, labels = hbond_detector.load_native_occupancy(file_path)
+
+    assert occupancy.shape[0] == FRAMES
+    assert labels[["acceptor", "donor"]].values.tolist() == [["ASP_2", "SER_1"]]
+    column = list(labels["index"][0])
+    assert occupancy[:, column].toarray().ravel().tolist() == [1, 1, 0, 0]
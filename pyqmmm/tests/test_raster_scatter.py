@@ -0,0 +1,97 @@
+"""
+Tests for drawing large scatter plots as a density raster.
+"""
+
+import io
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pytest
+
+from pyqmmm.md import raster_scatter
+
+
+@pytest.fixture
+def ax():
+    # Axes filling a 4 x 3 inch figure are 288 x 216 points wide
+    fig = plt.figure(figsize=(4, 3), dpi=100)
+    yield fig.add_axes([0, 0, 1, 1])
+    plt.close(fig)
+
+
+def test_density_grid_counts_every_point():
+    rng = np.random.default_rng(0)
+    x = np.concatenate([rng.uniform(0, 10, 500), np.full(300, 7.5)])
+    y = np.concatenate([rng.uniform(0, 4, 500), np.full(300, 0.5)])
+
+    grid = raster_scatter.density_grid(x, y, (10, 4), (0, 10, 0, 4))
+
+    assert grid.shape == (4, 10)
+    assert grid.sum() == len(x)
+    # Rows run from bottom to top, so y = 0.5 falls in the first row
+    assert np.unravel_index(grid.argmax(), grid.shape) == (0, 7)
+
+
+def test_density_grid_keeps_edge_points_and_largest_values():
+    x = np.array([0.0, 10.0, 10.0, 2.5])
+    y = np.array([0.0, 4.0, 4.0, 1.5])
+    values = np.array([1.0, 2.0, 5.0, 3.0])
+
+    counts = raster_scatter.density_grid(x, y, (4, 4), (0, 10, 0, 4))
+    grid = raster_scatter.density_grid(x, y, (4, 4), (0, 10, 0, 4), values=values)
+
+    assert counts.sum() == len(x)
+    assert counts[3, 3] == 2
+    assert grid[0, 0] == 1.0
+    assert grid[3, 3] == 5.0
+    assert grid[1, 1] == 3.0
+    assert np.isnan(grid).sum() == 13
+
+
+def test_marker_bins_matches_marker_size(ax):
+    # 12 point markers give one cell per marker
+    assert raster_scatter.marker_bins(ax, 144, (0, 1, 0, 1)) == (24, 18)
+
+
+def test_marker_bins_limits(ax):
+    # Markers larger than the axes still give one cell
+    assert raster_scatter.marker_bins(ax, 1e6, (0, 1, 0, 1)) == (1, 1)
+    # Tiny markers give about one cell per point of the axes
+    assert raster_scatter.marker_bins(ax, 1, (0, 1, 0, 1)) == (288, 216)
+
+
+def test_marker_bins_scales_with_fixed_limits(ax):
+    ax.set_xlim(0, 2)
+    ax.set_ylim(0, 4)
+
+    assert raster_scatter.marker_bins(ax, 144, (0, 1, 0, 1)) == (12, 4)
+
+
+@pytest.mark.parametrize("c", [None, "values"])
+def test_raster_scatter_draws_one_image(ax, c):
+    rng = np.random.default_rng(1)
+    x, y = rng.normal(size=10000), rng.normal(size=10000)
+    values = rng.uniform(size=10000) if c else None
+
+    image = raster_scatter.raster_scatter(ax, x, y, s=9, c=values, cmap="viridis", label="points")
+
+    assert list(ax.images) == [image]
+    assert image.get_extent() == list(raster_scatter.data_extent(x, y))
+    # Only the empty legend proxy is a path collection, the points are in the image
+    assert len(ax.collections) == 1
+    assert len(ax.collections[0].get_offsets()) == 0
+
+    svg = io.StringIO()
+    ax.figure.savefig(svg, format="svg")
+    # The points are one embedded bitmap, only the ticks are drawn as marker paths
+    assert svg.getvalue().count("<image") == 1
+    assert svg.getvalue().count("<use") < 100
+
+
+def test_raster_scatter_without_points(ax):
+    assert raster_scatter.raster_scatter(ax, [], []) is None
+    assert len(ax.images) == 0
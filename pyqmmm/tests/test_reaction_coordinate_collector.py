@@ -0,0 +1,68 @@
+"""
+Tests for the vectorized reaction coordinates of a TeraChem scan.
+"""
+
+import numpy as np
+import pytest
+
+from pyqmmm.qm import reaction_coordinate_collector
+
+
+def scan_frame(comment, distance, dihedral):
+    """
+    Four atoms a-b-c-d with |ab| = distance, a right angle a-b-c and the given dihedral.
+
+    b sits at the origin and c on the z axis, so d is a rotated about z by the dihedral.
+
+    """
+    radians = np.radians(dihedral)
+    atoms = [
+        (distance, 0.0, 0.0),
+        (0.0, 0.0, 0.0),
+        (0.0, 0.0, 1.0),
+        (np.cos(radians), np.sin(radians), 1.0),
+    ]
+    lines = "".join(f"C {x:.8f} {y:.8f} {z:.8f}\n" for x, y, z in atoms)
+    return f"4\n{comment}\n{lines}"
+
+
+@pytest.fixture
+def scan_xyz(tmp_path):
+    """A scan with two converged frames around an unconverged one."""
+    path = tmp_path / "scan_optim.xyz"
+    path.write_text(
+        scan_frame("Converged step 1 energy -100.00", 1.0, -60.0)
+        + scan_frame("Optimizing step 2 energy -99.00", 5.0, 0.0)
+        + scan_frame("Converged step 2 energy -99.99", 1.5, 120.0)
+    )
+    return str(path)
+
+
+def test_measurements_on_known_geometry(scan_xyz):
+    definitions = [(1, 2), (2, 3), (1, 2, 3), (1, 2, 3, 4), (4, 3, 2, 1)]
+
+    values = reaction_coordinate_collector.compute_coordinates(scan_xyz, definitions)
+
+    assert values[:, 0] == pytest.approx([1.0, 5.0, 1.5])
+    assert values[:, 1] == pytest.approx([1.0, 1.0, 1.0])
+    assert values[:, 2] == pytest.approx([90.0, 90.0, 90.0])
+    assert values[:, 3] == pytest.approx([-60.0, 0.0, 120.0])
+    # Reversing the atoms keeps the sign of a dihedral
+    assert values[:, 4] == pytest.approx(values[:, 3])
+
+
+def test_reaction_table_uses_converged_frames(scan_xyz):
+    rc_df = reaction_coordinate_collector.get_reaction_table(scan_xyz, [(1, 2), (1, 2, 3, 4), (1, 2)])
+
+    assert rc_df.columns.tolist() == ["frame", "1_2", "1_2_3_4", "1_2.1", "energy", "relative_energy"]
+    assert rc_df["frame"].tolist() == [0, 2]
+    assert rc_df["1_2"].tolist() == pytest.approx([1.0, 1.5])
+    assert rc_df["1_2_3_4"].tolist() == pytest.approx([-60.0, 120.0])
+    assert rc_df["energy"].tolist() == [-100.0, -99.99]
+    assert rc_df["relative_energy"].tolist() == pytest.approx([0.0, 0.01 * 627.5])
+
+
+@pytest.mark.parametrize("definition", [(0, 1), (1, 5), (1,)])
+def test_invalid_definitions_are_rejected(scan_xyz, definition):
+    with pytest.raises(ValueError):
+        reaction_coordinate_collector.compute_coordinates(scan_xyz, [definition])
@@ -0,0 +1,35 @@
+"""
+Tests for the per-residue reduction of per-atom metrics.
+"""
+
+import numpy as np
+
+from pyqmmm.md.residue_reducer import reduce_by_residue, residue_groups
+
+
+def test_reduce_by_residue_matches_loop():
+    rng = np.random.default_rng(0)
+    residue_ids = np.repeat([4, 2, 9, 7], [3, 1, 5, 2])
+    values = rng.normal(size=len(residue_ids))
+
+    df = reduce_by_residue(values, residue_ids)
+
+    assert df.index.tolist() == [4, 2, 9, 7]
+    for residue, row in df.iterrows():
+        atoms = values[residue_ids == residue]
+        assert row["atoms"] == len(atoms)
+        assert np.isclose(row["sum"], atoms.sum())
+        assert np.isclose(row["mean"], atoms.mean())
+        assert np.isclose(row["std"], atoms.std())
+
+
+def test_contiguous_groups_split_repeated_ids():
+    residue_ids = ["ALA1", "ALA1", "GLY2", "ALA1"]
+
+    groups, residues = residue_groups(residue_ids, contiguous=True)
+    df = reduce_by_residue([1.0, 2.0, 3.0, 4.0], residue_ids, contiguous=True)
+
+    assert groups.tolist() == [0, 0, 1, 2]
+    assert residues.tolist() == ["ALA1", "GLY2", "ALA1"]
+    assert df["sum"].tolist() == [3.0, 3.0, 4.0]
+    assert reduce_by_residue([1.0, 2.0, 3.0, 4.0], residue_ids)["sum"].tolist() == [7.0, 3.0]
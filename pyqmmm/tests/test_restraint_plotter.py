@@ -0,0 +1,53 @@
+"""
+Tests for the density estimates of the restraint plots.
+"""
+
+import numpy as np
+import pytest
+from scipy.stats import gaussian_kde
+
+from pyqmmm.md import restraint_plotter
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_binned_kde_matches_gaussian_kde(seed):
+    rng = np.random.default_rng(seed)
+    # Correlated distance and angle samples with a second, smaller cluster
+    x = np.concatenate([rng.normal(3.5, 0.2, 3000), rng.normal(4.3, 0.1, 1000)])
+    y = np.concatenate([rng.normal(40, 8, 3000), rng.normal(20, 4, 1000)]) + 10 * (x - 3.5)
+
+    exact = gaussian_kde(np.vstack([x, y]))(np.vstack([x, y]))
+    binned = restraint_plotter.binned_kde(x, y)
+
+    assert np.max(np.abs(binned - exact)) / exact.max() < 0.01
+    # The plots color points by rank, so the ordering must be preserved
+    assert np.corrcoef(np.argsort(np.argsort(binned)), np.argsort(np.argsort(exact)))[0, 1] > 0.999
+
+
+def test_parallel_density_matches_serial():
+    rng = np.random.default_rng(2)
+    xy_pairs = [(rng.normal(size=300), rng.normal(size=300)) for _ in range(2)]
+
+    parallel = restraint_plotter.parallel_density(xy_pairs, "exact", processes=2, split=3)
+
+    for (x, y), z in zip(xy_pairs, parallel):
+        assert np.allclose(z, restraint_plotter.point_density(x, y, "exact"))
+
+
+def test_restraint_plots_forwards_exact_options(monkeypatch):
+    rng = np.random.default_rng(3)
+    xy_pairs = [(rng.normal(size=50), rng.normal(size=50))]
+    calls = []
+
+    def fake_parallel_density(pairs, method, processes, split):
+        calls.append((method, processes, split))
+        return [restraint_plotter.point_density(x, y, method) for x, y in pairs]
+
+    monkeypatch.setattr(restraint_plotter, "combine_inp", lambda: xy_pairs)
+    monkeypatch.setattr(restraint_plotter, "config", lambda: (["A"], {}))
+    monkeypatch.setattr(restraint_plotter, "graph_datasets", lambda *args: None)
+    monkeypatch.setattr(restraint_plotter, "parallel_density", fake_parallel_density)
+
+    restraint_plotter.restraint_plots(method="exact", processes=2, split=4)
+
+    assert calls == [("exact", 2, 4)]
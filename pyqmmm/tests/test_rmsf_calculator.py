@@ -0,0 +1,64 @@
+"""
+Tests for the streaming RMSF and the merge of per-block partial results.
+"""
+
+import MDAnalysis as mda
+from MDAnalysis.analysis import align, rms
+from MDAnalysis.coordinates.memory import MemoryReader
+import numpy as np
+import pytest
+from scipy.spatial.transform import Rotation
+
+from pyqmmm.md import rmsf_calculator
+
+
+def memory_universe(coordinates):
+    """A universe of unbonded atoms reading its frames from an in-memory array."""
+    universe = mda.Universe.empty(coordinates.shape[1], trajectory=True)
+    universe.add_TopologyAttr("masses", np.ones(coordinates.shape[1]))
+    universe.load_new(coordinates, format=MemoryReader)
+    return universe
+
+
+@pytest.fixture
+def synthetic_universe():
+    """A small universe whose frames are randomly displaced, rotated and shifted copies of one structure."""
+    rng = np.random.default_rng(0)
+    structure = rng.normal(scale=3.0, size=(12, 3))
+    displaced = structure + rng.normal(scale=0.3, size=(40, 12, 3))
+    rotations = Rotation.random(40, random_state=0).as_matrix()
+    shifts = rng.normal(scale=5.0, size=(40, 1, 3))
+    coordinates = (np.einsum("fij,faj->fai", rotations, displaced) + shifts).astype(np.float32)
+    return memory_universe(coordinates), coordinates
+
+
+def test_streaming_matches_align_traj(synthetic_universe):
+    universe, coordinates = synthetic_universe
+    reference = memory_universe(coordinates)
+
+    rmsf_values = rmsf_calculator.streaming_rmsf(universe, reference)
+
+    # Independent reference: align the whole trajectory in memory, then compute the RMSF
+    aligned = memory_universe(coordinates.copy())
+    align.AlignTraj(aligned, reference, select="all", in_memory=True).run()
+    expected = rms.RMSF(aligned.atoms).run().results.rmsf
+
+    assert np.allclose(rmsf_values, expected, atol=1e-4)
+
+
+@pytest.mark.parametrize("bounds", [[0, 13, 27, 40], [0, 0, 1, 20, 20, 40], [0, 39, 40]])
+def test_merged_blocks_match_one_block(synthetic_universe, bounds):
+    universe, _ = synthetic_universe
+    target = rmsf_calculator.reference_positions(universe)
+    frames = range(40)
+
+    whole = rmsf_calculator.accumulate_rmsf(universe, target, frames=frames)
+    partials = [
+        rmsf_calculator.accumulate_rmsf(universe, target, frames=frames[start:stop])
+        for start, stop in zip(bounds[:-1], bounds[1:])
+    ]
+    merged = rmsf_calculator.merge_rmsf_partials(partials)
+
+    assert merged[0] == whole[0]
+    assert np.allclose(merged[1], whole[1])
+    assert np.allclose(merged[2], whole[2])
@@ -0,0 +1,77 @@
+"""
+Tests for removing atoms from an xyz trajectory.
+"""
+
+import pytest
+
+from pyqmmm.qm import traj_atom_filter
+
+ELEMENTS = ["Fe", "O", "N", "C", "H"]
+
+
+def write_trajectory(path, frames=3):
+    """A five atom trajectory whose x coordinate encodes the frame and atom."""
+    text = ""
+    for frame in range(frames):
+        atoms = "".join(
+            f"{element} {frame}.{atom} -1.500 20.25\n" for atom, element in enumerate(ELEMENTS, start=1)
+        )
+        text += f"{len(ELEMENTS)}\nframe {frame}\n{atoms}"
+    path.write_text(text)
+
+
+def test_remove_atoms(tmp_path, monkeypatch):
+    write_trajectory(tmp_path / "traj.xyz")
+    monkeypatch.chdir(tmp_path)
+
+    frame_count = traj_atom_filter.remove_atoms([2, 4, 5])
+
+    expected = "".join(
+        f"2\nframe {frame}\nFe {frame}.1 -1.500 20.25\nN {frame}.3 -1.500 20.25\n" for frame in range(3)
+    )
+    assert frame_count == 3
+    assert (tmp_path / "new_traj.xyz").read_text() == expected
+
+
+@pytest.mark.parametrize("selection", [[0, 2], [3, 6]])
+def test_remove_atoms_outside_the_trajectory(tmp_path, monkeypatch, selection):
+    write_trajectory(tmp_path / "traj.xyz")
+    monkeypatch.chdir(tmp_path)
+
+    with pytest.raises(ValueError, match="not between 1 and 5"):
+        traj_atom_filter.remove_atoms(selection)
+    assert not (tmp_path / "new_traj.xyz").exists()
+
+
+def test_pdb_ensemble_matches_per_line_formatting(tmp_path, monkeypatch):
+    prefixes = [
+        f"{'HETATM':6}{1:5d} {'FE':^4} {'HEM':3} A{1:4d}    ",
+        f"{'ATOM':6}{2:5d} {'O':^4} {'HOH':3} B{12:4d}    ",
+    ]
+    suffixes = ["  1.00 20.00          FE", "  0.50 -3.10           O"]
+    template = "REMARK  written by hand\n"
+    template += "".join(f"{prefix}{0:8.3f}{0:8.3f}{0:8.3f}{suffix}\n" for prefix, suffix in zip(prefixes, suffixes))
+    template += "END\n"
+    (tmp_path / "template.pdb").write_text(template)
+    # Negative, wide and long-decimal coordinates
+    frames = [
+        [(-1.23456, 2.5, 100.0), (-999.9994, 1234.5678, -0.0004)],
+        [(0.0, -45.6789, 3.14159), (12.3456789, -100.25, 9999.999)],
+    ]
+    (tmp_path / "new_traj.xyz").write_text(
+        "".join(
+            f"2\nframe {index}\n" + "".join(f"X {x} {y} {z}\n" for x, y, z in coordinates)
+            for index, coordinates in enumerate(frames)
+        )
+    )
+    monkeypatch.chdir(tmp_path)
+
+    traj_atom_filter.get_pdb_ensemble()
+
+    expected = ""
+    for model, coordinates in enumerate(frames, start=1):
+        expected += f"MODEL     {model:4d}\n"
+        for prefix, suffix, (x, y, z) in zip(prefixes, suffixes, coordinates):
+            expected += f"{prefix}{x:8.3f}{y:8.3f}{z:8.3f}{suffix}\n"
+        expected += "TER\nENDMDL\n"
+    assert (tmp_path / "new_traj.pdb").read_text() == expected
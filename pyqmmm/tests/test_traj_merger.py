@@ -0,0 +1,75 @@
+"""
+Tests for merging frames of several xyz trajectories.
+"""
+
+import json
+
+import pytest
+
+from pyqmmm.qm import traj_merger
+
+
+def write_trajectory(path, name, frames):
+    """A one atom trajectory whose comment names the file and frame."""
+    path.write_text("".join(f"1\n{name} {frame}\nH 0.0 0.0 {frame}.0\n" for frame in range(1, frames + 1)))
+
+
+def comments(path):
+    return path.read_text().splitlines()[1::3]
+
+
+@pytest.mark.parametrize(
+    "request_text, frames",
+    [("3", [3]), ("1-4", [1, 2, 3, 4]), ("5,2-3,9", [5, 2, 3, 9]), ("2-2", [2])],
+)
+def test_parse_frames(request_text, frames):
+    assert traj_merger.parse_frames(request_text) == frames
+
+
+def test_read_merge_spec(tmp_path):
+    spec_file = tmp_path / "merge.json"
+    spec_file.write_text(
+        json.dumps(
+            {
+                "output": "path.xyz",
+                "files": [
+                    {"file": "1.xyz", "frames": "1-3,5"},
+                    {"file": "2.xyz", "reverse": True},
+                ],
+            }
+        )
+    )
+
+    selections, combined_filename = traj_merger.read_merge_spec(str(spec_file))
+
+    assert combined_filename == "path.xyz"
+    assert selections == [("1.xyz", [1, 2, 3, 5], False), ("2.xyz", None, True)]
+
+
+def test_read_merge_spec_defaults(tmp_path):
+    spec_file = tmp_path / "merge.json"
+    spec_file.write_text(json.dumps({"files": [{"file": "1.xyz"}]}))
+
+    assert traj_merger.read_merge_spec(str(spec_file)) == ([("1.xyz", None, False)], "combined.xyz")
+
+
+def test_merge_xyz_files(tmp_path):
+    write_trajectory(tmp_path / "1.xyz", "first", 5)
+    write_trajectory(tmp_path / "2.xyz", "second", 3)
+    combined = tmp_path / "combined.xyz"
+
+    traj_merger.merge_xyz_files(
+        [(str(tmp_path / "1.xyz"), [4, 1, 2, 2], False), (str(tmp_path / "2.xyz"), None, True)],
+        str(combined),
+    )
+
+    assert comments(combined) == ["first 1", "first 2", "first 4", "second 3", "second 2", "second 1"]
+
+
+def test_merge_xyz_files_rejects_missing_frames(tmp_path):
+    write_trajectory(tmp_path / "1.xyz", "first", 5)
+    combined = tmp_path / "combined.xyz"
+
+    with pytest.raises(ValueError, match=r"Frames \[0, 7\] are not between 1 and 5 in .*1\.xyz"):
+        traj_merger.merge_xyz_files([(str(tmp_path / "1.xyz"), [1, 7, 0], False)], str(combined))
+    assert not combined.exists()
@@ -0,0 +1,200 @@
+"""
+Tests for the indexed xyz trajectory reader.
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+from pyqmmm.qm import xyz_trajectory
+from pyqmmm.qm.xyz_trajectory import XYZTrajectory
+
+
+def frame_text(natoms, comment):
+    """An xyz frame with natoms atoms whose z coordinate is the atom number."""
+    atoms = "".join(f"C 0.000 0.000 {atom}.000\n" for atom in range(natoms))
+    return f"{natoms}\n{comment}\n{atoms}"
+
+
+def frame_ranges(text):
+    """Byte offsets of the start and end of the frames in text, as build_frame_index() should report them."""
+    offsets = []
+    lines = text.encode().splitlines(keepends=True)
+    position = 0
+    index = 0
+    while index < len(lines):
+        if not lines[index].strip():
+            position += len(lines[index])
+            index += 1
+            continue
+        natoms = int(lines[index])
+        start = position
+        position += sum(len(line) for line in lines[index : index + natoms + 2])
+        offsets.append([start, position])
+        index += natoms + 2
+    return offsets
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "".join(frame_text(3, f"frame {i}") for i in range(4)),
+        "".join(frame_text(3, f"frame {i}") for i in range(4)) + "\n\n",
+        "\n".join(frame_text(3, f"frame {i}") for i in range(4)),
+        "".join(frame_text(3, f"frame {i}") for i in range(4)).rstrip("\n"),
+        "".join(frame_text(natoms, f"frame {i}") for i, natoms in enumerate([3, 5, 2, 4])),
+        "".join(frame_text(natoms, f"frame {i}") for i, natoms in enumerate([3, 5, 2])).rstrip("\n"),
+    ],
+    ids=[
+        "fixed",
+        "trailing_blank_lines",
+        "blank_lines_between",
+        "no_final_newline",
+        "variable",
+        "variable_no_final_newline",
+    ],
+)
+def test_build_frame_index(tmp_path, text):
+    path = tmp_path / "traj.xyz"
+    path.write_text(text)
+
+    offsets = xyz_trajectory.build_frame_index(str(path))
+
+    assert offsets.tolist() == frame_ranges(text)
+
+
+def test_walk_frames_matches_fixed_scan(tmp_path):
+    path = tmp_path / "traj.xyz"
+    path.write_text("".join(frame_text(4, f"frame {i}") for i in range(6)))
+
+    walked = xyz_trajectory._walk_frames(str(path))
+
+    assert walked.tolist() == xyz_trajectory.build_frame_index(str(path)).tolist()
+
+
+def test_frames_and_coordinates(tmp_path):
+    path = tmp_path / "traj.xyz"
+    path.write_text("".join(frame_text(natoms, f"frame {i}") for i, natoms in enumerate([3, 5, 2])).rstrip("\n"))
+
+    trajectory = XYZTrajectory(str(path), use_sidecar=False)
+
+    assert len(trajectory) == 3
+    assert trajectory.comments() == ["frame 0", "frame 1", "frame 2"]
+    assert trajectory[-1].natoms == 2
+    assert trajectory[1].coordinates[:, 2].tolist() == [0, 1, 2, 3, 4]
+    assert not os.path.exists(str(path) + xyz_trajectory.INDEX_EXTENSION)
+
+
+def test_stale_sidecar_is_rebuilt(tmp_path):
+    path = tmp_path / "traj.xyz"
+    path.write_text("".join(frame_text(3, f"frame {i}") for i in range(2)))
+    assert len(XYZTrajectory(str(path))) == 2
+    assert xyz_trajectory.load_frame_index(str(path)) is not None
+
+    # Appending a frame changes the size and modification time
+    with open(path, "a") as trajectory:
+        trajectory.write(frame_text(3, "frame 2"))
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert xyz_trajectory.load_frame_index(str(path)) is None
+
+    assert len(XYZTrajectory(str(path))) == 3
+    assert len(xyz_trajectory.load_frame_index(str(path))) == 3
+
+
+def test_sidecar_is_rebuilt_when_only_mtime_changes(tmp_path):
+    path = tmp_path / "traj.xyz"
+    path.write_text("".join(frame_text(3, f"frame {i}") for i in range(2)))
+    XYZTrajectory(str(path))
+
+    # Same size, different content and modification time
+    path.write_text("".join(frame_text(3, f"FRAME {i}") for i in range(2)))
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    assert xyz_trajectory.load_frame_index(str(path)) is None
+    assert XYZTrajectory(str(path)).comments() == ["FRAME 0", "FRAME 1"]
+
+
+def test_sidecar_is_not_saved_when_file_grows_during_scan(tmp_path, monkeypatch):
+    path = tmp_path / "traj.xyz"
+    path.write_text("".join(frame_text(3, f"frame {i}") for i in range(2)))
+    build_frame_index = xyz_trajectory.build_frame_index
+
+    def build_then_append(xyz_filename):
+        offsets = build_frame_index(xyz_filename)
+        # A running calculation appends a frame after the scan has finished
+        with open(xyz_filename, "a") as trajectory:
+            trajectory.write(frame_text(3, "frame 2"))
+        stat = os.stat(xyz_filename)
+        os.utime(xyz_filename, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        return offsets
+
+    monkeypatch.setattr(xyz_trajectory, "build_frame_index", build_then_append)
+    assert len(XYZTrajectory(str(path))) == 2
+    assert not os.path.exists(str(path) + xyz_trajectory.INDEX_EXTENSION)
+
+    monkeypatch.setattr(xyz_trajectory, "build_frame_index", build_frame_index)
+    assert len(XYZTrajectory(str(path))) == 3
+
+
+def test_write_frames_reversed(tmp_path):
+    path = tmp_path / "traj.xyz"
+    frames = [frame_text(3, f"frame {i}") for i in range(4)]
+    # The last frame is missing its final newline
+    path.write_text("".join(frames).rstrip("\n"))
+    trajectory = XYZTrajectory(str(path), use_sidecar=False)
+
+    output = tmp_path / "reversed.xyz"
+    with open(output, "wb") as reversed_file:
+        count = trajectory.write_frames(reversed_file, range(len(trajectory) - 1, -1, -1))
+
+    assert count == 4
+    assert output.read_text() == "".join(reversed(frames))
+
+
+def test_write_frames_skips_blank_lines(tmp_path):
+    path = tmp_path / "traj.xyz"
+    frames = [frame_text(3, f"frame {i}") for i in range(3)]
+    path.write_text("\n".join(frames) + "\n\n")
+    trajectory = XYZTrajectory(str(path))
+
+    output = tmp_path / "reversed.xyz"
+    with open(output, "wb") as reversed_file:
+        trajectory.write_frames(reversed_file, range(len(trajectory) - 1, -1, -1))
+
+    assert output.read_text() == "".join(reversed(frames))
+    assert trajectory.frame_text(0) == frames[0]
+
+
+def test_cache_serves_energies_without_coordinates(tmp_path):
+    path = tmp_path / "traj.xyz"
+    path.write_text("".join(frame_text(3, f"frame {i}") for i in range(3)))
+    xyz_trajectory.write_cache(str(path), energies=np.array([1.0, 2.0, 3.0]), software="ORCA")
+
+    cache = xyz_trajectory.load_cache(str(path), keys=["software", "energies"])
+
+    assert set(cache) == {"software", "energies"}
+    assert cache["software"] == "ORCA"
+    assert cache["energies"].tolist() == [1.0, 2.0, 3.0]
+    assert XYZTrajectory(str(path)).coordinates(frames=[2], atoms=[1]).tolist() == [[[0.0, 0.0, 1.0]]]
+    assert isinstance(xyz_trajectory.load_cache(str(path), keys=["coordinates"])["coordinates"], np.memmap)
+
+
+def test_cache_is_stale_when_file_grows_while_caching(tmp_path, monkeypatch):
+    path = tmp_path / "traj.xyz"
+    path.write_text("".join(frame_text(3, f"frame {i}") for i in range(2)))
+    iter_frames = XYZTrajectory.iter_frames
+
+    def iter_then_append(self, frames=None):
+        yield from iter_frames(self, frames)
+        with open(path, "a") as trajectory:
+            trajectory.write(frame_text(3, "frame 2"))
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    monkeypatch.setattr(XYZTrajectory, "iter_frames", iter_then_append)
+    xyz_trajectory.write_cache(str(path))
+
+    assert xyz_trajectory.load_cache(str(path)) is None